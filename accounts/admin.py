@@ -1,23 +1,26 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from .models import Role, User
+from core import cache as references
+from core.admin import ReferenceListFilter
+from core.forms import ReferenceChoiceField
+from core.permissions import ADMINS, RolePermissionMixin
 
 
 @admin.register(Role)
-class RoleAdmin(admin.ModelAdmin):
+class RoleAdmin(RolePermissionMixin, admin.ModelAdmin):
     list_display = ['name']
     search_fields = ['name']
     
-    def has_module_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin
+    permission_matrix = {
+        'module': ADMINS,
+    }
 
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(RolePermissionMixin, BaseUserAdmin):
     list_display = ['username', 'role', 'plain_password', 'is_active', 'is_staff']
-    list_filter = ['role', 'is_active', 'is_staff']
+    list_filter = [('role', ReferenceListFilter), 'is_active', 'is_staff']
     search_fields = ['username']
     ordering = ['username']
     
@@ -34,21 +37,15 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
     
-    def has_module_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin 
-    
-    def has_add_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin 
-    
-    def has_change_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        if request.user.is_superuser:
-            return True
-        if request.user.is_admin:
-            return True
-        return False
\ No newline at end of file
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == "role":
+            kwargs["queryset"] = references.roles.queryset()
+            kwargs["form_class"] = ReferenceChoiceField
+            kwargs["reference"] = references.roles
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    permission_matrix = {
+        'module': ADMINS,
+        'add': ADMINS,
+        'change': ADMINS,
+    }
\ No newline at end of file
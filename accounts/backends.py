@@ -0,0 +1,91 @@
+import contextvars
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+# Auth hash stored in the session of the request whose user is being
+# loaded (set by accounts.middleware.AuthenticationMiddleware)
+session_auth_hash = contextvars.ContextVar('session_auth_hash', default=None)
+
+
+class UserCache:
+    """
+    Short-lived per-process cache of users (with their role) by id and
+    session auth hash.
+
+    A session only gets a cached user whose password matches the one it was
+    logged in with, so a session started after a password change made in
+    another process loads the user afresh instead of being flushed against
+    a stale copy. Entries are cleared by the accounts signals whenever a
+    User or Role is saved or deleted. Callers get a copy, so per-request
+    changes to the user object never leak into the cache.
+    """
+
+    def __init__(self):
+        # user id -> {session auth hash: (expires, user)}
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id, auth_hash):
+        entry = self._users.get(user_id, {}).get(auth_hash)
+        if entry is None:
+            return None
+        expires, user = entry
+        if expires < time.monotonic():
+            with self._lock:
+                self._users.get(user_id, {}).pop(auth_hash, None)
+            return None
+        return copy.deepcopy(user)
+
+    def set(self, user, ttl):
+        entry = (time.monotonic() + ttl, copy.deepcopy(user))
+        with self._lock:
+            self._users.setdefault(user.pk, {})[user.get_session_auth_hash()] = entry
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+user_cache = UserCache()
+
+
+class RoleModelBackend(ModelBackend):
+    """
+    ModelBackend that loads the user's role with the user, so role checks cost
+    no extra query, and serves repeat lookups from user_cache for
+    AUTH_USER_CACHE_TTL seconds. Only lookups for a session (see
+    accounts.middleware) use the cache.
+
+    Django still compares the session auth hash with the cached user's
+    password hash on every request, and saving a user drops its entry, so a
+    password change ends other sessions immediately in this process and
+    within the TTL in others.
+    """
+
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        try:
+            user_id = UserModel._meta.pk.to_python(user_id)
+        except Exception:
+            return None
+
+        auth_hash = session_auth_hash.get()
+        user = user_cache.get(user_id, auth_hash) if auth_hash else None
+        if user is None:
+            try:
+                user = UserModel._default_manager.select_related('role').get(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            if settings.AUTH_USER_CACHE_TTL > 0:
+                user_cache.set(user, settings.AUTH_USER_CACHE_TTL)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,40 @@
+"""
+AuthenticationMiddleware that lets RoleModelBackend see the auth hash of
+the session it loads the user for, so cached users are looked up by it
+(see accounts/backends.py).
+"""
+from functools import partial
+
+from django.contrib import auth
+from django.contrib.auth import HASH_SESSION_KEY
+from django.contrib.auth import middleware
+from django.utils.functional import SimpleLazyObject
+
+from .backends import session_auth_hash
+
+
+def get_user(request):
+    if not hasattr(request, '_cached_user'):
+        token = session_auth_hash.set(request.session.get(HASH_SESSION_KEY))
+        try:
+            request._cached_user = auth.get_user(request)
+        finally:
+            session_auth_hash.reset(token)
+    return request._cached_user
+
+
+async def auser(request):
+    if not hasattr(request, '_acached_user'):
+        token = session_auth_hash.set(await request.session.aget(HASH_SESSION_KEY))
+        try:
+            request._acached_user = await auth.aget_user(request)
+        finally:
+            session_auth_hash.reset(token)
+    return request._acached_user
+
+
+class AuthenticationMiddleware(middleware.AuthenticationMiddleware):
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
+        request.auser = partial(auser, request)
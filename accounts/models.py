@@ -30,6 +30,10 @@ class Role(models.Model):
 
 
 class UserManager(BaseUserManager):
+    def get_by_natural_key(self, username):
+        # Used by authentication; load the role in the same query
+        return self.select_related('role').get(**{self.model.USERNAME_FIELD: username})
+
     def create_user(self, username, password=None, role=None, **extra_fields):
         if not username:
             raise ValueError('Users must have a username')
@@ -69,22 +73,40 @@ class User(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return self.username
     
+    @property
+    def role_name(self):
+        """
+        Name of the user's role, looked up once per user instance.
+
+        The auth backend loads the role with the user, so this normally costs
+        no query at all; the cache is keyed on role_id so reassigning the role
+        is picked up.
+        """
+        cached = self.__dict__.get('_role_name_cache')
+        if cached is None or cached[0] != self.role_id:
+            cached = (self.role_id, self.role.name if self.role_id else None)
+            self.__dict__['_role_name_cache'] = cached
+        return cached[1]
+
+    def has_role(self, *names):
+        return self.role_name in names
+
     @property
     def is_admin(self):
-        return self.role.name == Role.ADMIN
+        return self.role_name == Role.ADMIN
     
     @property
     def is_client(self):
-        return self.role.name == Role.CLIENT
+        return self.role_name == Role.CLIENT
     
     @property
     def is_client_member(self):
-        return self.role.name == Role.CLIENT_MEMBER
+        return self.role_name == Role.CLIENT_MEMBER
     
     @property
     def is_onboarding(self):
-        return self.role.name == Role.ONBOARDING
+        return self.role_name == Role.ONBOARDING
     
     @property
     def is_qa(self):
-        return self.role.name == Role.QA
\ No newline at end of file
+        return self.role_name == Role.QA
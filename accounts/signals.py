@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import user_cache
+from .models import Role, User
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Role)
+def invalidate_cached_users_for_role(sender, instance, **kwargs):
+    # Roles change rarely; dropping every cached user is simplest
+    user_cache.clear()
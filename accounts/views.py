@@ -46,5 +46,5 @@ def get_landing_redirect(user):
     }
     
     # Get user's role name and return corresponding URL
-    role_name = user.role.name if hasattr(user, 'role') else None
+    role_name = user.role_name if hasattr(user, 'role_name') else None
     return reverse(role_landing_map.get(role_name, 'login'))
\ No newline at end of file
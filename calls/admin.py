@@ -1,40 +1,60 @@
-from django.contrib import admin
-from django import forms
-from .models import Call
+import copy
+import re
+
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ERROR_FLAG, ORDER_VAR, SEARCH_VAR
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.exceptions import PermissionDenied
+from django.db.models import F, Q
+from django.http import FileResponse, Http404, HttpResponseRedirect
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
+from .export import FORMATS, export_response
+from .export_jobs import ExportJobMixin, delete_export_file, export_path
+from .models import Call, CampaignCallHourlyRollup, CampaignCallDailyRollup, ExportJob
+from .pagination import EstimatedCountPaginator, KeysetChangeList
+from accounts.models import Role
 from campaigns.models import ClientCampaignModel
+from core.admin import ReferenceListFilter
+from core.permissions import ADMINS, NOBODY, STAFF, RolePermissionMixin, has_role
 
 
-class CallForm(forms.ModelForm):
-    """Custom form with filtered client campaigns"""
-    
-    class Meta:
-        model = Call
-        fields = '__all__'
-    
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        
-        # Filter client_campaign_model: only non-archived clients
-        self.fields['client_campaign_model'].queryset = ClientCampaignModel.objects.filter(
-            client__is_archived=False
-        ).select_related(
-            'client', 'campaign_model__campaign', 'campaign_model__model'
-        ).order_by('client__name', 'campaign_model__campaign__name')
-        
-        # Better label for dropdown
-        self.fields['client_campaign_model'].label_from_instance = lambda obj: (
-            f"{obj.client.name} - {obj.campaign_model.campaign.name} - {obj.campaign_model.model.name}"
-        )
+class StageFilter(admin.SimpleListFilter):
+    title = 'stage'
+    parameter_name = 'stage'
+
+    def lookups(self, request, model_admin):
+        """Stages of the rows this user can see, read off the stage index"""
+        return [(stage, stage) for stage in model_admin.get_queryset(request).distinct_values('stage')]
+
+    def queryset(self, request, queryset):
+        """Filter queryset based on selected stage"""
+        if self.value():
+            return queryset.filter(stage=self.value())
+        return queryset
 
 
 @admin.register(Call)
-class CallAdmin(admin.ModelAdmin):
-    form = CallForm
+class CallAdmin(ExportJobMixin, RolePermissionMixin, admin.ModelAdmin):
     list_display = ['id', 'number', 'stage', 'get_voice', 'get_response_category', 'transferred', 'timestamp', 'get_client', 'get_campaign']
-    list_filter = ['stage', 'timestamp', 'voice', 'response_category', 'transferred', 'client_campaign_model__campaign_model__campaign']
+    list_filter = [
+        StageFilter, 'timestamp', ('voice', ReferenceListFilter), ('response_category', ReferenceListFilter),
+        'transferred', 'client_campaign_model__campaign_model__campaign',
+    ]
     search_fields = ['number', 'list_id', 'transcription', 'client_campaign_model__client__name']
+    search_help_text = 'Words in the transcription, a number (or its first digits), a list ID or a client name'
+    show_full_result_count = False
+    # Newest first, paged by keyset with an estimated count (see calls/pagination.py)
+    ordering = ['-timestamp']
+    paginator = EstimatedCountPaginator
+    autocomplete_fields = ['client_campaign_model']
     readonly_fields = ['client_campaign_model', 'number', 'timestamp', 'stage', 'voice', 'response_category', 'list_id', 'transferred', 'transcription']
     date_hierarchy = 'timestamp'
+    actions = ['export_csv', 'export_ndjson']
+    export_kind = 'calls'
     
     # Optimize queries
     list_select_related = [
@@ -82,39 +102,20 @@ class CallAdmin(admin.ModelAdmin):
     get_response_category.short_description = 'Response Category'
     get_response_category.admin_order_field = 'response_category__name'
     
-    def has_module_permission(self, request):
-        """Allow viewing module if authenticated with proper role"""
-        if not request.user.is_authenticated:
-            return False
-        return (request.user.is_superuser or 
-                request.user.is_admin or 
-                request.user.is_onboarding or 
-                request.user.is_qa or 
-                request.user.is_client)
-    
+    permission_matrix = {
+        'module': STAFF | {Role.CLIENT},
+        'view': STAFF,
+        'add': NOBODY,
+        'change': NOBODY,
+        'delete': NOBODY,
+    }
+
     def has_view_permission(self, request, obj=None):
-        """Allow viewing calls"""
-        if not request.user.is_authenticated:
-            return False
-        if request.user.is_superuser or request.user.is_admin or request.user.is_qa or request.user.is_onboarding:
-            return True
-        if request.user.is_client and obj:
-            return obj.client_campaign_model.client.client == request.user
-        if request.user.is_client and not obj:
-            # Allow viewing list for clients
+        """Staff see every call; clients see the list and their own calls"""
+        if super().has_view_permission(request, obj):
             return True
-        return False
-    
-    def has_add_permission(self, request):
-        """Disable adding calls through admin"""
-        return False
-    
-    def has_change_permission(self, request, obj=None):
-        """Disable editing calls through admin"""
-        return False
-    
-    def has_delete_permission(self, request, obj=None):
-        """Disable deleting calls through admin"""
+        if request.user.is_authenticated and request.user.is_client:
+            return obj is None or obj.client_campaign_model.client.client_id == request.user.pk
         return False
     
     def get_queryset(self, request):
@@ -122,16 +123,289 @@ class CallAdmin(admin.ModelAdmin):
         qs = super().get_queryset(request)
         if not request.user.is_authenticated:
             return qs.none()
-        if request.user.is_superuser or request.user.is_admin or request.user.is_qa or request.user.is_onboarding:
+        if has_role(request.user, STAFF):
             return qs
         if request.user.is_client:
             return qs.filter(client_campaign_model__client__client=request.user)
         return qs.none()
     
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Full-text search over transcriptions, ranked by relevance among the
+        CALL_SEARCH_MAX_RESULTS most recent matches. When there are more
+        matches than that, a message says only the latest are shown.
+        """
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+
+        # Rank only the most recent matches: ranking every row that contains
+        # a common word would mean scoring millions of tsvectors per page.
+        # The ids are fetched up front so the page, count and date queries
+        # become primary key lookups (bounded by the matches' time range, which
+        # also prunes partitions) instead of a join against calls.
+        limit = settings.CALL_SEARCH_MAX_RESULTS
+        matches = list(
+            queryset.filter(self._search_condition(term))
+            .order_by('-timestamp')
+            .values_list('id', 'timestamp')[:limit + 1]
+        )
+        if not matches:
+            return queryset.none(), False
+        if len(matches) > limit:
+            matches = matches[:limit]
+            self.message_user(
+                request,
+                f"Showing the latest {limit:,} matches only. Narrow the search or filter by date to see older calls.",
+                messages.WARNING
+            )
+        return queryset.filter(
+            id__in=[call_id for call_id, _ in matches],
+            timestamp__range=(matches[-1][1], matches[0][1]),
+        ), False
+
+    def _search_condition(self, term):
+        """
+        Calls matching a search term. Each alternative is an indexed
+        condition (GIN on search_vector, btree on number/list_id/client
+        campaign) so PostgreSQL can combine them with a bitmap OR instead of
+        ILIKE-scanning the table.
+        """
+        condition = Q(search_vector=self._search_query(term)) | Q(list_id=term)
+
+        digits = re.sub(r'[\s()+-]', '', term)
+        if digits.isdigit():
+            condition |= Q(number__startswith=digits)
+
+        # Client names live in a small table; resolve them first so the calls
+        # query gets a plain IN list it can use an index for
+        client_campaign_ids = list(
+            ClientCampaignModel.objects.filter(client__name__icontains=term).values_list('id', flat=True)
+        )
+        if client_campaign_ids:
+            condition |= Q(client_campaign_model_id__in=client_campaign_ids)
+        return condition
+
+    def _search_query(self, term):
+        return SearchQuery(term, config='english', search_type='websearch')
+
+    def get_ordering(self, request):
+        """Order search results by rank unless a column sort was picked"""
+        term = request.GET.get(SEARCH_VAR, '').strip()
+        if term and ORDER_VAR not in request.GET:
+            return [SearchRank(F('search_vector'), self._search_query(term)).desc(), '-timestamp']
+        return super().get_ordering(request)
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_urls(self):
+        info = self.opts.app_label, self.opts.model_name
+        return [
+            path('export/<str:format_name>/', self.admin_site.admin_view(self.export_view),
+                 name='%s_%s_export' % info),
+            *super().get_urls(),
+        ]
+
+    def export_view(self, request, format_name):
+        """Stream every call matching the changelist's filters and search (linked from the changelist)"""
+        if format_name not in FORMATS:
+            raise Http404
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        try:
+            queryset = self.get_export_queryset(request)
+        except IncorrectLookupParameters:
+            info = self.opts.app_label, self.opts.model_name
+            return HttpResponseRedirect(f"{reverse('admin:%s_%s_changelist' % info)}?{ERROR_FLAG}=1")
+        return export_response(queryset, format_name, self._export_filename())
+
+    def get_export_queryset(self, request):
+        """
+        Every call matching the changelist's filters and search. The
+        changelist only shows the latest CALL_SEARCH_MAX_RESULTS matches of a
+        search; exports apply the search condition itself, without that cap.
+        """
+        term = request.GET.get(SEARCH_VAR, '').strip()
+        if not term:
+            return self.get_changelist_instance(request).queryset
+        unsearched = copy.copy(request)
+        unsearched.GET = request.GET.copy()
+        del unsearched.GET[SEARCH_VAR]
+        return self.get_changelist_instance(unsearched).queryset.filter(self._search_condition(term))
+
+    @admin.action(description='Export selected calls as CSV', permissions=['view'])
+    def export_csv(self, request, queryset):
+        return export_response(self._selected_calls(request, queryset), 'csv', self._export_filename())
+
+    @admin.action(description='Export selected calls as NDJSON', permissions=['view'])
+    def export_ndjson(self, request, queryset):
+        return export_response(self._selected_calls(request, queryset), 'ndjson', self._export_filename())
+
+    def _selected_calls(self, request, queryset):
+        # "Select all" hands actions the changelist's capped search results
+        if request.POST.get('select_across') == '1':
+            return self.get_export_queryset(request)
+        return queryset
+
+    def _export_filename(self):
+        return f"calls-{timezone.localtime():%Y%m%d-%H%M%S}"
+
     def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
         """Override to make all fields readonly in change form"""
         extra_context = extra_context or {}
         extra_context['show_save'] = False
         extra_context['show_save_and_continue'] = False
         extra_context['show_save_and_add_another'] = False
-        return super().changeform_view(request, object_id, form_url, extra_context)
\ No newline at end of file
+        return super().changeform_view(request, object_id, form_url, extra_context)
+
+
+class CampaignCallRollupAdmin(RolePermissionMixin, admin.ModelAdmin):
+    """Read-only view of a campaign call rollup table"""
+    list_display = ['bucket_start', 'get_client', 'get_campaign', 'get_voice', 'get_response_category', 'stage', 'total_calls', 'transferred_calls']
+    list_filter = [
+        'bucket_start', ('voice', ReferenceListFilter), ('response_category', ReferenceListFilter),
+        StageFilter, 'client_campaign_model__campaign_model__campaign',
+    ]
+    search_fields = ['client_campaign_model__client__name']
+    date_hierarchy = 'bucket_start'
+    ordering = ['-bucket_start']
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    list_select_related = [
+        'client_campaign_model__client',
+        'client_campaign_model__campaign_model__campaign',
+        'voice',
+        'response_category'
+    ]
+
+    def get_client(self, obj):
+        """Display client name"""
+        return obj.client_campaign_model.client.name
+    get_client.short_description = 'Client'
+    get_client.admin_order_field = 'client_campaign_model__client__name'
+
+    def get_campaign(self, obj):
+        """Display campaign name"""
+        return obj.client_campaign_model.campaign_model.campaign.name
+    get_campaign.short_description = 'Campaign'
+    get_campaign.admin_order_field = 'client_campaign_model__campaign_model__campaign__name'
+
+    def get_voice(self, obj):
+        """Display voice name"""
+        return obj.voice.name if obj.voice else '-'
+    get_voice.short_description = 'Voice'
+    get_voice.admin_order_field = 'voice__name'
+
+    def get_response_category(self, obj):
+        """Display response category"""
+        return obj.response_category.name if obj.response_category else '-'
+    get_response_category.short_description = 'Response Category'
+    get_response_category.admin_order_field = 'response_category__name'
+
+    # Rollups are staff reporting tables maintained by ingestion
+    permission_matrix = {
+        'module': STAFF,
+        'view': STAFF,
+        'add': NOBODY,
+        'change': NOBODY,
+        'delete': NOBODY,
+    }
+
+
+@admin.register(CampaignCallHourlyRollup)
+class CampaignCallHourlyRollupAdmin(CampaignCallRollupAdmin):
+    pass
+
+
+@admin.register(CampaignCallDailyRollup)
+class CampaignCallDailyRollupAdmin(CampaignCallRollupAdmin):
+    pass
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(RolePermissionMixin, admin.ModelAdmin):
+    list_display = ['id', 'kind', 'format', 'owner', 'status', 'get_progress', 'created_at', 'finished_at', 'get_download']
+    list_filter = ['status', 'kind']
+    list_select_related = ['owner']
+    readonly_fields = [
+        'owner', 'kind', 'format', 'query_string', 'status', 'rows_total', 'rows_written', 'bytes_written',
+        'last_id', 'max_id', 'error', 'worker', 'created_at', 'started_at', 'finished_at', 'heartbeat_at',
+    ]
+    actions = ['cancel_jobs', 'retry_jobs']
+
+    permission_matrix = {
+        'module': STAFF | {Role.CLIENT},
+        'view': STAFF | {Role.CLIENT},
+        'add': NOBODY,
+        'change': NOBODY,
+        'delete': STAFF | {Role.CLIENT},
+    }
+
+    def get_queryset(self, request):
+        """Admins see every job; everyone else their own"""
+        qs = super().get_queryset(request)
+        if has_role(request.user, ADMINS):
+            return qs
+        return qs.filter(owner=request.user)
+
+    def get_progress(self, obj):
+        """Rows written so far, against the estimate"""
+        if obj.rows_total is None:
+            return '-'
+        return f"{obj.rows_written:,} / ~{obj.rows_total:,} ({obj.progress}%)"
+    get_progress.short_description = 'Progress'
+
+    def get_download(self, obj):
+        """Download link once the file is complete"""
+        if obj.status != ExportJob.DONE:
+            return '-'
+        url = reverse('admin:calls_exportjob_download', args=[obj.pk])
+        return format_html('<a href="{}">{}</a>', url, obj.file_name)
+    get_download.short_description = 'File'
+
+    def get_urls(self):
+        return [
+            path('<path:object_id>/download/', self.admin_site.admin_view(self.download_view),
+                 name='calls_exportjob_download'),
+            *super().get_urls(),
+        ]
+
+    def download_view(self, request, object_id):
+        job = self.get_object(request, object_id)
+        if job is None or job.status != ExportJob.DONE:
+            raise Http404
+        if not self.has_view_permission(request, job):
+            raise PermissionDenied
+        try:
+            return FileResponse(export_path(job).open('rb'), as_attachment=True, filename=job.file_name)
+        except FileNotFoundError:
+            raise Http404
+
+    @admin.action(description='Cancel selected export jobs', permissions=['view'])
+    def cancel_jobs(self, request, queryset):
+        jobs = list(queryset.filter(status__in=[ExportJob.PENDING, ExportJob.RUNNING]))
+        queryset.filter(pk__in=[job.pk for job in jobs]).update(status=ExportJob.CANCELLED, worker='')
+        # Running jobs remove their own file when they notice
+        for job in jobs:
+            if job.status == ExportJob.PENDING:
+                delete_export_file(job)
+        self.message_user(request, f"Cancelled {len(jobs)} export job(s).")
+
+    @admin.action(description='Retry selected export jobs', permissions=['view'])
+    def retry_jobs(self, request, queryset):
+        """Queue failed or cancelled jobs again; they resume from where they stopped"""
+        retried = queryset.filter(status__in=[ExportJob.FAILED, ExportJob.CANCELLED]).update(
+            status=ExportJob.PENDING, error='', finished_at=None
+        )
+        self.message_user(request, f"Queued {retried} export job(s) again.")
+
+    def delete_model(self, request, obj):
+        delete_export_file(obj)
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        for job in queryset:
+            delete_export_file(job)
+        super().delete_queryset(request, queryset)
\ No newline at end of file
@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class CallsConfig(AppConfig):
     name = 'calls'
+
+    def ready(self):
+        from . import buffer, rollups
+        buffer.install_signal_handler()
+        rollups.connect_signals()
@@ -0,0 +1,253 @@
+"""
+Archival of old calls to compressed files on local disk.
+
+Calls older than the retention cutoff are streamed in (timestamp, id)
+order into gzip'd JSON-lines chunk files and then deleted from the database
+in small batches. ``manifest.json`` in the archive directory lists every
+chunk together with its id/timestamp range and the campaigns it contains,
+and records how many of its rows have been deleted, so an interrupted run
+picks up where it stopped.
+
+Selection is by timestamp alone: a run that deletes first finishes deleting
+everything already archived and then takes every call still older than the
+cutoff, including calls ingested late with an old timestamp. A run that
+keeps the rows resumes after the (timestamp, id) of the last archived call;
+late calls before that are left to the next run that deletes.
+``CallArchive.search`` scans the chunk files directly, skipping those whose
+manifest entry rules them out.
+"""
+import gzip
+import hashlib
+import json
+import os
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Call
+
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 2
+
+ARCHIVE_FIELDS = [
+    'id',
+    'client_campaign_model_id',
+    'number',
+    'transcription',
+    'stage',
+    'voice_id',
+    'voice__name',
+    'response_category_id',
+    'response_category__name',
+    'list_id',
+    'transferred',
+    'timestamp',
+]
+
+# Names written to the archive files; related names are stored so records stay readable
+ARCHIVE_COLUMNS = [field.replace('__name', '') for field in ARCHIVE_FIELDS]
+
+# Session-level advisory lock key so two archive runs never overlap
+ADVISORY_LOCK_KEY = 0x63616c6c
+
+
+class ArchiveError(Exception):
+    pass
+
+
+class CallArchive:
+    def __init__(self, directory=None):
+        self.directory = Path(directory or settings.CALL_ARCHIVE_DIR)
+        self.manifest_path = self.directory / MANIFEST_NAME
+
+    def load_manifest(self):
+        if not self.manifest_path.exists():
+            return {'version': MANIFEST_VERSION, 'columns': ARCHIVE_COLUMNS, 'chunks': []}
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get('version') == 1:
+            self._upgrade_manifest(manifest)
+        if manifest.get('version') != MANIFEST_VERSION:
+            raise ArchiveError(f"Unsupported archive manifest version {manifest.get('version')}")
+        return manifest
+
+    def _upgrade_manifest(self, manifest):
+        """Version 1 chunks were written in id order and deleted up to last_deleted_id"""
+        last_deleted_id = manifest.pop('last_deleted_id', 0)
+        for chunk in manifest['chunks']:
+            if chunk['last_id'] <= last_deleted_id:
+                chunk['deleted_rows'] = chunk['rows']
+            elif chunk['first_id'] > last_deleted_id:
+                chunk['deleted_rows'] = 0
+            else:
+                chunk['deleted_rows'] = sum(1 for record in self.read_chunk(chunk) if record['id'] <= last_deleted_id)
+            chunk['last_key'] = [chunk['max_timestamp'], chunk['last_id']]
+        manifest['version'] = MANIFEST_VERSION
+
+    def save_manifest(self, manifest):
+        """Replace the manifest atomically so a crash never leaves it half written"""
+        tmp_path = self.manifest_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    def checkpoint(self, manifest):
+        """(timestamp, id) of the last call written to the archive, or None"""
+        if not manifest['chunks']:
+            return None
+        timestamp, pk = manifest['chunks'][-1]['last_key']
+        return parse_datetime(timestamp), pk
+
+    def write_chunk(self, rows, cutoff, number):
+        """Write rows (ARCHIVE_FIELDS order) to chunk file number and return its manifest entry"""
+        ids = [row[0] for row in rows]
+        first_id, last_id = min(ids), max(ids)
+        name = f'calls-{number:06d}-{first_id:012d}-{last_id:012d}.jsonl.gz'
+        path = self.directory / name
+        tmp_path = path.with_suffix('.gz.tmp')
+
+        digest = hashlib.sha256()
+        campaign_ids = set()
+        timestamps = []
+        with open(tmp_path, 'wb') as raw, gzip.GzipFile(filename=name[:-3], mode='wb', fileobj=raw) as f:
+            for row in rows:
+                record = dict(zip(ARCHIVE_COLUMNS, row))
+                record['timestamp'] = record['timestamp'].isoformat()
+                line = (json.dumps(record, separators=(',', ':')) + '\n').encode()
+                digest.update(line)
+                f.write(line)
+                campaign_ids.add(record['client_campaign_model_id'])
+                timestamps.append(row[-1])
+            f.close()
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_path, path)
+
+        return {
+            'file': name,
+            'first_id': first_id,
+            'last_id': last_id,
+            'rows': len(rows),
+            'deleted_rows': 0,
+            'last_key': [rows[-1][-1].isoformat(), rows[-1][0]],
+            'cutoff': cutoff.isoformat(),
+            'min_timestamp': min(timestamps).isoformat(),
+            'max_timestamp': max(timestamps).isoformat(),
+            'client_campaign_model_ids': sorted(campaign_ids),
+            'sha256': digest.hexdigest(),
+        }
+
+    def read_chunk(self, chunk):
+        with gzip.open(self.directory / chunk['file'], 'rt') as f:
+            for line in f:
+                yield json.loads(line)
+
+    def archive(self, cutoff=None, chunk_rows=None, delete_batch=None, delete=True, progress=None):
+        """
+        Archive and delete every call older than ``cutoff``.
+
+        Returns (archived, deleted) row counts for this run.
+        """
+        cutoff = cutoff or timezone.now() - timedelta(days=settings.CALL_RETENTION_DAYS)
+        chunk_rows = chunk_rows or settings.CALL_ARCHIVE_CHUNK_ROWS
+        delete_batch = delete_batch or settings.CALL_ARCHIVE_DELETE_BATCH
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", [ADVISORY_LOCK_KEY])
+            if not cursor.fetchone()[0]:
+                raise ArchiveError('Another archive run is in progress')
+        try:
+            manifest = self.load_manifest()
+            archived = deleted = 0
+
+            # Finish deleting chunks written by an interrupted run (or one that
+            # kept its rows) first; every call archived so far is then gone
+            if delete:
+                deleted += self._delete_archived(manifest, delete_batch, progress)
+                after = None
+            else:
+                after = self.checkpoint(manifest)
+
+            while True:
+                # A fresh server-side cursor per chunk, fully consumed before any
+                # delete, so it never has to be held across commits
+                queryset = Call.objects.filter(timestamp__lt=cutoff)
+                if after is not None:
+                    timestamp, pk = after
+                    queryset = queryset.filter(timestamp__gte=timestamp).exclude(timestamp=timestamp, id__lte=pk)
+                queryset = queryset.order_by('timestamp', 'id').values_list(*ARCHIVE_FIELDS)
+                rows = list(queryset[:chunk_rows].iterator(chunk_size=min(chunk_rows, 5000)))
+                if not rows:
+                    break
+
+                manifest['chunks'].append(self.write_chunk(rows, cutoff, len(manifest['chunks']) + 1))
+                self.save_manifest(manifest)
+                archived += len(rows)
+                after = rows[-1][-1], rows[-1][0]
+                if progress:
+                    progress(f"Archived {len(rows)} call(s) up to {after[0]:%Y-%m-%d %H:%M:%S}")
+
+                if delete:
+                    deleted += self._delete_archived(manifest, delete_batch, progress)
+            return archived, deleted
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [ADVISORY_LOCK_KEY])
+
+    def _delete_archived(self, manifest, batch_size, progress=None):
+        """Delete archived rows not deleted yet, one short transaction per batch"""
+        deleted = 0
+        for chunk in manifest['chunks']:
+            if chunk['deleted_rows'] >= chunk['rows']:
+                continue
+            # Delete exactly the ids that were written, never rows that arrived later
+            ids = [record['id'] for record in self.read_chunk(chunk)][chunk['deleted_rows']:]
+            cutoff = parse_datetime(chunk['cutoff'])
+            for start in range(0, len(ids), batch_size):
+                batch = ids[start:start + batch_size]
+                with transaction.atomic(), connection.cursor() as cursor:
+                    # The timestamp bound lets a partitioned calls table prune partitions
+                    cursor.execute(
+                        f"DELETE FROM {Call._meta.db_table} WHERE id = ANY(%s) AND timestamp < %s",
+                        [batch, cutoff]
+                    )
+                    deleted += cursor.rowcount
+                chunk['deleted_rows'] += len(batch)
+                self.save_manifest(manifest)
+            if progress:
+                progress(f"Deleted the archived calls of {chunk['file']}")
+        return deleted
+
+    def search(self, number=None, client_campaign_model_id=None, start=None, end=None):
+        """
+        Yield archived call records matching every given filter.
+
+        Chunks are skipped using the manifest (campaign ids, timestamp range),
+        so only files that can contain a match are decompressed.
+        """
+        for chunk in self.load_manifest()['chunks']:
+            if client_campaign_model_id is not None and client_campaign_model_id not in chunk['client_campaign_model_ids']:
+                continue
+            if start and parse_datetime(chunk['max_timestamp']) < start:
+                continue
+            if end and parse_datetime(chunk['min_timestamp']) >= end:
+                continue
+
+            for record in self.read_chunk(chunk):
+                if number is not None and record['number'] != number:
+                    continue
+                if client_campaign_model_id is not None and record['client_campaign_model_id'] != client_campaign_model_id:
+                    continue
+                if start or end:
+                    timestamp = parse_datetime(record['timestamp'])
+                    if (start and timestamp < start) or (end and timestamp >= end):
+                        continue
+                yield record
@@ -0,0 +1,258 @@
+"""
+In-process write-behind buffer for call records.
+
+Single-call producers enqueue normalized rows here instead of opening a
+transaction per call. A background thread flushes the buffer through
+``write_call_rows`` when it reaches ``max_rows`` or every ``flush_interval``
+seconds, whichever comes first. When the buffer is full, ``put`` blocks for
+up to ``put_timeout`` seconds and then drops the row; once the buffer is
+stopping it refuses rows at once, as nothing would write them.
+
+A batch that fails to write (a lost connection, a database restart) is kept
+and tried again on the following flushes, before and apart from newer rows.
+It is only dropped after ``max_retries`` more failures.
+
+Stopping (at exit, or on SIGTERM, which skips atexit; see
+``install_signal_handler``) writes the failed batch and the newer rows each
+on their own, and logs and counts as failed whatever still could not be
+written.
+"""
+import atexit
+import logging
+import os
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .ingestion import write_call_rows
+
+
+logger = logging.getLogger(__name__)
+
+
+class CallBuffer:
+    def __init__(self, max_rows=500, flush_interval=0.25, capacity=10000, put_timeout=1.0, max_retries=3):
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.capacity = capacity
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+
+        self._rows = []
+        # The batch whose write failed, and how often it has been retried
+        self._retry_rows = []
+        self._retries = 0
+        # Reentrant: the SIGTERM handler may stop the buffer while the interrupted thread holds it
+        self._lock = threading.RLock()
+        self._not_full = threading.Condition(self._lock)
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+        # Counters
+        self.queued = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.retried = 0
+        self.flushes = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self.total_flush_latency = 0.0
+
+    def start(self):
+        """Start the flusher thread and make sure pending rows are written on exit"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='call-buffer-flusher', daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=10):
+        """Stop the flusher thread and flush everything still buffered"""
+        thread = self._thread
+        self._stopping.set()
+        self._wake.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        self._thread = None
+        self.flush()
+
+        # flush() leaves the newer rows alone when the failed batch fails again; they still get their own try
+        with self._not_full:
+            rows, self._rows = self._rows, []
+        if rows and not self._timed_write(rows):
+            with self._not_full:
+                self._rows = rows + self._rows
+
+        with self._not_full:
+            lost = self._pending()
+            self.failed += lost
+            self._rows, self._retry_rows, self._retries = [], [], 0
+            self._not_full.notify_all()
+        if lost:
+            logger.error("%d buffered call(s) could not be written before stopping and are lost", lost)
+
+    def put(self, rows, timeout=None):
+        """
+        Queue normalized rows (see ingestion.normalize_records).
+
+        Returns False if the rows were dropped because the buffer stayed full
+        or is stopping.
+        """
+        if timeout is None:
+            timeout = self.put_timeout
+        deadline = time.monotonic() + timeout
+
+        with self._not_full:
+            while self._stopping.is_set() or self._pending() + len(rows) > self.capacity:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stopping.is_set():
+                    self.dropped += len(rows)
+                    return False
+                self._wake.set()
+                self._not_full.wait(remaining)
+
+            self._rows.extend(rows)
+            self.queued += len(rows)
+            if len(self._rows) >= self.max_rows:
+                self._wake.set()
+        return True
+
+    def flush(self):
+        """Retry a batch that failed before, then write everything currently buffered in one transaction"""
+        with self._flush_lock:
+            written = 0
+            if self._retry_rows:
+                rows = self._retry_rows
+                self.retried += len(rows)
+                if not self._write(rows, retry=True):
+                    return 0
+                written = len(rows)
+
+            with self._not_full:
+                rows, self._rows = self._rows, []
+                self._not_full.notify_all()
+            if rows and self._write(rows):
+                written += len(rows)
+            return written
+
+    def stats(self):
+        with self._lock:
+            pending = self._pending()
+        return {
+            'pending': pending,
+            'queued': self.queued,
+            'flushed': self.flushed,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'retried': self.retried,
+            'flushes': self.flushes,
+            'last_flush_latency_ms': round(self.last_flush_latency * 1000, 2),
+            'avg_flush_latency_ms': round(self.total_flush_latency * 1000 / self.flushes, 2) if self.flushes else 0.0,
+            'max_flush_latency_ms': round(self.max_flush_latency * 1000, 2),
+        }
+
+    def _pending(self):
+        return len(self._rows) + len(self._retry_rows)
+
+    def _write(self, rows, retry=False):
+        """Write rows in one transaction; a failed batch is kept for retrying until it runs out of retries"""
+        if not self._timed_write(rows):
+            with self._not_full:
+                if not retry:
+                    logger.error("Failed to flush %d buffered call(s); retrying on the next flush", len(rows))
+                    self._retry_rows, self._retries = rows, 0
+                elif self._retries < self.max_retries:
+                    self._retries += 1
+                    logger.error("Retry %d of %d buffered call(s) failed", self._retries, len(rows))
+                else:
+                    logger.error("Dropping %d buffered call(s) after %d retries", len(rows), self._retries)
+                    self.failed += len(rows)
+                    self._retry_rows, self._retries = [], 0
+                    self._not_full.notify_all()
+            return False
+
+        if retry:
+            with self._not_full:
+                self._retry_rows, self._retries = [], 0
+                self._not_full.notify_all()
+        return True
+
+    def _timed_write(self, rows):
+        """Write rows in one transaction and record the latency; False (logged) when the write failed"""
+        started = time.perf_counter()
+        try:
+            write_call_rows(rows)
+        except Exception:
+            logger.exception("Writing %d buffered call(s) failed", len(rows))
+            # Drop a broken connection so the next flush reconnects
+            connection.close_if_unusable_or_obsolete()
+            return False
+
+        latency = time.perf_counter() - started
+        self.flushes += 1
+        self.flushed += len(rows)
+        self.last_flush_latency = latency
+        self.total_flush_latency += latency
+        self.max_flush_latency = max(self.max_flush_latency, latency)
+        return True
+
+    def _run(self):
+        try:
+            while not self._stopping.is_set():
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                self.flush()
+        finally:
+            connection.close()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_call_buffer():
+    """Return the process-wide buffer, starting it on first use"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                buffer = CallBuffer(
+                    max_rows=settings.CALL_BUFFER_MAX_ROWS,
+                    flush_interval=settings.CALL_BUFFER_FLUSH_INTERVAL_MS / 1000,
+                    capacity=settings.CALL_BUFFER_CAPACITY,
+                    put_timeout=settings.CALL_BUFFER_PUT_TIMEOUT_MS / 1000,
+                    max_retries=settings.CALL_BUFFER_MAX_RETRIES,
+                )
+                buffer.start()
+                _buffer = buffer
+    return _buffer
+
+
+def install_signal_handler():
+    """
+    Stop the buffer on SIGTERM before the previous handler runs (atexit
+    does not run when the default handler kills the process). Only
+    possible from the main thread.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def terminate(signum, frame):
+        if _buffer is not None:
+            _buffer.stop()
+        if callable(previous):
+            previous(signum, frame)
+        elif previous != signal.SIG_IGN:
+            signal.signal(signum, signal.SIG_DFL)
+            os.kill(os.getpid(), signum)
+
+    signal.signal(signal.SIGTERM, terminate)
@@ -0,0 +1,239 @@
+"""
+Export of calls (and a per-campaign call summary) as CSV or NDJSON without
+loading them into memory.
+
+Rows are read with ``QuerySet.iterator`` (a server-side cursor on
+PostgreSQL) as plain tuples, ``chunk_size`` at a time, and written out one
+chunk at a time, so memory stays flat however many calls match. Voice and
+response category names come from the reference cache and client/campaign
+names are loaded once per campaign, instead of joining or dereferencing
+foreign keys for every row.
+"""
+import csv
+import io
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Sum
+from django.http import StreamingHttpResponse
+
+from campaigns.models import ClientCampaignModel
+from core import cache
+from .models import CampaignActivity, CampaignCallDailyRollup
+
+
+# Values read from calls, in the order _resolve expects them
+EXPORT_FIELDS = [
+    'id',
+    'timestamp',
+    'number',
+    'client_campaign_model_id',
+    'stage',
+    'voice_id',
+    'response_category_id',
+    'list_id',
+    'transferred',
+    'transcription',
+]
+
+# Columns written to the export
+EXPORT_COLUMNS = [
+    'id',
+    'timestamp',
+    'number',
+    'client',
+    'campaign',
+    'stage',
+    'voice',
+    'response_category',
+    'list_id',
+    'transferred',
+    'transcription',
+]
+
+
+class CampaignNames:
+    """(client name, campaign name) by client campaign id, loaded in bulk as new ids turn up"""
+
+    def __init__(self):
+        self._names = {}
+
+    def load(self, ids):
+        missing = set(ids) - self._names.keys()
+        if missing:
+            queryset = ClientCampaignModel.objects.filter(id__in=missing).values_list(
+                'id', 'client__name', 'campaign_model__campaign__name'
+            )
+            for ccm_id, client, campaign in queryset:
+                self._names[ccm_id] = (client, campaign)
+
+    def get(self, ccm_id):
+        return self._names.get(ccm_id, (None, None))
+
+
+def export_chunks(queryset, chunk_size=None):
+    """Yield lists of rows (tuples in EXPORT_COLUMNS order) for every call in queryset"""
+    chunk_size = chunk_size or settings.CALL_EXPORT_CHUNK_SIZE
+    voices = {voice.pk: voice.name for voice in cache.voices.all()}
+    categories = {category.pk: category.name for category in cache.response_categories.all()}
+    campaigns = CampaignNames()
+
+    chunk = []
+    for row in queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield _resolve(chunk, voices, categories, campaigns)
+            chunk = []
+    if chunk:
+        yield _resolve(chunk, voices, categories, campaigns)
+
+
+def _resolve(chunk, voices, categories, campaigns):
+    campaigns.load(row[3] for row in chunk)
+    rows = []
+    for call_id, timestamp, number, ccm_id, stage, voice_id, category_id, list_id, transferred, transcription in chunk:
+        client, campaign = campaigns.get(ccm_id)
+        rows.append((
+            call_id,
+            timestamp.isoformat(),
+            number,
+            client,
+            campaign,
+            stage,
+            voices.get(voice_id),
+            categories.get(category_id),
+            list_id,
+            transferred,
+            transcription,
+        ))
+    return rows
+
+
+CAMPAIGN_EXPORT_FIELDS = [
+    'id',
+    'client__name',
+    'campaign_model__campaign__name',
+    'campaign_model__model__name',
+    'current_status__status_name',
+    'start_date',
+    'end_date',
+    'bot_count',
+]
+
+CAMPAIGN_EXPORT_COLUMNS = [
+    'id',
+    'client',
+    'campaign',
+    'model',
+    'status',
+    'start_date',
+    'end_date',
+    'bot_count',
+    'total_calls',
+    'transferred_calls',
+    'last_call_at',
+]
+
+
+def campaign_export_chunks(queryset, chunk_size=None):
+    """
+    Yield lists of rows (tuples in CAMPAIGN_EXPORT_COLUMNS order) for every
+    client campaign in queryset, with call totals from the daily rollup
+    """
+    chunk_size = chunk_size or settings.CALL_EXPORT_CHUNK_SIZE
+    chunk = []
+    for row in queryset.values_list(*CAMPAIGN_EXPORT_FIELDS).iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield _resolve_campaigns(chunk)
+            chunk = []
+    if chunk:
+        yield _resolve_campaigns(chunk)
+
+
+def _resolve_campaigns(chunk):
+    ids = [row[0] for row in chunk]
+    totals = {
+        row['client_campaign_model']: (row['total'], row['transferred'])
+        for row in CampaignCallDailyRollup.objects.filter(client_campaign_model__in=ids)
+        .values('client_campaign_model')
+        .annotate(total=Sum('total_calls'), transferred=Sum('transferred_calls'))
+    }
+    last_calls = dict(
+        CampaignActivity.objects.filter(client_campaign_model__in=ids)
+        .values_list('client_campaign_model', 'last_call_at')
+    )
+    rows = []
+    for ccm_id, client, campaign, model, status, start_date, end_date, bot_count in chunk:
+        total, transferred = totals.get(ccm_id, (0, 0))
+        last_call_at = last_calls.get(ccm_id)
+        rows.append((
+            ccm_id,
+            client,
+            campaign,
+            model,
+            status,
+            start_date.isoformat(),
+            end_date.isoformat() if end_date else None,
+            bot_count,
+            total,
+            transferred,
+            last_call_at.isoformat() if last_call_at else None,
+        ))
+    return rows
+
+
+# Export kinds: the model exported, its columns and the chunk generator
+EXPORTS = {
+    'calls': ('calls.Call', EXPORT_COLUMNS, export_chunks),
+    'campaigns': ('campaigns.ClientCampaignModel', CAMPAIGN_EXPORT_COLUMNS, campaign_export_chunks),
+}
+
+
+class CSVFormat:
+    name = 'csv'
+    content_type = 'text/csv; charset=utf-8'
+
+    def header(self, columns):
+        return self.encode([columns], columns)
+
+    def encode(self, rows, columns):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
+
+
+class NDJSONFormat:
+    name = 'ndjson'
+    content_type = 'application/x-ndjson'
+
+    def header(self, columns):
+        return ''
+
+    def encode(self, rows, columns):
+        return ''.join(json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + '\n' for row in rows)
+
+
+FORMATS = {export_format.name: export_format for export_format in (CSVFormat(), NDJSONFormat())}
+
+
+def stream_export(queryset, format_name, kind='calls', chunk_size=None):
+    """Yield the export of queryset as text, one chunk of rows at a time"""
+    export_format = FORMATS[format_name]
+    _, columns, chunks = EXPORTS[kind]
+    header = export_format.header(columns)
+    if header:
+        yield header
+    for rows in chunks(queryset, chunk_size):
+        yield export_format.encode(rows, columns)
+
+
+def export_response(queryset, format_name, filename, kind='calls'):
+    """StreamingHttpResponse downloading queryset as filename.<format>"""
+    response = StreamingHttpResponse(
+        stream_export(queryset, format_name, kind),
+        content_type=FORMATS[format_name].content_type
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{format_name}"'
+    return response
@@ -0,0 +1,257 @@
+"""
+Background export jobs.
+
+A job records what was asked for: the export kind, the format and the
+query string of the changelist it was requested from. The worker
+(``manage.py run_export_worker``) rebuilds the queryset by building that
+changelist as the job's owner, so filters, search and role scoping are
+exactly those of the page the user was looking at.
+
+Rows are written in id order, up to the highest id present when the job
+first started, one chunk at a time. After each chunk the file is flushed
+and the job records the last id and the file size, so an interrupted job
+(worker stopped, crashed or timed out) carries on from there: the file is
+truncated back to the recorded size and the export continues after
+``last_id``. Each chunk is written with the job's row locked and only while
+the job still runs on that worker, so a worker whose job was handed to
+another one never writes to the file again.
+
+Workers claim jobs with SELECT ... FOR UPDATE SKIP LOCKED, so any number
+of them can run side by side; a user (client accounts included) never has
+more than EXPORT_MAX_RUNNING_PER_USER jobs running, so one large export
+can't hold up everybody else's.
+"""
+import logging
+import os
+from datetime import timedelta
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ERROR_FLAG, PAGE_VAR
+from django.core.exceptions import PermissionDenied
+from django.db import connection, transaction
+from django.db.models import Count, Max
+from django.http import Http404, HttpRequest, HttpResponseRedirect, QueryDict
+from django.urls import path, reverse
+from django.utils import timezone
+
+from .export import EXPORTS, FORMATS
+from .models import ExportJob
+from .pagination import AFTER_VAR, BEFORE_VAR, estimated_count
+
+
+logger = logging.getLogger(__name__)
+
+# Transaction-level advisory lock (with the owner id) serializing claims per owner
+ADVISORY_LOCK_KEY = 0x6578706f
+
+# Pending jobs looked at per claim
+CLAIM_BATCH = 20
+
+
+class ExportJobError(Exception):
+    pass
+
+
+def export_path(job):
+    return Path(settings.EXPORT_DIR) / job.file_name
+
+
+def create_job(request, kind, format_name):
+    """Queue an export of the changelist request was made from"""
+    query = request.GET.copy()
+    for var in (PAGE_VAR, AFTER_VAR, BEFORE_VAR, ERROR_FLAG):
+        query.pop(var, None)
+    return ExportJob.objects.create(
+        owner=request.user, kind=kind, format=format_name, query_string=query.urlencode()
+    )
+
+
+def job_queryset(job):
+    """The rows job exports: its changelist, as seen by its owner, in id order"""
+    model = apps.get_model(EXPORTS[job.kind][0])
+    model_admin = admin.site._registry[model]
+
+    request = HttpRequest()
+    request.method = 'GET'
+    request.GET = QueryDict(job.query_string)
+    request.user = job.owner
+    if not job.owner.is_active or not model_admin.has_view_permission(request):
+        raise ExportJobError(f"{job.owner} may no longer view {model._meta.verbose_name_plural}")
+    try:
+        queryset = model_admin.get_export_queryset(request)
+    except IncorrectLookupParameters:
+        raise ExportJobError('The export filters are no longer valid')
+    return queryset.order_by('pk')
+
+
+def requeue_stale_jobs():
+    """Hand running jobs whose worker stopped reporting back to the queue"""
+    stale = timezone.now() - timedelta(seconds=settings.EXPORT_JOB_STALE_SECONDS)
+    return ExportJob.objects.filter(status=ExportJob.RUNNING, heartbeat_at__lt=stale).update(
+        status=ExportJob.PENDING, worker=''
+    )
+
+
+def claim_job(worker):
+    """Mark the oldest pending job whose owner has a free slot as running on worker, and return it"""
+    requeue_stale_jobs()
+    busy_owners = (
+        ExportJob.objects.filter(status=ExportJob.RUNNING)
+        .values('owner').annotate(running=Count('id'))
+        .filter(running__gte=settings.EXPORT_MAX_RUNNING_PER_USER).values('owner')
+    )
+    with transaction.atomic():
+        candidates = (
+            ExportJob.objects.select_for_update(skip_locked=True)
+            .filter(status=ExportJob.PENDING).exclude(owner__in=busy_owners)
+            .select_related('owner__role').order_by('created_at')[:CLAIM_BATCH]
+        )
+        for job in candidates:
+            # Another worker may be claiming a job of the same owner right now
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_xact_lock(%s, %s)", [ADVISORY_LOCK_KEY, job.owner_id])
+                if not cursor.fetchone()[0]:
+                    continue
+            running = ExportJob.objects.filter(owner_id=job.owner_id, status=ExportJob.RUNNING).count()
+            if running >= settings.EXPORT_MAX_RUNNING_PER_USER:
+                continue
+            now = timezone.now()
+            job.status = ExportJob.RUNNING
+            job.worker = worker
+            job.started_at = job.started_at or now
+            job.heartbeat_at = now
+            job.save(update_fields=['status', 'worker', 'started_at', 'heartbeat_at'])
+            return job
+    return None
+
+
+def run_job(job, should_stop=None):
+    """
+    Write job's export, resuming where it stopped. Returns the job's final
+    status: DONE, FAILED, CANCELLED, or PENDING when should_stop() asked to
+    stop early (the job is queued again to finish later).
+    """
+    try:
+        queryset = job_queryset(job)
+        if job.max_id is None:
+            job.max_id = queryset.aggregate(max_id=Max('pk'))['max_id'] or 0
+            job.rows_total = estimated_count(queryset) if job.kind == 'calls' else queryset.count()
+            job.save(update_fields=['max_id', 'rows_total'])
+        return _write(job, queryset, should_stop)
+    except Exception as e:
+        if not isinstance(e, ExportJobError):
+            logger.exception('Export %s failed', job.pk)
+        ExportJob.objects.filter(pk=job.pk, status=ExportJob.RUNNING, worker=job.worker).update(
+            status=ExportJob.FAILED, error=str(e) or e.__class__.__name__, finished_at=timezone.now()
+        )
+        return ExportJob.FAILED
+
+
+def _write(job, queryset, should_stop):
+    _, columns, chunks = EXPORTS[job.kind]
+    export_format = FORMATS[job.format]
+    file_path = export_path(job)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if not file_path.exists() or file_path.stat().st_size < job.bytes_written:
+        # The partial file is gone; start over
+        job.last_id = job.rows_written = job.bytes_written = 0
+
+    with open(file_path, 'ab') as f:
+        if job.bytes_written == 0:
+            if not _append(job, f, export_format.header(columns).encode(), 0, job.last_id):
+                return _stopped(job)
+
+        remaining = queryset.filter(pk__gt=job.last_id, pk__lte=job.max_id)
+        for rows in chunks(remaining):
+            if not _append(job, f, export_format.encode(rows, columns).encode(), len(rows), rows[-1][0]):
+                return _stopped(job)
+            if should_stop and should_stop():
+                ExportJob.objects.filter(pk=job.pk, status=ExportJob.RUNNING, worker=job.worker).update(
+                    status=ExportJob.PENDING, worker=''
+                )
+                return ExportJob.PENDING
+
+    ExportJob.objects.filter(pk=job.pk, status=ExportJob.RUNNING, worker=job.worker).update(
+        status=ExportJob.DONE, finished_at=timezone.now(), worker=''
+    )
+    return ExportJob.DONE
+
+
+def _append(job, f, data, rows, last_id):
+    """
+    Write data after the job's recorded position, persist it and record the
+    new position; False, writing nothing, if the job was cancelled or taken over.
+    """
+    with transaction.atomic():
+        # The row lock holds off a takeover (or cancel) until the chunk is recorded
+        owned = ExportJob.objects.select_for_update().filter(
+            pk=job.pk, status=ExportJob.RUNNING, worker=job.worker
+        ).exists()
+        if not owned:
+            return False
+        f.truncate(job.bytes_written)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+        job.rows_written += rows
+        job.bytes_written = f.tell()
+        job.last_id = last_id
+        ExportJob.objects.filter(pk=job.pk).update(
+            rows_written=job.rows_written,
+            bytes_written=job.bytes_written,
+            last_id=job.last_id,
+            heartbeat_at=timezone.now(),
+        )
+    return True
+
+
+def _stopped(job):
+    status = ExportJob.objects.filter(pk=job.pk).values_list('status', flat=True).first()
+    if status == ExportJob.CANCELLED:
+        delete_export_file(job)
+    return status
+
+
+def delete_export_file(job):
+    try:
+        export_path(job).unlink()
+    except FileNotFoundError:
+        pass
+
+
+class ExportJobMixin:
+    """
+    ModelAdmin mixin adding export-job/<format>/, which queues a background
+    export of the changelist (with its current query string) as ``export_kind``.
+    """
+    export_kind = None
+
+    def get_export_queryset(self, request):
+        """Rows an export of the changelist request was made from contains"""
+        return self.get_changelist_instance(request).queryset
+
+    def get_urls(self):
+        info = self.opts.app_label, self.opts.model_name
+        return [
+            path('export-job/<str:format_name>/', self.admin_site.admin_view(self.export_job_view),
+                 name='%s_%s_export_job' % info),
+            *super().get_urls(),
+        ]
+
+    def export_job_view(self, request, format_name):
+        if format_name not in FORMATS:
+            raise Http404
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        job = create_job(request, self.export_kind, format_name)
+        self.message_user(
+            request,
+            f"Export {job.pk} is queued; download it from Export Jobs once it is done.",
+            messages.SUCCESS
+        )
+        return HttpResponseRedirect(reverse('admin:calls_exportjob_changelist'))
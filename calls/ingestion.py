@@ -0,0 +1,286 @@
+"""
+Batched ingestion of call records coming from the bots.
+
+Records are validated up front, Voice / ResponseCategory names are resolved
+to ids through the reference table cache (core/cache.py), and the whole
+batch is written to the ``calls`` table in a single transaction using
+PostgreSQL ``COPY`` (or a multi-row ``INSERT`` when COPY is not available).
+"""
+import io
+from datetime import datetime
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from campaigns.models import ClientCampaignModel
+from core import cache as references
+from .models import Call, CampaignActivity
+from .rollups import apply_rollups
+
+
+# Column order used for both COPY and INSERT
+CALL_COLUMNS = [
+    'client_campaign_model_id',
+    'number',
+    'transcription',
+    'stage',
+    'voice_id',
+    'response_category_id',
+    'list_id',
+    'transferred',
+    'timestamp',
+]
+
+# Rows per statement when falling back to multi-row INSERT
+INSERT_BATCH_SIZE = 1000
+
+NUMBER_MAX_LENGTH = Call._meta.get_field('number').max_length
+
+
+class CallIngestionError(ValueError):
+    """Raised when a batch contains invalid records; nothing is written"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f"{len(errors)} invalid call record(s)")
+
+
+class NameCache:
+    """
+    Name -> id resolution for small reference tables, backed by the
+    core.cache reference cache.
+
+    The table is reloaded when a name is missing, so newly added
+    voices/categories are picked up without waiting for the cache to expire.
+    """
+
+    def __init__(self, reference, field='name'):
+        self.reference = reference
+        self.field = field
+
+    def resolve(self, names):
+        """Return {name: id} for the given names, None for unknown names"""
+        ids = self.reference.ids_by(self.field)
+        if any(name not in ids for name in names):
+            self.reference.refresh()
+            ids = self.reference.ids_by(self.field)
+        return {name: ids.get(name) for name in names}
+
+    def clear(self):
+        self.reference.invalidate()
+
+
+voice_ids = NameCache(references.voices)
+response_category_ids = NameCache(references.response_categories)
+
+
+def _clean_text(value, field, errors, index, max_length=None):
+    if value is None:
+        return None
+    if not isinstance(value, (str, int)):
+        errors.append({'index': index, 'field': field, 'error': 'Must be a string'})
+        return None
+    value = str(value)
+    if max_length and len(value) > max_length:
+        errors.append({'index': index, 'field': field, 'error': f'Longer than {max_length} characters'})
+    return value
+
+
+def normalize_records(records, default_client_campaign_model_id=None):
+    """
+    Validate raw call dicts and convert them into rows in CALL_COLUMNS order.
+
+    Raises CallIngestionError listing every problem found in the batch.
+    """
+    errors = []
+    parsed = []
+    now = timezone.now()
+
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            errors.append({'index': index, 'error': 'Call record must be an object'})
+            continue
+
+        ccm_id = record.get('client_campaign_model_id', default_client_campaign_model_id)
+        try:
+            ccm_id = int(ccm_id)
+        except (TypeError, ValueError):
+            errors.append({'index': index, 'field': 'client_campaign_model_id', 'error': 'Must be an integer'})
+
+        number = _clean_text(record.get('number'), 'number', errors, index, NUMBER_MAX_LENGTH)
+        if not number:
+            errors.append({'index': index, 'field': 'number', 'error': 'This field is required'})
+
+        stage = record.get('stage')
+        if stage is not None:
+            try:
+                stage = int(stage)
+            except (TypeError, ValueError):
+                errors.append({'index': index, 'field': 'stage', 'error': 'Must be an integer'})
+
+        transferred = record.get('transferred', False)
+        if not isinstance(transferred, bool):
+            errors.append({'index': index, 'field': 'transferred', 'error': 'Must be a boolean'})
+
+        timestamp = record.get('timestamp')
+        if timestamp is None:
+            timestamp = now
+        elif not isinstance(timestamp, datetime):
+            timestamp = parse_datetime(str(timestamp))
+            if timestamp is None:
+                errors.append({'index': index, 'field': 'timestamp', 'error': 'Must be an ISO 8601 datetime'})
+        if timestamp is not None and timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp, timezone.get_current_timezone())
+
+        parsed.append({
+            'index': index,
+            'client_campaign_model_id': ccm_id,
+            'number': number,
+            'transcription': _clean_text(record.get('transcription'), 'transcription', errors, index),
+            'stage': stage,
+            'voice': _clean_text(record.get('voice'), 'voice', errors, index) or None,
+            'response_category': _clean_text(record.get('response_category'), 'response_category', errors, index) or None,
+            'list_id': _clean_text(record.get('list_id'), 'list_id', errors, index),
+            'transferred': transferred,
+            'timestamp': timestamp,
+        })
+
+    if errors:
+        raise CallIngestionError(errors)
+
+    # Resolve foreign keys in bulk: one query per table at most
+    ccm_ids = {row['client_campaign_model_id'] for row in parsed}
+    known_ccm_ids = set(
+        ClientCampaignModel.objects.filter(id__in=ccm_ids).values_list('id', flat=True)
+    )
+    voices = voice_ids.resolve({row['voice'] for row in parsed if row['voice']})
+    categories = response_category_ids.resolve(
+        {row['response_category'] for row in parsed if row['response_category']}
+    )
+
+    rows = []
+    for row in parsed:
+        index = row['index']
+        if row['client_campaign_model_id'] not in known_ccm_ids:
+            errors.append({'index': index, 'field': 'client_campaign_model_id', 'error': 'Unknown client campaign'})
+        voice_id = voices.get(row['voice']) if row['voice'] else None
+        if row['voice'] and voice_id is None:
+            errors.append({'index': index, 'field': 'voice', 'error': f"Unknown voice '{row['voice']}'"})
+        category_id = categories.get(row['response_category']) if row['response_category'] else None
+        if row['response_category'] and category_id is None:
+            errors.append({
+                'index': index,
+                'field': 'response_category',
+                'error': f"Unknown response category '{row['response_category']}'",
+            })
+        rows.append((
+            row['client_campaign_model_id'],
+            row['number'],
+            row['transcription'],
+            row['stage'],
+            voice_id,
+            category_id,
+            row['list_id'],
+            row['transferred'],
+            row['timestamp'],
+        ))
+
+    if errors:
+        raise CallIngestionError(errors)
+    return rows
+
+
+def _copy_value(value):
+    """Encode a value for COPY ... FROM STDIN in PostgreSQL text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
+
+
+def _copy_rows(cursor, rows):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_value(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    sql = f"COPY {Call._meta.db_table} ({', '.join(CALL_COLUMNS)}) FROM STDIN"
+    raw_cursor = cursor.cursor
+    if hasattr(raw_cursor, 'copy_expert'):
+        # psycopg2
+        raw_cursor.copy_expert(sql, buffer)
+    else:
+        # psycopg 3
+        with raw_cursor.copy(sql) as copy:
+            copy.write(buffer.getvalue())
+
+
+def _insert_rows(cursor, rows):
+    table = connection.ops.quote_name(Call._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(column) for column in CALL_COLUMNS)
+    placeholder = '(' + ', '.join(['%s'] * len(CALL_COLUMNS)) + ')'
+
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        chunk = rows[start:start + INSERT_BATCH_SIZE]
+        values = ', '.join([placeholder] * len(chunk))
+        params = [value for row in chunk for value in row]
+        cursor.execute(f"INSERT INTO {table} ({columns}) VALUES {values}", params)
+
+
+def _touch_campaign_activity(cursor, rows):
+    """Move campaign_activity.last_call_at forward and touch updated_at for every campaign in the batch"""
+    latest = {}
+    for row in rows:
+        ccm_id, timestamp = row[0], row[-1]
+        if ccm_id not in latest or timestamp > latest[ccm_id]:
+            latest[ccm_id] = timestamp
+
+    table = CampaignActivity._meta.db_table
+    values = ', '.join(['(%s, %s)'] * len(latest))
+    params = [value for item in sorted(latest.items()) for value in item]
+    cursor.execute(
+        f"INSERT INTO {table} (client_campaign_model_id, last_call_at) VALUES {values} "
+        f"ON CONFLICT (client_campaign_model_id) DO UPDATE "
+        f"SET last_call_at = GREATEST({table}.last_call_at, EXCLUDED.last_call_at), updated_at = now()",
+        params
+    )
+
+
+def write_call_rows(rows, method=None):
+    """
+    Write already-normalized rows in a single transaction.
+
+    ``method`` is 'copy' or 'insert'; by default COPY is used on PostgreSQL.
+    Derived tables (campaign activity, rollups) are updated in the same transaction.
+    """
+    if not rows:
+        return 0
+    if method is None:
+        method = 'copy' if connection.vendor == 'postgresql' else 'insert'
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            if method == 'copy':
+                _copy_rows(cursor, rows)
+            else:
+                _insert_rows(cursor, rows)
+            _touch_campaign_activity(cursor, rows)
+            apply_rollups(cursor, rows)
+    return len(rows)
+
+
+def ingest_calls(records, default_client_campaign_model_id=None, method=None):
+    """Validate and store a batch of call records, returning the number written"""
+    rows = normalize_records(records, default_client_campaign_model_id)
+    return write_call_rows(rows, method=method)
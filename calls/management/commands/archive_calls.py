@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from calls.archive import ArchiveError, CallArchive
+
+
+class Command(BaseCommand):
+    help = (
+        'Move calls older than the retention period into compressed archive files and delete them. '
+        'Safe to run from cron; an interrupted run resumes from the manifest.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Archive calls older than this; defaults to CALL_RETENTION_DAYS')
+        parser.add_argument('--dir', help='Archive directory; defaults to CALL_ARCHIVE_DIR')
+        parser.add_argument('--chunk-rows', type=int, help='Rows per archive file; defaults to CALL_ARCHIVE_CHUNK_ROWS')
+        parser.add_argument('--delete-batch', type=int,
+                            help='Rows deleted per transaction; defaults to CALL_ARCHIVE_DELETE_BATCH')
+        parser.add_argument('--no-delete', action='store_true', help='Write archive files but keep the rows')
+
+    def handle(self, *args, **options):
+        days = settings.CALL_RETENTION_DAYS if options['days'] is None else options['days']
+        if days < 1:
+            raise CommandError('--days must be at least 1')
+        cutoff = timezone.now() - timedelta(days=days)
+
+        archive = CallArchive(options['dir'])
+        self.stdout.write(f'Archiving calls before {cutoff:%Y-%m-%d %H:%M} to {archive.directory}')
+        try:
+            archived, deleted = archive.archive(
+                cutoff=cutoff,
+                chunk_rows=options['chunk_rows'],
+                delete_batch=options['delete_batch'],
+                delete=not options['no_delete'],
+                progress=self.stdout.write,
+            )
+        except ArchiveError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} call(s), deleted {deleted}'))
@@ -0,0 +1,215 @@
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Max, Sum
+from calls.models import Call, CallCategoryRollup, CampaignCallDailyRollup
+from campaigns.models import ClientCampaignModel, ResponseCategory, Voice
+
+
+# The calls indexes replaced in migration 0007, recreated for the "before" runs
+LEGACY_INDEXES = [
+    ('idx_call_ccm', 'client_campaign_model_id'),
+    ('calls_client_campaign_model_id_30bc55da', 'client_campaign_model_id'),
+    ('idx_calls_response_cat', 'response_category_id'),
+    ('calls_response_category_id_cbd75df0', 'response_category_id'),
+    ('calls_voice_id_87b9a732', 'voice_id'),
+]
+COMPOSITE_INDEXES = ['idx_calls_ccm_timestamp', 'idx_calls_category_timestamp']
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN ANALYZE the hot Call queries and time a batch insert, before (single-column indexes) '
+        'and after (composite indexes). Run on seeded data; every change, including the index swap '
+        'for the "before" run, is rolled back. Holds an exclusive lock on calls while it runs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Length of the "since T" and range windows')
+        parser.add_argument('--inserts', type=int, default=20000, help='Rows in the insert batch')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per query; the fastest is reported')
+        parser.add_argument('--mode', choices=['before', 'after'], action='append',
+                            help='Only run this layout (repeatable); defaults to both')
+        parser.add_argument('--plans', action='store_true', help='Print the full plan of every query')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('benchmark_call_indexes needs PostgreSQL')
+        self.repeat = max(options['repeat'], 1)
+        self.show_plans = options['plans']
+
+        params = self._parameters(options['days'])
+        if params is None:
+            raise CommandError('No calls to benchmark; run seed_benchmark_data first')
+        self.stdout.write(
+            f"campaign {params['campaign']}, category {params['category']}, "
+            f"since {params['since']:%Y-%m-%d %H:%M}, {options['inserts']} inserted rows"
+        )
+
+        for mode in options['mode'] or ['before', 'after']:
+            try:
+                with transaction.atomic():
+                    if mode == 'before':
+                        self._legacy_layout()
+                    self._report(mode, params, options['inserts'])
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+    def _parameters(self, days):
+        latest = Call.objects.aggregate(latest=Max('timestamp'))['latest']
+        if latest is None:
+            return None
+        # The busiest campaign and category, from the rollups rather than a scan of calls
+        campaign = (
+            CampaignCallDailyRollup.objects.values('client_campaign_model')
+            .annotate(calls=Sum('total_calls')).order_by('-calls')
+            .values_list('client_campaign_model', flat=True).first()
+        )
+        category = (
+            CallCategoryRollup.objects.filter(response_category__isnull=False).values('response_category')
+            .annotate(calls=Sum('total_calls')).order_by('-calls')
+            .values_list('response_category', flat=True).first()
+        )
+        if campaign is None:
+            campaign = Call.objects.order_by('-timestamp').values_list('client_campaign_model', flat=True).first()
+        return {
+            'campaign': campaign,
+            'category': category,
+            'since': latest - timedelta(days=days),
+            'until': latest,
+        }
+
+    def _queries(self, params):
+        campaign = Call.objects.filter(client_campaign_model_id=params['campaign'])
+        window = {'timestamp__range': (params['since'], params['until'])}
+        return [
+            ('campaign since T, newest 100',
+             campaign.filter(timestamp__gte=params['since']).order_by('-timestamp')[:100]),
+            ('campaign since T, count',
+             campaign.filter(timestamp__gte=params['since']).order_by()
+             .values('client_campaign_model').annotate(calls=Count('id'))),
+            ('campaign + category in range, newest 100',
+             campaign.filter(response_category_id=params['category'], **window).order_by('-timestamp')[:100]),
+            ('category in range, count',
+             Call.objects.filter(response_category_id=params['category'], **window).order_by()
+             .values('response_category').annotate(calls=Count('id'))),
+            ('campaign latest call',
+             campaign.order_by('-timestamp').values('timestamp')[:1]),
+            ('changelist first page (control)',
+             Call.objects.order_by('-timestamp', '-id')[:101]),
+        ]
+
+    def _legacy_layout(self):
+        quote = connection.ops.quote_name
+        table = quote(Call._meta.db_table)
+        with connection.cursor() as cursor:
+            for name in COMPOSITE_INDEXES:
+                cursor.execute(f"DROP INDEX IF EXISTS {quote(name)}")
+            for name, column in LEGACY_INDEXES:
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {quote(name)} ON {table} ({quote(column)})")
+            cursor.execute(f"ANALYZE {table}")
+
+    def _index_footprint(self):
+        with connection.cursor() as cursor:
+            # Partitioned parents hold no index data; count the parent's indexes, size the partitions'
+            cursor.execute(
+                """
+                SELECT (SELECT COUNT(*) FROM pg_index WHERE indrelid = %s::regclass),
+                       COALESCE(SUM(pg_relation_size(x.indexrelid)), 0)
+                FROM pg_index x
+                WHERE x.indrelid = %s::regclass
+                   OR x.indrelid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)
+                """,
+                [Call._meta.db_table] * 3
+            )
+            return cursor.fetchone()
+
+    def _report(self, mode, params, inserts):
+        count, size = self._index_footprint()
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{mode}: {count} indexes, {size / 2 ** 20:,.0f} MB"))
+        for label, queryset in self._queries(params):
+            ms, plan = self._explain(queryset)
+            indexes = _indexes_used(plan)
+            if len(indexes) > 3:
+                # One per partition on a partitioned table
+                indexes = [*indexes[:2], f'{len(indexes) - 2} more']
+            self.stdout.write(f"  {label:<42} {ms:>9.2f} ms  {', '.join(indexes) or 'no index'}")
+            if self.show_plans:
+                self.stdout.write(json.dumps(plan, indent=2))
+        if inserts:
+            elapsed, wal = self._insert(params, inserts)
+            self.stdout.write(f"  {'insert ' + str(inserts) + ' rows':<42} {elapsed * 1000:>9.2f} ms  "
+                              f"{wal / inserts:,.0f} WAL bytes/row")
+
+    def _explain(self, queryset):
+        sql, sql_params = queryset.query.sql_with_params()
+        best = None
+        with connection.cursor() as cursor:
+            for _ in range(self.repeat):
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", sql_params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                if best is None or plan[0]['Execution Time'] < best[0]['Execution Time']:
+                    best = plan
+        return best[0]['Execution Time'], best[0]['Plan']
+
+    def _insert(self, params, inserts):
+        """
+        Best (time, WAL bytes) to insert rows straight into calls, spread over
+        campaigns and timestamped after the newest call like live traffic.
+        Server-side and without the rollup upkeep of the ingestion path, so
+        the difference between layouts is the index maintenance.
+        """
+        campaigns = list(ClientCampaignModel.objects.values_list('id', flat=True)[:100])
+        voices = list(Voice.objects.values_list('id', flat=True)[:10]) or [None]
+        categories = list(ResponseCategory.objects.values_list('id', flat=True)[:10]) or [None]
+        sql = (
+            f"INSERT INTO {connection.ops.quote_name(Call._meta.db_table)} "
+            f"(client_campaign_model_id, number, transcription, stage, voice_id, response_category_id, "
+            f"list_id, transferred, timestamp) "
+            f"SELECT (%s::bigint[])[1 + i %% %s], (2000000000 + i)::text, "
+            f"'Hello, this is a benchmark call transcription.', 1 + i %% 5, "
+            f"(%s::bigint[])[1 + i %% %s], (%s::bigint[])[1 + i %% %s], (1000 + i %% 100)::text, "
+            f"i %% 10 = 0, %s + i * interval '1 millisecond' "
+            f"FROM generate_series(1, %s) AS i"
+        )
+        sql_params = [
+            campaigns, len(campaigns), voices, len(voices), categories, len(categories),
+            params['until'], inserts,
+        ]
+
+        best = None
+        with connection.cursor() as cursor:
+            for _ in range(self.repeat):
+                try:
+                    with transaction.atomic():
+                        cursor.execute("SELECT pg_current_wal_insert_lsn()")
+                        lsn = cursor.fetchone()[0]
+                        start = time.perf_counter()
+                        cursor.execute(sql, sql_params)
+                        elapsed = time.perf_counter() - start
+                        cursor.execute("SELECT pg_wal_lsn_diff(pg_current_wal_insert_lsn(), %s)", [lsn])
+                        wal = int(cursor.fetchone()[0])
+                        raise _Rollback
+                except _Rollback:
+                    pass
+                if best is None or elapsed < best[0]:
+                    best = (elapsed, wal)
+        return best
+
+def _indexes_used(plan):
+    names = []
+    if plan.get('Index Name') and plan['Index Name'] not in names:
+        names.append(plan['Index Name'])
+    for child in plan.get('Plans', []):
+        names.extend(name for name in _indexes_used(child) if name not in names)
+    return names
@@ -0,0 +1,83 @@
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+from campaigns.models import ClientCampaignModel, Voice, ResponseCategory
+from calls.ingestion import ingest_calls
+from calls.models import Call
+
+
+class Command(BaseCommand):
+    help = 'Compare per-row Call.objects.create against batched COPY / multi-row INSERT ingestion'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000],
+                            help='Batch sizes to benchmark')
+        parser.add_argument('--client-campaign-model', type=int,
+                            help='ClientCampaignModel id to attach calls to (defaults to the first one)')
+        parser.add_argument('--skip-per-row', action='store_true',
+                            help='Skip the slow per-row Call.objects.create path')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the inserted calls (list id benchmark-...) instead of deleting them afterwards')
+
+    def handle(self, *args, **options):
+        ccm = ClientCampaignModel.objects.order_by('id')
+        if options['client_campaign_model']:
+            ccm = ccm.filter(id=options['client_campaign_model'])
+        ccm = ccm.first()
+        if ccm is None:
+            raise CommandError('No client campaign found; create one before benchmarking')
+
+        voices = list(Voice.objects.values_list('name', flat=True)[:10])
+        categories = list(ResponseCategory.objects.values_list('name', flat=True)[:10])
+        baseline_id = Call.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        # Every benchmark call carries this list id, so cleaning up never touches calls written meanwhile
+        list_id = f'benchmark-{uuid.uuid4().hex[:12]}'
+
+        methods = ['copy', 'insert'] if options['skip_per_row'] else ['per_row', 'copy', 'insert']
+
+        try:
+            for size in options['sizes']:
+                records = [self._record(ccm.id, voices, categories, list_id) for _ in range(size)]
+                for method in methods:
+                    elapsed = self._run(method, records)
+                    self.stdout.write(
+                        f"{method:>8} {size:>8} rows: {elapsed:8.3f}s ({size / elapsed:,.0f} rows/s)"
+                    )
+        finally:
+            if not options['keep']:
+                Call.objects.filter(id__gt=baseline_id, list_id=list_id).delete()
+
+    def _record(self, ccm_id, voices, categories, list_id):
+        return {
+            'client_campaign_model_id': ccm_id,
+            'number': str(random.randint(2000000000, 9999999999)),
+            'stage': random.randint(1, 5),
+            'voice': random.choice(voices) if voices else None,
+            'response_category': random.choice(categories) if categories else None,
+            'list_id': list_id,
+            'transferred': random.random() < 0.1,
+            'transcription': 'Hello, this is a benchmark call transcription.',
+        }
+
+    def _run(self, method, records):
+        start = time.perf_counter()
+        if method == 'per_row':
+            voice_ids = dict(Voice.objects.values_list('name', 'id'))
+            category_ids = dict(ResponseCategory.objects.values_list('name', 'id'))
+            for record in records:
+                Call.objects.create(
+                    client_campaign_model_id=record['client_campaign_model_id'],
+                    number=record['number'],
+                    stage=record['stage'],
+                    voice_id=voice_ids.get(record['voice']),
+                    response_category_id=category_ids.get(record['response_category']),
+                    list_id=record['list_id'],
+                    transferred=record['transferred'],
+                    transcription=record['transcription'],
+                )
+        else:
+            ingest_calls(records, method=method)
+        return time.perf_counter() - start
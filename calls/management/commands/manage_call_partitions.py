@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from calls.partitioning import (
+    INTERVALS, PartitioningError, convert_to_partitioned, create_partitions,
+    drop_expired_partitions, is_partitioned, list_partitions,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Maintain the range-partitioned calls table: pre-create future partitions and '
+        'detach/drop expired ones. Run daily from cron; use --convert once to migrate the existing table.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true',
+                            help='Convert the plain calls table into a partitioned one (takes an exclusive lock)')
+        parser.add_argument('--interval', choices=INTERVALS,
+                            help='Partition size; defaults to CALLS_PARTITION_INTERVAL')
+        parser.add_argument('--premake', type=int,
+                            help='Future partitions to keep ready; defaults to CALLS_PARTITION_PREMAKE')
+        parser.add_argument('--retention', type=int,
+                            help='Past periods to keep, 0 keeps everything; defaults to CALLS_PARTITION_RETENTION')
+        parser.add_argument('--detach-only', action='store_true',
+                            help='Detach expired partitions but keep them as standalone tables')
+        parser.add_argument('--list', action='store_true', help='List partitions and exit')
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or settings.CALLS_PARTITION_INTERVAL
+        if interval not in INTERVALS:
+            raise CommandError(f"CALLS_PARTITION_INTERVAL must be one of {', '.join(INTERVALS)}")
+
+        if options['list']:
+            with connection.cursor() as cursor:
+                for name, start, end in list_partitions(cursor):
+                    bounds = 'DEFAULT' if end is None else f"{start or 'MINVALUE'} .. {end}"
+                    self.stdout.write(f'{name}: {bounds}')
+            return
+
+        try:
+            if options['convert']:
+                created = convert_to_partitioned(interval=interval, ahead=options['premake'])
+                self.stdout.write(self.style.SUCCESS('Converted calls to a partitioned table'))
+            else:
+                with connection.cursor() as cursor:
+                    if not is_partitioned(cursor):
+                        raise CommandError('calls is not partitioned; run with --convert first')
+                created = create_partitions(ahead=options['premake'], interval=interval)
+            removed = drop_expired_partitions(
+                retention=options['retention'], interval=interval, detach_only=options['detach_only']
+            )
+        except PartitioningError as e:
+            raise CommandError(str(e))
+
+        for name in created:
+            self.stdout.write(f'Created {name}')
+        for name in removed:
+            self.stdout.write(f"{'Detached' if options['detach_only'] else 'Dropped'} {name}")
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(created)} partition(s) created, {len(removed)} removed'
+        ))
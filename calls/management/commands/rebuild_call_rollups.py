@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from calls.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the call rollup tables (category, hourly and daily campaign counts) from calls, optionally for a time range'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='ISO datetime; defaults to the oldest call not yet archived')
+        parser.add_argument('--end', help='ISO datetime (exclusive); defaults to now')
+
+    def handle(self, *args, **options):
+        start = self._parse(options['start'], '--start')
+        end = self._parse(options['end'], '--end')
+        if start and end and end <= start:
+            raise CommandError('--end must be after --start')
+
+        rows = rebuild_rollups(start, end)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} rollup row(s)'))
+
+    def _parse(self, value, option):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise CommandError(f'{option} must be an ISO 8601 datetime')
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
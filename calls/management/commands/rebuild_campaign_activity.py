@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from calls.models import Call, CampaignActivity
+from campaigns.models import ClientCampaignModel
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the campaign_activity table from the calls table'
+
+    def handle(self, *args, **kwargs):
+        activity = CampaignActivity._meta.db_table
+        calls = Call._meta.db_table
+        campaigns = ClientCampaignModel._meta.db_table
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {activity}")
+            # One index probe per campaign instead of a GROUP BY over all calls
+            cursor.execute(
+                f"INSERT INTO {activity} (client_campaign_model_id, last_call_at) "
+                f"SELECT ccm.id, latest.last_call_at FROM {campaigns} ccm "
+                f"CROSS JOIN LATERAL ("
+                f"  SELECT MAX(c.timestamp) AS last_call_at FROM {calls} c "
+                f"  WHERE c.client_campaign_model_id = ccm.id"
+                f") latest "
+                f"WHERE latest.last_call_at IS NOT NULL"
+            )
+            rebuilt = cursor.rowcount
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt activity for {rebuilt} client campaign(s)')
+        )
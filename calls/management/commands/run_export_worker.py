@@ -0,0 +1,53 @@
+import os
+import signal
+import socket
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from calls.export_jobs import claim_job, run_job
+
+
+class Command(BaseCommand):
+    help = (
+        'Build queued export jobs to files in EXPORT_DIR. Runs until stopped; start several for more '
+        'throughput. SIGTERM/SIGINT stop after the current chunk and queue the job to resume.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no job can be claimed instead of polling')
+        parser.add_argument('--poll', type=float,
+                            help='Seconds between checks for new jobs; defaults to EXPORT_WORKER_POLL_SECONDS')
+
+    def handle(self, *args, **options):
+        poll = options['poll'] or settings.EXPORT_WORKER_POLL_SECONDS
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        stopping = threading.Event()
+
+        def stop(signum, frame):
+            self.stdout.write('Stopping after the current chunk...')
+            stopping.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        self.stdout.write(f'Export worker {worker} started')
+        while not stopping.is_set():
+            close_old_connections()
+            job = claim_job(worker)
+            if job is None:
+                if options['once']:
+                    break
+                stopping.wait(poll)
+                continue
+
+            self.stdout.write(f'Export {job.pk}: {job.kind} as {job.format} for {job.owner}')
+            status = run_job(job, should_stop=stopping.is_set)
+            job.refresh_from_db()
+            self.stdout.write(
+                f'Export {job.pk}: {status}, {job.rows_written} row(s), {job.bytes_written} bytes'
+                + (f' ({job.error})' if job.error else '')
+            )
+        self.stdout.write(self.style.SUCCESS(f'Export worker {worker} stopped'))
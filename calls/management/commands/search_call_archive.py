@@ -0,0 +1,53 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from calls.archive import ArchiveError, CallArchive
+
+
+class Command(BaseCommand):
+    help = 'Search archived calls by number, campaign and/or time range, printing JSON lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', help='Exact phone number')
+        parser.add_argument('--client-campaign-model', type=int, help='ClientCampaignModel id')
+        parser.add_argument('--start', help='ISO datetime (inclusive)')
+        parser.add_argument('--end', help='ISO datetime (exclusive)')
+        parser.add_argument('--limit', type=int, default=0, help='Stop after this many matches (0 = no limit)')
+        parser.add_argument('--dir', help='Archive directory; defaults to CALL_ARCHIVE_DIR')
+
+    def handle(self, *args, **options):
+        if not any([options['number'], options['client_campaign_model'], options['start'], options['end']]):
+            raise CommandError('Give at least one of --number, --client-campaign-model, --start, --end')
+
+        archive = CallArchive(options['dir'])
+        if not archive.manifest_path.exists():
+            raise CommandError(f'No archive manifest in {archive.directory}')
+
+        matches = 0
+        try:
+            for record in archive.search(
+                number=options['number'],
+                client_campaign_model_id=options['client_campaign_model'],
+                start=self._parse(options['start'], '--start'),
+                end=self._parse(options['end'], '--end'),
+            ):
+                self.stdout.write(json.dumps(record))
+                matches += 1
+                if options['limit'] and matches >= options['limit']:
+                    break
+        except ArchiveError as e:
+            raise CommandError(str(e))
+
+        self.stderr.write(f'{matches} match(es)')
+
+    def _parse(self, value, option):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise CommandError(f'{option} must be an ISO 8601 datetime')
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
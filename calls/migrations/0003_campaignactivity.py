@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-17 00:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0002_call_transferred'),
+        ('campaigns', '0016_remove_clientcampaignmodel_idx_ccm_active'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampaignActivity',
+            fields=[
+                ('client_campaign_model', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='activity', serialize=False, to='campaigns.clientcampaignmodel')),
+                ('last_call_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Campaign Activity',
+                'verbose_name_plural': 'Campaign Activity',
+                'db_table': 'campaign_activity',
+                'indexes': [models.Index(fields=['last_call_at'], name='idx_campaign_activity_last')],
+            },
+        ),
+    ]
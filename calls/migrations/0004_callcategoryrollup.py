@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-17 00:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0003_campaignactivity'),
+        ('campaigns', '0017_clientcampaignmodel_current_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CallCategoryRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField()),
+                ('total_calls', models.BigIntegerField(default=0)),
+                ('response_category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='call_rollups', to='campaigns.responsecategory')),
+                ('voice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='call_rollups', to='campaigns.voice')),
+            ],
+            options={
+                'verbose_name': 'Call Category Rollup',
+                'verbose_name_plural': 'Call Category Rollups',
+                'db_table': 'call_category_rollup',
+                'indexes': [models.Index(fields=['voice', 'bucket_start'], name='idx_ccr_voice_bucket'), models.Index(fields=['response_category', 'bucket_start'], name='idx_ccr_category_bucket')],
+                'constraints': [models.UniqueConstraint(fields=('bucket_start', 'voice', 'response_category'), name='uniq_call_category_rollup', nulls_distinct=False)],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 6.0 on 2026-10-17 00:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0004_callcategoryrollup'),
+        ('campaigns', '0017_clientcampaignmodel_current_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampaignCallDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField()),
+                ('stage', models.IntegerField(blank=True, null=True)),
+                ('total_calls', models.BigIntegerField(default=0)),
+                ('transferred_calls', models.BigIntegerField(default=0)),
+                ('client_campaign_model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='campaigns.clientcampaignmodel')),
+                ('response_category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='campaigns.responsecategory')),
+                ('voice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='campaigns.voice')),
+            ],
+            options={
+                'verbose_name': 'Daily Campaign Calls',
+                'verbose_name_plural': 'Daily Campaign Calls',
+                'db_table': 'campaign_call_rollup_daily',
+                'indexes': [models.Index(fields=['bucket_start'], name='idx_ccdr_bucket')],
+                'constraints': [models.UniqueConstraint(fields=('client_campaign_model', 'bucket_start', 'voice', 'response_category', 'stage'), name='uniq_campaign_call_daily', nulls_distinct=False)],
+            },
+        ),
+        migrations.CreateModel(
+            name='CampaignCallHourlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket_start', models.DateTimeField()),
+                ('stage', models.IntegerField(blank=True, null=True)),
+                ('total_calls', models.BigIntegerField(default=0)),
+                ('transferred_calls', models.BigIntegerField(default=0)),
+                ('client_campaign_model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='campaigns.clientcampaignmodel')),
+                ('response_category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='campaigns.responsecategory')),
+                ('voice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='campaigns.voice')),
+            ],
+            options={
+                'verbose_name': 'Hourly Campaign Calls',
+                'verbose_name_plural': 'Hourly Campaign Calls',
+                'db_table': 'campaign_call_rollup_hourly',
+                'indexes': [models.Index(fields=['bucket_start'], name='idx_cchr_bucket')],
+                'constraints': [models.UniqueConstraint(fields=('client_campaign_model', 'bucket_start', 'voice', 'response_category', 'stage'), name='uniq_campaign_call_hourly', nulls_distinct=False)],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-17 00:28
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+import calls.operations
+
+
+class Migration(migrations.Migration):
+    # Indexes are built and dropped concurrently, outside a transaction
+    atomic = False
+
+    dependencies = [
+        ('calls', '0005_campaigncalldailyrollup_campaigncallhourlyrollup'),
+        ('campaigns', '0017_clientcampaignmodel_current_status'),
+    ]
+
+    operations = [
+        calls.operations.RemoveCallIndexConcurrently(
+            model_name='call',
+            name='idx_calls_number',
+        ),
+        migrations.AddField(
+            model_name='call',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.SearchVector('transcription', config='english'), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        calls.operations.AddCallIndexConcurrently(
+            model_name='call',
+            index=models.Index(fields=['number'], name='idx_calls_number_prefix', opclasses=['varchar_pattern_ops']),
+        ),
+        calls.operations.AddCallIndexConcurrently(
+            model_name='call',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='idx_calls_search_vector'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 6.0 on 2026-10-17 00:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+import calls.operations
+
+
+class Migration(migrations.Migration):
+    # Indexes are built and dropped concurrently, outside a transaction
+    atomic = False
+
+    dependencies = [
+        ('calls', '0006_call_search_vector'),
+        ('campaigns', '0017_clientcampaignmodel_current_status'),
+    ]
+
+    operations = [
+        # New indexes first, so the old ones keep serving queries meanwhile
+        calls.operations.AddCallIndexConcurrently(
+            model_name='call',
+            index=models.Index(fields=['client_campaign_model', '-timestamp'], name='idx_calls_ccm_timestamp'),
+        ),
+        calls.operations.AddCallIndexConcurrently(
+            model_name='call',
+            index=models.Index(fields=['response_category', 'timestamp'], name='idx_calls_category_timestamp'),
+        ),
+        calls.operations.RemoveCallIndexConcurrently(
+            model_name='call',
+            name='idx_call_ccm',
+        ),
+        calls.operations.RemoveCallIndexConcurrently(
+            model_name='call',
+            name='idx_calls_response_cat',
+        ),
+        # Drop the implicit ForeignKey indexes, which duplicate idx_calls_ccm_timestamp,
+        # idx_calls_category_timestamp and idx_calls_voice, leaving the constraints alone
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='call',
+                    name='client_campaign_model',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='calls', to='campaigns.clientcampaignmodel'),
+                ),
+                migrations.AlterField(
+                    model_name='call',
+                    name='response_category',
+                    field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='calls', to='campaigns.responsecategory'),
+                ),
+                migrations.AlterField(
+                    model_name='call',
+                    name='voice',
+                    field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='calls', to='campaigns.voice'),
+                ),
+            ],
+            database_operations=[
+                calls.operations.DropCallIndexConcurrently(
+                    model_name='call',
+                    index=models.Index(fields=['client_campaign_model'], name='calls_client_campaign_model_id_30bc55da'),
+                ),
+                calls.operations.DropCallIndexConcurrently(
+                    model_name='call',
+                    index=models.Index(fields=['response_category'], name='calls_response_category_id_cbd75df0'),
+                ),
+                calls.operations.DropCallIndexConcurrently(
+                    model_name='call',
+                    index=models.Index(fields=['voice'], name='calls_voice_id_87b9a732'),
+                ),
+            ],
+        ),
+    ]
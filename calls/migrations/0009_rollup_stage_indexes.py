@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-17 01:54
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently, outside a transaction
+    atomic = False
+
+    dependencies = [
+        ('calls', '0008_exportjob'),
+        ('campaigns', '0021_configchange'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='campaigncalldailyrollup',
+            index=models.Index(fields=['stage'], name='idx_ccdr_stage'),
+        ),
+        AddIndexConcurrently(
+            model_name='campaigncallhourlyrollup',
+            index=models.Index(fields=['stage'], name='idx_cchr_stage'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-17 02:05
+
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0009_rollup_stage_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaignactivity',
+            name='updated_at',
+            field=models.DateTimeField(db_default=django.db.models.functions.datetime.Now()),
+        ),
+    ]
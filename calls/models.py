@@ -1,10 +1,60 @@
+from datetime import timedelta
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models.functions import Now
+from django.utils import timezone
+
+
+class CallQuerySet(models.QuerySet):
+    """
+    Distinct-value queries answered by skipping along an index, one
+    ``ORDER BY ... LIMIT 1`` probe per distinct value, instead of a DISTINCT
+    over every matching row. Used by the Call and rollup admins' filters and
+    date hierarchies, where there are a handful of values but millions of rows.
+    """
+
+    def distinct_values(self, field_name):
+        """Sorted distinct non-null values of field_name"""
+        probe = self.filter(**{f'{field_name}__isnull': False}).order_by(field_name).values_list(field_name, flat=True)
+        values = []
+        value = probe.first()
+        while value is not None:
+            values.append(value)
+            value = probe.filter(**{f'{field_name}__gt': value}).first()
+        return values
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None, **kwargs):
+        if kind not in ('year', 'month', 'day') or kwargs:
+            return super().datetimes(field_name, kind, order, tzinfo, **kwargs)
+        tzinfo = tzinfo or timezone.get_current_timezone()
+        probe = self.order_by(field_name).values_list(field_name, flat=True)
+        periods = []
+        value = probe.first()
+        while value is not None:
+            value = value.astimezone(tzinfo)
+            start = value.replace(
+                month=value.month if kind != 'year' else 1,
+                day=value.day if kind == 'day' else 1,
+                hour=0, minute=0, second=0, microsecond=0,
+            )
+            periods.append(start)
+            if kind == 'year':
+                end = start.replace(year=start.year + 1)
+            elif kind == 'month':
+                end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+            else:
+                end = (start + timedelta(days=1)).replace(hour=0)
+            value = probe.filter(**{f'{field_name}__gte': end}).first()
+        return periods if order == 'ASC' else periods[::-1]
+
 
 class Call(models.Model):
     client_campaign_model = models.ForeignKey(
         'campaigns.ClientCampaignModel',
         on_delete=models.CASCADE,
-        related_name='calls'
+        related_name='calls',
+        db_index=False  # Covered by idx_calls_ccm_timestamp
     )
     number = models.CharField(max_length=20)
     transcription = models.TextField(blank=True, null=True)
@@ -14,32 +64,278 @@ class Call(models.Model):
         on_delete=models.SET_NULL,
         related_name='calls',
         blank=True,
-        null=True
+        null=True,
+        db_index=False  # Covered by idx_calls_voice
     )
     response_category = models.ForeignKey(
         'campaigns.ResponseCategory',
         on_delete=models.SET_NULL,
         related_name='calls',
         blank=True,
-        null=True
+        null=True,
+        db_index=False  # Covered by idx_calls_category_timestamp
     )
     list_id = models.TextField(blank=True, null=True)
     transferred = models.BooleanField(default=False)
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Maintained by PostgreSQL; used by the admin full-text search
+    search_vector = models.GeneratedField(
+        expression=SearchVector('transcription', config='english'),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = CallQuerySet.as_manager()
 
     class Meta:
         db_table = 'calls'
         verbose_name = 'Call Record'
         verbose_name_plural = 'Call Records'
         indexes = [
-            models.Index(fields=['client_campaign_model'], name='idx_call_ccm'),
-            models.Index(fields=['number'], name='idx_calls_number'),
+            # "Calls for campaign X since T" and the per-campaign latest call
+            models.Index(fields=['client_campaign_model', '-timestamp'], name='idx_calls_ccm_timestamp'),
+            # Pattern ops so number prefix searches can use the index
+            models.Index(fields=['number'], name='idx_calls_number_prefix', opclasses=['varchar_pattern_ops']),
+            # Ordered scans for the changelist's keyset pages and date hierarchy
             models.Index(fields=['timestamp'], name='idx_calls_timestamp'),
             models.Index(fields=['stage'], name='idx_calls_stage'),
             models.Index(fields=['list_id'], name='idx_calls_list_id'),
             models.Index(fields=['voice'], name='idx_calls_voice'),
-            models.Index(fields=['response_category'], name='idx_calls_response_cat'),
+            # "Calls with category Y in range", optionally for one campaign
+            models.Index(fields=['response_category', 'timestamp'], name='idx_calls_category_timestamp'),
+            GinIndex(fields=['search_vector'], name='idx_calls_search_vector'),
+        ]
+
+    def __str__(self):
+        return f"Call {self.id} - {self.number}"
+
+
+class CampaignActivity(models.Model):
+    """Time of the latest call per client campaign, maintained by call ingestion"""
+
+    # A campaign with a call inside this window counts as active
+    ACTIVE_WINDOW = timedelta(minutes=1)
+
+    client_campaign_model = models.OneToOneField(
+        'campaigns.ClientCampaignModel',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='activity'
+    )
+    last_call_at = models.DateTimeField()
+    # Set by every ingest of the campaign's calls, late ones included (which
+    # leave last_call_at alone); versions its dashboard metrics
+    updated_at = models.DateTimeField(db_default=Now())
+
+    class Meta:
+        db_table = 'campaign_activity'
+        verbose_name = 'Campaign Activity'
+        verbose_name_plural = 'Campaign Activity'
+        indexes = [
+            models.Index(fields=['last_call_at'], name='idx_campaign_activity_last'),
+        ]
+
+    def __str__(self):
+        return f"{self.client_campaign_model_id} - {self.last_call_at}"
+
+    @classmethod
+    def active_since(cls):
+        """Cut-off timestamp for a campaign to count as active"""
+        return timezone.now() - cls.ACTIVE_WINDOW
+
+    @property
+    def is_active(self):
+        return self.last_call_at >= self.active_since()
+
+
+
+class CallCategoryRollup(models.Model):
+    """Hourly call counts per voice and response category, maintained by call ingestion"""
+    bucket_start = models.DateTimeField()
+    # Deleting a voice or category merges its counts into the NULL rows first (rollups.merge_deleted)
+    voice = models.ForeignKey(
+        'campaigns.Voice',
+        on_delete=models.CASCADE,
+        related_name='call_rollups',
+        blank=True,
+        null=True
+    )
+    response_category = models.ForeignKey(
+        'campaigns.ResponseCategory',
+        on_delete=models.CASCADE,
+        related_name='call_rollups',
+        blank=True,
+        null=True
+    )
+    total_calls = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'call_category_rollup'
+        verbose_name = 'Call Category Rollup'
+        verbose_name_plural = 'Call Category Rollups'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['bucket_start', 'voice', 'response_category'],
+                name='uniq_call_category_rollup',
+                nulls_distinct=False,
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['voice', 'bucket_start'], name='idx_ccr_voice_bucket'),
+            models.Index(fields=['response_category', 'bucket_start'], name='idx_ccr_category_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.bucket_start} - {self.total_calls}"
+
+
+class CampaignCallRollup(models.Model):
+    """Call counts per campaign, voice, response category and stage for one time bucket"""
+    client_campaign_model = models.ForeignKey(
+        'campaigns.ClientCampaignModel',
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    bucket_start = models.DateTimeField()
+    # Deleting a voice or category merges its counts into the NULL rows first (rollups.merge_deleted)
+    voice = models.ForeignKey(
+        'campaigns.Voice',
+        on_delete=models.CASCADE,
+        related_name='+',
+        blank=True,
+        null=True
+    )
+    response_category = models.ForeignKey(
+        'campaigns.ResponseCategory',
+        on_delete=models.CASCADE,
+        related_name='+',
+        blank=True,
+        null=True
+    )
+    stage = models.IntegerField(blank=True, null=True)
+    total_calls = models.BigIntegerField(default=0)
+    transferred_calls = models.BigIntegerField(default=0)
+
+    objects = CallQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"{self.client_campaign_model_id} - {self.bucket_start} - {self.total_calls}"
+
+
+class CampaignCallHourlyRollup(CampaignCallRollup):
+    """Hourly campaign call counts, maintained by call ingestion"""
+
+    class Meta:
+        db_table = 'campaign_call_rollup_hourly'
+        verbose_name = 'Hourly Campaign Calls'
+        verbose_name_plural = 'Hourly Campaign Calls'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['client_campaign_model', 'bucket_start', 'voice', 'response_category', 'stage'],
+                name='uniq_campaign_call_hourly',
+                nulls_distinct=False,
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['bucket_start'], name='idx_cchr_bucket'),
+            models.Index(fields=['stage'], name='idx_cchr_stage'),
+        ]
+
+
+class CampaignCallDailyRollup(CampaignCallRollup):
+    """Daily (UTC) campaign call counts, maintained by call ingestion"""
+
+    class Meta:
+        db_table = 'campaign_call_rollup_daily'
+        verbose_name = 'Daily Campaign Calls'
+        verbose_name_plural = 'Daily Campaign Calls'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['client_campaign_model', 'bucket_start', 'voice', 'response_category', 'stage'],
+                name='uniq_campaign_call_daily',
+                nulls_distinct=False,
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['bucket_start'], name='idx_ccdr_bucket'),
+            models.Index(fields=['stage'], name='idx_ccdr_stage'),
+        ]
+
+
+class ExportJob(models.Model):
+    """
+    A call or campaign export built to a file by the export worker
+    (see calls/export_jobs.py), resumable from ``last_id``.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+        (CANCELLED, 'Cancelled'),
+    ]
+    KIND_CHOICES = [
+        ('calls', 'Calls'),
+        ('campaigns', 'Client campaigns'),
+    ]
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('ndjson', 'NDJSON'),
+    ]
+
+    owner = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.CASCADE,
+        related_name='export_jobs'
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    # Changelist query string (filters, date hierarchy, search) the export applies
+    query_string = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    rows_total = models.BigIntegerField(blank=True, null=True, help_text="Estimated rows to export")
+    rows_written = models.BigIntegerField(default=0)
+    bytes_written = models.BigIntegerField(default=0)
+    # Rows are exported in id order up to max_id, fixed when the job first starts
+    last_id = models.BigIntegerField(default=0)
+    max_id = models.BigIntegerField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'export_jobs'
+        verbose_name = 'Export Job'
+        verbose_name_plural = 'Export Jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='idx_export_jobs_status'),
+            models.Index(fields=['owner', 'status'], name='idx_export_jobs_owner'),
         ]
 
     def __str__(self):
-        return f"Call {self.id} - {self.number}"
\ No newline at end of file
+        return f"{self.get_kind_display()} export {self.id} ({self.status})"
+
+    @property
+    def file_name(self):
+        return f"{self.kind}-export-{self.id}.{self.format}"
+
+    @property
+    def progress(self):
+        """Percentage done, from the estimated total"""
+        if self.status == self.DONE:
+            return 100
+        if not self.rows_total:
+            return 0
+        return min(99, int(self.rows_written * 100 / self.rows_total))
@@ -0,0 +1,131 @@
+"""
+Migration operations that build and drop indexes on calls without blocking
+writes, whether or not the table has been partitioned (see partitioning.py).
+
+PostgreSQL refuses CREATE/DROP INDEX CONCURRENTLY on a partitioned table.
+For one, the index is created invalid ON ONLY the parent, then built
+concurrently on each partition and attached; the parent index becomes
+valid once every partition has its index. Dropping a partitioned index has
+no concurrent form, but dropping is quick, so it runs as a plain DROP INDEX.
+Migrations using these operations must set ``atomic = False``.
+"""
+from django.contrib.postgres.operations import (
+    AddIndexConcurrently, NotInTransactionMixin, RemoveIndexConcurrently,
+)
+from django.db.migrations.operations.base import Operation
+
+
+def partitions_of(schema_editor, table):
+    """Partition table names of table, or None if it is not partitioned"""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))",
+            [table]
+        )
+        if not cursor.fetchone()[0]:
+            return None
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s) ORDER BY c.relname",
+            [table]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def add_index(schema_editor, model, index):
+    partitions = partitions_of(schema_editor, model._meta.db_table)
+    if partitions is None:
+        schema_editor.add_index(model, index, concurrently=True)
+        return
+
+    quote = schema_editor.quote_name
+    statement = index.create_sql(model, schema_editor)
+    statement.parts['table'] = f"ONLY {quote(model._meta.db_table)}"
+    schema_editor.execute(statement)
+    for partition in partitions:
+        name = f"{partition}_{index.name}"
+        statement = index.create_sql(model, schema_editor, concurrently=True)
+        statement.parts['table'] = quote(partition)
+        statement.parts['name'] = quote(name)
+        schema_editor.execute(statement)
+        schema_editor.execute(f"ALTER INDEX {quote(index.name)} ATTACH PARTITION {quote(name)}")
+
+
+def remove_index(schema_editor, model, index):
+    partitions = partitions_of(schema_editor, model._meta.db_table)
+    schema_editor.remove_index(model, index, concurrently=partitions is None)
+
+
+class AddCallIndexConcurrently(AddIndexConcurrently):
+    """AddIndexConcurrently that also works once calls is partitioned"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        self._ensure_not_in_transaction(schema_editor)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            add_index(schema_editor, model, self.index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        self._ensure_not_in_transaction(schema_editor)
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            remove_index(schema_editor, model, self.index)
+
+
+class RemoveCallIndexConcurrently(RemoveIndexConcurrently):
+    """RemoveIndexConcurrently that also works once calls is partitioned"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        self._ensure_not_in_transaction(schema_editor)
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            index = from_state.models[app_label, self.model_name_lower].get_index_by_name(self.name)
+            remove_index(schema_editor, model, index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        self._ensure_not_in_transaction(schema_editor)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            index = to_state.models[app_label, self.model_name_lower].get_index_by_name(self.name)
+            add_index(schema_editor, model, index)
+
+
+class DropCallIndexConcurrently(NotInTransactionMixin, Operation):
+    """
+    Drop an index that is not part of the model state, such as the one Django
+    creates for a ForeignKey, and rebuild it on reverse.
+
+    Pair with a state-only AlterField(db_index=False): a real AlterField
+    would also drop and re-validate the foreign key constraint.
+    """
+    atomic = False
+    reversible = True
+
+    def __init__(self, model_name, index):
+        self.model_name = model_name
+        self.index = index
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        self._ensure_not_in_transaction(schema_editor)
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            remove_index(schema_editor, model, self.index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        self._ensure_not_in_transaction(schema_editor)
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            add_index(schema_editor, model, self.index)
+
+    def deconstruct(self):
+        return self.__class__.__name__, [], {'model_name': self.model_name, 'index': self.index}
+
+    def describe(self):
+        return f"Concurrently drop index {self.index.name} from {self.model_name}"
+
+    @property
+    def migration_name_fragment(self):
+        return f"drop_{self.model_name.lower()}_{self.index.name.lower()}"
@@ -0,0 +1,176 @@
+"""
+Pagination for the Call admin without COUNT(*) or OFFSET.
+
+``estimated_count`` answers from the planner's statistics: ``pg_class``
+row estimates for the whole table (summed over partitions) and the
+``EXPLAIN`` row estimate for a filtered queryset. ``KeysetChangeList`` pages
+the default newest-first ordering by keyset on (timestamp, id), so every
+page costs the same however deep it is; sorting by a column or searching
+falls back to numbered pages over the estimated count. As the estimate can
+be off either way, those pages are not cut off at it: pages past it still
+show their rows, and pages past the last row are empty.
+"""
+import json
+
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connection
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+
+# Query string parameters holding the keyset cursor, "<timestamp>_<id>"
+AFTER_VAR = 'after'
+BEFORE_VAR = 'before'
+
+# Results estimated at up to this many rows are counted exactly (with a bounded COUNT)
+EXACT_COUNT_LIMIT = 1000
+
+
+def estimated_count(queryset):
+    """Planner's estimate of the number of rows in queryset"""
+    queryset = queryset.order_by()
+    if not queryset.query.where:
+        table = queryset.model._meta.db_table
+        with connection.cursor() as cursor:
+            # Partitioned parents have no rows of their own; sum the partitions.
+            # reltuples is -1 for a table that was never analyzed
+            cursor.execute(
+                """
+                SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint
+                FROM pg_class c
+                WHERE c.oid = %s::regclass
+                   OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass)
+                """,
+                [table, table]
+            )
+            return cursor.fetchone()[0]
+
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator whose count is the planner's estimate instead of COUNT(*),
+    except for small results, which the admin would otherwise show unpaged
+    on an underestimate. Any page number from 1 up is valid.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate > EXACT_COUNT_LIMIT:
+            return estimate
+        exact = self.object_list.order_by()[:EXACT_COUNT_LIMIT + 1].count()
+        return exact if exact <= EXACT_COUNT_LIMIT else max(estimate, exact)
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            # Past the estimated last page, which may still hold rows
+            number = int(number)
+            if number < 1:
+                raise
+            return number
+
+    def page(self, number):
+        # Not cut off at the estimated count; a page past the last row is empty
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(self.object_list[bottom:bottom + self.per_page], number, self)
+
+
+def _encode_cursor(call):
+    return f"{call.timestamp.isoformat()}_{call.pk}"
+
+
+def _decode_cursor(value):
+    timestamp, _, pk = value.rpartition('_')
+    timestamp = parse_datetime(timestamp)
+    if timestamp is None or not pk.isdigit():
+        raise IncorrectLookupParameters(f"Invalid cursor {value!r}")
+    return timestamp, int(pk)
+
+
+class KeysetChangeList(ChangeList):
+    """
+    ChangeList for Call that pages newest-first by (timestamp, id).
+
+    Filters, date hierarchy, search and the admin's get_queryset scoping all
+    apply as usual; only the page slicing and the count differ.
+    """
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(AFTER_VAR, None)
+        lookup_params.pop(BEFORE_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Changing filters or sorting starts again from the newest page
+        new_params = new_params or {}
+        remove = list(remove or [])
+        for var in (AFTER_VAR, BEFORE_VAR):
+            if var not in new_params:
+                remove.append(var)
+        return super().get_query_string(new_params, remove)
+
+    @property
+    def keyset(self):
+        return ORDER_VAR not in self.params and not self.query
+
+    def get_results(self, request):
+        if not self.keyset:
+            return super().get_results(request)
+
+        per_page = self.list_per_page
+        queryset = self.queryset.order_by('-timestamp', '-id')
+        has_newer = has_older = False
+        if self.params.get(BEFORE_VAR):
+            timestamp, pk = _decode_cursor(self.params[BEFORE_VAR])
+            rows = list(
+                queryset.filter(timestamp__gte=timestamp).exclude(timestamp=timestamp, id__lte=pk)
+                .order_by('timestamp', 'id')[:per_page + 1]
+            )
+            has_newer = len(rows) > per_page
+            rows = rows[:per_page][::-1]
+            has_older = True
+        else:
+            if self.params.get(AFTER_VAR):
+                timestamp, pk = _decode_cursor(self.params[AFTER_VAR])
+                queryset = queryset.filter(timestamp__lte=timestamp).exclude(timestamp=timestamp, id__gte=pk)
+                has_newer = True
+            rows = list(queryset[:per_page + 1])
+            has_older = len(rows) > per_page
+            rows = rows[:per_page]
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, per_page)
+        if has_newer or has_older:
+            result_count = paginator.count
+        else:
+            # Everything fits on this page, so the count is exact
+            result_count = len(rows)
+
+        self.result_count = result_count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = rows
+        self.can_show_all = False
+        self.multi_page = has_newer or has_older
+        self.paginator = paginator
+        self.newest_url = self.get_query_string() if has_newer else None
+        self.newer_url = self.get_query_string({BEFORE_VAR: _encode_cursor(rows[0])}) if has_newer and rows else None
+        self.older_url = self.get_query_string({AFTER_VAR: _encode_cursor(rows[-1])}) if has_older and rows else None
@@ -0,0 +1,264 @@
+"""
+Native PostgreSQL range partitioning of the calls table by timestamp.
+
+``convert_to_partitioned`` turns the existing table into a partitioned one
+in a single transaction: the old table is kept, untouched, as the
+``calls_legacy`` partition covering everything before the first new
+period, so no rows are copied. After that, ``create_partitions`` pre-creates
+daily or monthly partitions and ``drop_expired_partitions`` detaches (and
+optionally drops) partitions older than the retention window.
+
+The Call model is unchanged. The primary key becomes (id, timestamp)
+because PostgreSQL requires the partition key in unique constraints; ids
+still come from the calls_id_seq sequence, so lookups by id keep working.
+Queries filtering on timestamp (date_hierarchy, list_filter) are pruned
+to the matching partitions.
+"""
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Call
+
+
+DAILY = 'daily'
+MONTHLY = 'monthly'
+INTERVALS = (DAILY, MONTHLY)
+
+TABLE = Call._meta.db_table
+LEGACY_TABLE = f'{TABLE}_legacy'
+DEFAULT_PARTITION = f'{TABLE}_default'
+SEQUENCE = f'{TABLE}_id_seq'
+
+_BOUND_RE = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+
+class PartitioningError(Exception):
+    pass
+
+
+def period_start(timestamp, interval):
+    timestamp = timestamp.astimezone(dt_timezone.utc)
+    if interval == DAILY:
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    return timestamp.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_period(start, interval):
+    if interval == DAILY:
+        return start + timedelta(days=1)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def previous_period(start, interval):
+    if interval == DAILY:
+        return start - timedelta(days=1)
+    if start.month == 1:
+        return start.replace(year=start.year - 1, month=12)
+    return start.replace(month=start.month - 1)
+
+
+def partition_name(start, interval):
+    if interval == DAILY:
+        return f'{TABLE}_p{start:%Y_%m_%d}'
+    return f'{TABLE}_p{start:%Y_%m}'
+
+
+def is_partitioned(cursor):
+    cursor.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))",
+        [TABLE]
+    )
+    return cursor.fetchone()[0]
+
+
+def _parse_bound(value):
+    value = value.strip()
+    if value == 'MINVALUE':
+        return None
+    if value == 'MAXVALUE':
+        return datetime.max.replace(tzinfo=dt_timezone.utc)
+    return datetime.fromisoformat(value.strip("'")).astimezone(dt_timezone.utc)
+
+
+def list_partitions(cursor):
+    """Return [(name, start, end)] for every partition; start/end are None for DEFAULT/MINVALUE"""
+    cursor.execute(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(%s) ORDER BY c.relname",
+        [TABLE]
+    )
+    partitions = []
+    for name, bound in cursor.fetchall():
+        match = _BOUND_RE.search(bound)
+        if match:
+            partitions.append((name, _parse_bound(match.group(1)), _parse_bound(match.group(2))))
+        else:
+            partitions.append((name, None, None))
+    return partitions
+
+
+def _insertable_columns(cursor, table):
+    cursor.execute(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = %s AND is_generated = 'NEVER' "
+        "ORDER BY ordinal_position",
+        [table]
+    )
+    return ', '.join(connection.ops.quote_name(row[0]) for row in cursor.fetchall())
+
+
+def _create_partition(cursor, name, start, end):
+    """Create one partition, moving any matching rows out of the default partition first"""
+    bounds = "FOR VALUES FROM (%s) TO (%s)"
+    cursor.execute(
+        f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE timestamp >= %s AND timestamp < %s)",
+        [start, end]
+    )
+    if not cursor.fetchone()[0]:
+        cursor.execute(f"CREATE TABLE {name} PARTITION OF {TABLE} {bounds}", [start, end])
+        return
+
+    columns = _insertable_columns(cursor, TABLE)
+    cursor.execute(
+        f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED)"
+    )
+    cursor.execute(
+        f"INSERT INTO {name} ({columns}) SELECT {columns} FROM {DEFAULT_PARTITION} "
+        f"WHERE timestamp >= %s AND timestamp < %s",
+        [start, end]
+    )
+    cursor.execute(f"DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= %s AND timestamp < %s", [start, end])
+    cursor.execute(f"ALTER TABLE {TABLE} ATTACH PARTITION {name} {bounds}", [start, end])
+
+
+def create_partitions(ahead=None, interval=None, now=None):
+    """Make sure partitions exist from the current period up to ``ahead`` periods in the future"""
+    interval = interval or settings.CALLS_PARTITION_INTERVAL
+    ahead = settings.CALLS_PARTITION_PREMAKE if ahead is None else ahead
+    start = period_start(now or timezone.now(), interval)
+
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not is_partitioned(cursor):
+            raise PartitioningError(f"{TABLE} is not partitioned; run with --convert first")
+        existing = [(s, e) for _, s, e in list_partitions(cursor) if e is not None]
+
+        for _ in range(ahead + 1):
+            end = next_period(start, interval)
+            # Skip periods already covered, e.g. by the legacy partition or a different interval
+            if not any((s is None or s < end) and start < e for s, e in existing):
+                name = partition_name(start, interval)
+                _create_partition(cursor, name, start, end)
+                existing.append((start, end))
+                created.append(name)
+            start = end
+    return created
+
+
+def drop_expired_partitions(retention=None, interval=None, detach_only=False, now=None):
+    """
+    Detach partitions entirely older than ``retention`` periods and drop them
+    unless ``detach_only``. A retention of 0 keeps everything.
+    """
+    interval = interval or settings.CALLS_PARTITION_INTERVAL
+    retention = settings.CALLS_PARTITION_RETENTION if retention is None else retention
+    if not retention:
+        return []
+
+    cutoff = period_start(now or timezone.now(), interval)
+    for _ in range(retention):
+        cutoff = previous_period(cutoff, interval)
+
+    removed = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for name, start, end in list_partitions(cursor):
+            if end is None or end > cutoff:
+                continue
+            cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {name}")
+            if not detach_only:
+                cursor.execute(f"DROP TABLE {name}")
+            removed.append(name)
+    return removed
+
+
+def convert_to_partitioned(interval=None, ahead=None):
+    """
+    Convert the plain calls table into a range-partitioned one.
+
+    The current table becomes the calls_legacy partition covering everything
+    up to the end of the period holding its newest row; new partitions start
+    from there. Runs in one transaction holding an exclusive lock on calls.
+    Attaching calls_legacy builds its (id, timestamp) primary key index and
+    validates the partition bound, each a single pass over the old table.
+    """
+    interval = interval or settings.CALLS_PARTITION_INTERVAL
+    if interval not in INTERVALS:
+        raise PartitioningError(f"Unknown partition interval '{interval}'")
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if is_partitioned(cursor):
+            raise PartitioningError(f"{TABLE} is already partitioned")
+
+        cursor.execute(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"SELECT MAX(id), MAX(timestamp) FROM {TABLE}")
+        max_id, max_timestamp = cursor.fetchone()
+        boundary = next_period(period_start(max_timestamp or timezone.now(), interval), interval)
+
+        # Capture index and foreign key definitions while they still name the old table
+        cursor.execute(
+            "SELECT i.relname, pg_get_indexdef(i.oid) FROM pg_index x "
+            "JOIN pg_class i ON i.oid = x.indexrelid "
+            "WHERE x.indrelid = to_regclass(%s) "
+            "AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)",
+            [TABLE]
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [TABLE]
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p'",
+            [TABLE]
+        )
+        primary_key = cursor.fetchone()
+
+        # Keep the old table as-is, freeing the names the parent will use
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {LEGACY_TABLE}")
+        for index_name, _ in indexes:
+            cursor.execute(f"ALTER INDEX {index_name} RENAME TO {index_name[:56]}_legacy")
+        if primary_key:
+            cursor.execute(f"ALTER TABLE {LEGACY_TABLE} DROP CONSTRAINT {primary_key[0]}")
+        cursor.execute(f"ALTER TABLE {LEGACY_TABLE} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+        cursor.execute(f"ALTER TABLE {LEGACY_TABLE} ALTER COLUMN id DROP DEFAULT")
+
+        cursor.execute(
+            f"CREATE TABLE {TABLE} (LIKE {LEGACY_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS "
+            f"INCLUDING GENERATED INCLUDING STORAGE) PARTITION BY RANGE (timestamp)"
+        )
+        cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {SEQUENCE} AS bigint OWNED BY {TABLE}.id")
+        cursor.execute("SELECT setval(%s, %s, %s)", [SEQUENCE, max_id or 1, max_id is not None])
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')")
+        cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (id, timestamp)")
+        for _, definition in indexes:
+            cursor.execute(definition)
+        for constraint_name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {constraint_name} {definition}")
+
+        # Matching indexes and foreign keys on the legacy table are reused on attach
+        cursor.execute(
+            f"ALTER TABLE {TABLE} ATTACH PARTITION {LEGACY_TABLE} FOR VALUES FROM (MINVALUE) TO (%s)",
+            [boundary]
+        )
+        cursor.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT")
+
+    return create_partitions(ahead=ahead, interval=interval, now=boundary)
@@ -0,0 +1,226 @@
+"""
+Pre-aggregated call counts.
+
+Rollup tables are kept up to date incrementally by call ingestion (see
+``apply_rollups``, called inside the ingestion transaction) and can be
+rebuilt from the ``calls`` table for any time range with ``rebuild_rollups``.
+
+Deleting a voice or response category keeps its calls (their foreign key
+is set to NULL), so its rollup counts are merged into the NULL rows of the
+same buckets first rather than cascading away (``merge_deleted``).
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.db.models.signals import pre_delete
+
+from .models import Call, CallCategoryRollup, CampaignCallHourlyRollup, CampaignCallDailyRollup
+
+
+# Positions in ingestion.CALL_COLUMNS
+ROW_POSITIONS = {
+    'client_campaign_model_id': 0,
+    'stage': 3,
+    'voice_id': 4,
+    'response_category_id': 5,
+    'transferred': 7,
+    'timestamp': 8,
+}
+
+# Count column -> (SQL aggregate used by rebuilds, increment for one ingested row)
+COUNT_COLUMNS = {
+    'total_calls': ("COUNT(*)", lambda row: 1),
+    'transferred_calls': ("COUNT(*) FILTER (WHERE transferred)", lambda row: int(row[ROW_POSITIONS['transferred']])),
+}
+
+
+class Rollup:
+    def __init__(self, model, unit, key_columns, count_columns):
+        self.model = model
+        self.unit = unit
+        self.key_columns = key_columns
+        self.count_columns = count_columns
+
+    @property
+    def table(self):
+        return self.model._meta.db_table
+
+
+ROLLUPS = [
+    Rollup(CallCategoryRollup, 'hour', ['voice_id', 'response_category_id'], ['total_calls']),
+    Rollup(
+        CampaignCallHourlyRollup, 'hour',
+        ['client_campaign_model_id', 'voice_id', 'response_category_id', 'stage'],
+        ['total_calls', 'transferred_calls'],
+    ),
+    Rollup(
+        CampaignCallDailyRollup, 'day',
+        ['client_campaign_model_id', 'voice_id', 'response_category_id', 'stage'],
+        ['total_calls', 'transferred_calls'],
+    ),
+]
+
+
+def truncate(timestamp, unit):
+    """Start of the UTC hour or day containing timestamp"""
+    timestamp = timestamp.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if unit == 'day':
+        timestamp = timestamp.replace(hour=0)
+    return timestamp
+
+
+def hour_bucket(timestamp):
+    """Start of the UTC hour containing timestamp"""
+    return truncate(timestamp, 'hour')
+
+
+def day_bucket(timestamp):
+    """Start of the UTC day containing timestamp"""
+    return truncate(timestamp, 'day')
+
+
+def upsert_counts(cursor, table, key_columns, count_columns, counts):
+    """
+    Add counts to a rollup table.
+
+    ``counts`` maps a key tuple (in key_columns order) to a tuple of
+    increments (in count_columns order).
+    """
+    if not counts:
+        return
+    columns = [*key_columns, *count_columns]
+    placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    values = ', '.join([placeholder] * len(counts))
+    params = [value for key, increments in sorted(counts.items(), key=_sort_key) for value in (*key, *increments)]
+    updates = ', '.join(f"{column} = {table}.{column} + EXCLUDED.{column}" for column in count_columns)
+    cursor.execute(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES {values} "
+        f"ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET {updates}",
+        params
+    )
+
+
+def _sort_key(item):
+    # Consistent ordering keeps concurrent upserts from deadlocking; None sorts first
+    return tuple((value is not None, value) for value in item[0])
+
+
+def apply_rollups(cursor, rows):
+    """Fold a batch of ingested rows (ingestion.CALL_COLUMNS order) into the rollup tables"""
+    for rollup in ROLLUPS:
+        key_positions = [ROW_POSITIONS[column] for column in rollup.key_columns]
+        increments = [COUNT_COLUMNS[column][1] for column in rollup.count_columns]
+
+        counts = {}
+        for row in rows:
+            key = (truncate(row[ROW_POSITIONS['timestamp']], rollup.unit), *(row[i] for i in key_positions))
+            current = counts.get(key) or [0] * len(increments)
+            counts[key] = [total + increment(row) for total, increment in zip(current, increments)]
+
+        upsert_counts(
+            cursor,
+            rollup.table,
+            ['bucket_start', *rollup.key_columns],
+            rollup.count_columns,
+            {key: tuple(values) for key, values in counts.items()},
+        )
+
+
+def _step(unit):
+    return timedelta(days=1) if unit == 'day' else timedelta(hours=1)
+
+
+def _round_out(start, end, unit):
+    start = truncate(start, unit)
+    if end:
+        rounded = truncate(end, unit)
+        end = rounded if rounded == end else rounded + _step(unit)
+    return start, end
+
+
+def rebuild_rollups(start=None, end=None):
+    """
+    Recompute the rollup tables from calls for [start, end).
+
+    Bounds are rounded out to whole buckets of each table (hours or days).
+    Without start the rebuild begins at the oldest call still in the calls
+    table: older rollup rows count archived calls and are kept, and so is
+    the bucket holding that call, which may count archived calls too.
+    Returns the number of rollup rows written.
+    """
+    oldest = None
+    if start is None:
+        oldest = Call.objects.order_by('timestamp').values_list('timestamp', flat=True).first()
+        if oldest is None:
+            return 0
+
+    written = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        for rollup in ROLLUPS:
+            range_start, range_end = _round_out(start or oldest, end, rollup.unit)
+            if oldest is not None and range_start < oldest:
+                range_start += _step(rollup.unit)
+            if range_end and range_end <= range_start:
+                continue
+            conditions, params = ["timestamp >= %s"], [range_start]
+            if range_end:
+                conditions.append("timestamp < %s")
+                params.append(range_end)
+            calls_where = f"WHERE {' AND '.join(conditions)}"
+            rollup_where = calls_where.replace('timestamp', 'bucket_start')
+
+            keys = ', '.join(rollup.key_columns)
+            aggregates = ', '.join(COUNT_COLUMNS[column][0] for column in rollup.count_columns)
+            group_by = ', '.join(str(i) for i in range(1, len(rollup.key_columns) + 2))
+
+            cursor.execute(f"DELETE FROM {rollup.table} {rollup_where}", params)
+            cursor.execute(
+                f"INSERT INTO {rollup.table} (bucket_start, {keys}, {', '.join(rollup.count_columns)}) "
+                f"SELECT date_trunc('{rollup.unit}', timestamp AT TIME ZONE 'UTC') AT TIME ZONE 'UTC', "
+                f"{keys}, {aggregates} "
+                f"FROM {Call._meta.db_table} {calls_where} "
+                f"GROUP BY {group_by}",
+                params
+            )
+            written += cursor.rowcount
+    return written
+
+
+# Models whose rows calls keep (SET_NULL) when deleted -> rollup column naming them
+DELETED_COLUMNS = {
+    'campaigns.Voice': 'voice_id',
+    'campaigns.ResponseCategory': 'response_category_id',
+}
+
+
+def merge_into_null(column, value):
+    """Move the counts of rollup rows whose column (voice_id or response_category_id) is value onto NULL"""
+    with transaction.atomic(), connection.cursor() as cursor:
+        for rollup in ROLLUPS:
+            keys = ['bucket_start', *rollup.key_columns]
+            selected = ', '.join('NULL' if key == column else key for key in keys)
+            grouped = [key for key in keys if key != column]
+            group_by = ', '.join(grouped)
+            order_by = ', '.join(f"{key} NULLS FIRST" for key in grouped)
+            sums = ', '.join(f"SUM({count})" for count in rollup.count_columns)
+            updates = ', '.join(
+                f"{count} = {rollup.table}.{count} + EXCLUDED.{count}" for count in rollup.count_columns
+            )
+            # Sorted like upsert_counts, so this does not deadlock against ingestion
+            cursor.execute(
+                f"INSERT INTO {rollup.table} ({', '.join(keys)}, {', '.join(rollup.count_columns)}) "
+                f"SELECT {selected}, {sums} FROM {rollup.table} WHERE {column} = %s "
+                f"GROUP BY {group_by} ORDER BY {order_by} "
+                f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates}",
+                [value]
+            )
+            cursor.execute(f"DELETE FROM {rollup.table} WHERE {column} = %s", [value])
+
+
+def merge_deleted(sender, instance, **kwargs):
+    merge_into_null(DELETED_COLUMNS[sender._meta.label], instance.pk)
+
+
+def connect_signals():
+    for label in DELETED_COLUMNS:
+        pre_delete.connect(merge_deleted, sender=label, dispatch_uid=f'rollups:{label}:pre_delete')
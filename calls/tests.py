@@ -1,3 +1,100 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone as dt_timezone
+from urllib.parse import parse_qs, urlsplit
 
-# Create your tests here.
+from django.contrib import admin
+from django.test import RequestFactory, TestCase
+
+from accounts.models import Role, User
+from campaigns.models import Campaign, CampaignModel, ClientCampaignModel, Model, Voice
+from clients.models import Client
+from .ingestion import CallIngestionError, ingest_calls
+from .models import Call, CallCategoryRollup, CampaignActivity, CampaignCallDailyRollup, CampaignCallHourlyRollup
+
+
+class CallTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        client_role = Role.objects.create(name=Role.CLIENT)
+        cls.admin_user = User.objects.create_superuser('admin', 'secret')
+        client_user = User.objects.create_user('client', 'secret', role=client_role)
+        client = Client.objects.create(client=client_user, name='Acme', assembly_api_key='k')
+        campaign_model = CampaignModel.objects.create(
+            campaign=Campaign.objects.create(name='Solar'), model=Model.objects.create(name='Basic')
+        )
+        cls.campaign = ClientCampaignModel.objects.create(
+            client=client, campaign_model=campaign_model, start_date=datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+        )
+        Voice.objects.create(name='Ava')
+
+    def records(self, count, start=datetime(2026, 3, 1, 9, tzinfo=dt_timezone.utc)):
+        return [
+            {
+                'client_campaign_model_id': self.campaign.pk,
+                'number': f'555{i:04d}',
+                'voice': 'Ava',
+                'stage': 1,
+                'transferred': i % 2 == 0,
+                'timestamp': (start + timedelta(minutes=20 * i)).isoformat(),
+            }
+            for i in range(count)
+        ]
+
+
+class IngestionTests(CallTestCase):
+    def test_ingest_writes_calls_activity_and_rollups(self):
+        for method in ('copy', 'insert'):
+            with self.subTest(method=method):
+                Call.objects.all().delete()
+                CampaignActivity.objects.all().delete()
+                for model in (CallCategoryRollup, CampaignCallHourlyRollup, CampaignCallDailyRollup):
+                    model.objects.all().delete()
+
+                self.assertEqual(ingest_calls(self.records(6), method=method), 6)
+
+                self.assertEqual(Call.objects.filter(client_campaign_model=self.campaign).count(), 6)
+                activity = CampaignActivity.objects.get(client_campaign_model=self.campaign)
+                self.assertEqual(activity.last_call_at, datetime(2026, 3, 1, 10, 40, tzinfo=dt_timezone.utc))
+                hourly = dict(CampaignCallHourlyRollup.objects.values_list('bucket_start__hour', 'total_calls'))
+                self.assertEqual(hourly, {9: 3, 10: 3})
+                daily = CampaignCallDailyRollup.objects.get()
+                self.assertEqual((daily.total_calls, daily.transferred_calls), (6, 3))
+                self.assertEqual(sum(CallCategoryRollup.objects.values_list('total_calls', flat=True)), 6)
+
+    def test_invalid_batch_writes_nothing(self):
+        records = self.records(3)
+        records[1]['stage'] = 'first'
+        records[2]['number'] = ''
+        with self.assertRaises(CallIngestionError) as raised:
+            ingest_calls(records)
+        self.assertEqual(sorted(error['index'] for error in raised.exception.errors), [1, 2])
+        self.assertFalse(Call.objects.exists())
+
+
+class KeysetChangeListTests(CallTestCase):
+    def changelist(self, params):
+        model_admin = admin.site._registry[Call]
+        request = RequestFactory().get('/admin/calls/call/', params)
+        request.user = self.admin_user
+        model_admin.list_per_page = 4
+        try:
+            return model_admin.get_changelist_instance(request)
+        finally:
+            del model_admin.list_per_page
+
+    def test_pages_newest_first_without_gaps_or_repeats(self):
+        ingest_calls(self.records(10))
+        expected = list(Call.objects.order_by('-timestamp', '-id').values_list('pk', flat=True))
+
+        seen, params = [], {}
+        while True:
+            changelist = self.changelist(params)
+            seen += [call.pk for call in changelist.result_list]
+            if not changelist.older_url:
+                break
+            params = {key: values[0] for key, values in parse_qs(urlsplit(changelist.older_url).query).items()}
+        self.assertEqual(seen, expected)
+
+        # And back again from the last page
+        newer = parse_qs(urlsplit(changelist.newer_url).query)
+        changelist = self.changelist({key: values[0] for key, values in newer.items()})
+        self.assertEqual([call.pk for call in changelist.result_list], expected[4:8])
@@ -0,0 +1,10 @@
+from django.urls import path
+from . import views
+
+app_name = 'calls'
+
+urlpatterns = [
+    path('ingest/', views.ingest_calls_view, name='ingest'),
+    path('record/', views.record_call_view, name='record'),
+    path('buffer-stats/', views.buffer_stats_view, name='buffer_stats'),
+]
@@ -1,3 +1,79 @@
-from django.shortcuts import render
+import json
 
-# Create your views here.
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from core.decorators import bot_token_required
+from .buffer import get_call_buffer
+from .ingestion import CallIngestionError, ingest_calls, normalize_records
+
+
+@csrf_exempt
+@require_POST
+@bot_token_required
+def ingest_calls_view(request):
+    """
+    Accept a batch of call records from the bots.
+
+    Body: {"client_campaign_model_id": 12, "calls": [{"number": ..., "stage": ...,
+    "voice": "<name>", "response_category": "<name>", "list_id": ..., "transferred": ...,
+    "transcription": ...}, ...]}. Each call may carry its own client_campaign_model_id.
+    """
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+
+    if not isinstance(payload, dict) or not isinstance(payload.get('calls'), list):
+        return JsonResponse({'error': "Expected an object with a 'calls' list"}, status=400)
+
+    calls = payload['calls']
+    if len(calls) > settings.CALL_INGEST_MAX_BATCH:
+        return JsonResponse(
+            {'error': f'Batch too large (max {settings.CALL_INGEST_MAX_BATCH} calls)'},
+            status=413
+        )
+
+    try:
+        inserted = ingest_calls(calls, payload.get('client_campaign_model_id'))
+    except CallIngestionError as exc:
+        return JsonResponse({'errors': exc.errors}, status=400)
+
+    return JsonResponse({'inserted': inserted}, status=201)
+
+
+@csrf_exempt
+@require_POST
+@bot_token_required
+def record_call_view(request):
+    """
+    Accept a single call record and queue it on the write-behind buffer.
+
+    Body: one call object as accepted by ingest_calls_view. Responds 202 once
+    queued, or 503 when the buffer stayed full for longer than the put timeout.
+    """
+    try:
+        record = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+
+    try:
+        rows = normalize_records([record])
+    except CallIngestionError as exc:
+        return JsonResponse({'errors': exc.errors}, status=400)
+
+    if not get_call_buffer().put(rows):
+        response = JsonResponse({'error': 'Call buffer is full, retry later'}, status=503)
+        response['Retry-After'] = '1'
+        return response
+
+    return JsonResponse({'queued': len(rows)}, status=202)
+
+
+@require_GET
+@bot_token_required
+def buffer_stats_view(request):
+    """Counters for this worker's write-behind buffer"""
+    return JsonResponse(get_call_buffer().stats())
@@ -1,10 +1,14 @@
 from datetime import timedelta
-from django.contrib import admin
+from django.conf import settings
+from django.contrib import admin, messages
 from django import forms
 from django.utils import timezone
 from django.db import transaction
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models import Count, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.urls import reverse
-from django.utils.html import format_html
+from django.utils.html import escape, format_html
 from django.utils.safestring import mark_safe
 from .models import (
     TransferSettings,
@@ -17,26 +21,58 @@ from .models import (
     StatusHistory,
     PrimaryDialer,
     CloserDialer,
+    DialerCheck,
     DialerSettings,
     ClientCampaignModel,
     ServerCampaignBots
 )
 from clients.models import Client
-from infrastructure.models import Server, Extension
-
+from calls.models import CallCategoryRollup
+from calls.export_jobs import ExportJobMixin
+from calls.rollups import hour_bucket
+from core.permissions import ADMINS, MANAGERS, NOBODY, STAFF, SUPERUSERS, RolePermissionMixin, has_role
+from core import cache as references
+from core.admin import ReferenceListFilter
+from core.forms import ReferenceChoiceField, ReferenceMultipleChoiceField
+from infrastructure.extensions import free_extensions
+from .allocation import AllocationError, allocate_bots
+from .dialer_checks import collect_targets, run_checks
+
+# Changed rows listed in the message of the bot allocation actions
+BOT_ALLOCATION_DIFF_LINES = 30
+
+# Free extension numbers suggested next to the extension field of server bot rows
+FREE_EXTENSIONS_SHOWN = 5
 
 # ============================================================================
 # SECTION 1: INLINE ADMINS FOR NESTED MODELS
 # ============================================================================
 
-class ServerCampaignBotsInline(admin.TabularInline):
+class ServerCampaignBotsInline(RolePermissionMixin, admin.TabularInline):
     model = ServerCampaignBots
     extra = 1
-    fields = ['server', 'extension', 'bot_count']
+    fields = ['server', 'extension', 'bot_count', 'free_on_server']
+    readonly_fields = ['free_on_server']
+    autocomplete_fields = ['server', 'extension']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Free extensions per server id, looked up once per page (inlines are instantiated per request)
+        self._free = {}
+
+    @admin.display(description='Next free on this server')
+    def free_on_server(self, obj):
+        if obj is None or obj.server_id is None:
+            return '-'
+        if obj.server_id not in self._free:
+            self._free[obj.server_id] = list(
+                free_extensions(obj.server_id).values_list('extension_number', flat=True)[:FREE_EXTENSIONS_SHOWN]
+            )
+        free = self._free[obj.server_id]
+        return ', '.join(map(str, free)) if free else 'None left'
 
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         if db_field.name == "server":
-            kwargs["queryset"] = Server.objects.order_by('alias', 'ip')
             formfield = super().formfield_for_foreignkey(db_field, request, **kwargs)
             
             # Customize the label to show IP with alias in brackets
@@ -47,33 +83,18 @@ class ServerCampaignBotsInline(admin.TabularInline):
             
             formfield.label_from_instance = server_label
             return formfield
-        
-        if db_field.name == "extension":
-            kwargs["queryset"] = Extension.objects.order_by('extension_number')
-        
-        return super().formfield_for_foreignkey(db_field, request, **kwargs)
-
-    def has_view_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
 
-    def has_add_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
-    def has_change_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
+    permission_matrix = {
+        'view': MANAGERS,
+        'add': MANAGERS,
+        'change': MANAGERS,
+        'delete': MANAGERS,
+    }
 
-    def has_delete_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
 
-class PrimaryDialerInline(admin.TabularInline):
+class PrimaryDialerInline(RolePermissionMixin, admin.TabularInline):
     """Inline for managing Primary Dialers within DialerSettings"""
     model = PrimaryDialer
     extra = 1
@@ -81,25 +102,12 @@ class PrimaryDialerInline(admin.TabularInline):
     verbose_name = 'Primary Dialer'
     verbose_name_plural = 'Primary Dialers'
 
-    def has_view_permission(self, request, obj=None):    
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_add_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_change_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_delete_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
+    permission_matrix = {
+        'view': MANAGERS,
+        'add': MANAGERS,
+        'change': MANAGERS,
+        'delete': MANAGERS,
+    }
 
 
 # ============================================================================
@@ -122,10 +130,11 @@ class ModelInline(admin.StackedInline):
 
 
 @admin.register(CampaignModel)
-class CampaignModelAdmin(admin.ModelAdmin):
+class CampaignModelAdmin(RolePermissionMixin, admin.ModelAdmin):
     list_display = ['get_campaign_name', 'get_model_name']
     list_filter = ['campaign']
     search_fields = ['campaign__name', 'model__name']
+    list_select_related = ['campaign', 'model']
     
     fieldsets = (
         ('Campaign-Model Pairing', {
@@ -163,37 +172,21 @@ class CampaignModelAdmin(admin.ModelAdmin):
             return formfield
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
-    def has_module_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_view_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding or request.user.is_qa
+    permission_matrix = {
+        'module': MANAGERS,
+        'view': STAFF,
+        'add': MANAGERS,
+        'change': MANAGERS,
+        'delete': ADMINS,
+    }
 
-    def has_add_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_change_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_delete_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin
 
 # ============================================================================
 # SECTION 3: STANDALONE MODELS (TransferSettings, Campaign, Model, Voice, ResponseCategory)
 # ============================================================================
 
 @admin.register(TransferSettings)
-class TransferSettingsAdmin(admin.ModelAdmin):
+class TransferSettingsAdmin(RolePermissionMixin, admin.ModelAdmin):
     list_display = ['name', 'get_model_count']
     search_fields = ['name']
 
@@ -202,191 +195,192 @@ class TransferSettingsAdmin(admin.ModelAdmin):
         return obj.models.count()
     get_model_count.short_description = 'Models Using'
 
-    def has_module_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin 
-
-    def has_view_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding or request.user.is_qa
-
-    def has_add_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_change_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_delete_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin
+    permission_matrix = {
+        'module': ADMINS,
+        'view': STAFF,
+        'add': MANAGERS,
+        'change': MANAGERS,
+        'delete': ADMINS,
+    }
 
 
 @admin.register(Campaign)
-class CampaignAdmin(admin.ModelAdmin):
+class CampaignAdmin(RolePermissionMixin, admin.ModelAdmin):
     list_display = ['name', 'description']
     search_fields = ['name', 'description']
 
-    def has_module_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding 
-    
-    def has_view_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding 
-
-    def has_add_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_change_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_delete_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin
+    permission_matrix = {
+        'module': MANAGERS,
+        'view': MANAGERS,
+        'add': MANAGERS,
+        'change': MANAGERS,
+        'delete': ADMINS,
+    }
 
 
 @admin.register(Model)
-class ModelAdmin(admin.ModelAdmin):
+class ModelAdmin(RolePermissionMixin, admin.ModelAdmin):
     list_display = ['name', 'description', 'get_transfer_settings']
     search_fields = ['name', 'description']
     filter_horizontal = ['transfer_settings']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('transfer_settings')
 
     def get_transfer_settings(self, obj):
         """Display all transfer settings for this model"""
         settings = obj.transfer_settings.all()
-        if settings.exists():
+        if settings:
             return ", ".join([ts.name for ts in settings])
         return "None"
     get_transfer_settings.short_description = 'Transfer Settings'
 
     def formfield_for_manytomany(self, db_field, request, **kwargs):
         if db_field.name == "transfer_settings":
-            kwargs["queryset"] = TransferSettings.objects.order_by('display_order', 'name')
+            kwargs["queryset"] = references.transfer_settings.queryset()
+            kwargs["form_class"] = ReferenceMultipleChoiceField
+            kwargs["reference"] = references.transfer_settings
         return super().formfield_for_manytomany(db_field, request, **kwargs)
 
-    def has_module_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding 
-
-    def has_view_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding or request.user.is_qa
-
-    def has_add_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_change_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_delete_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin
+    permission_matrix = {
+        'module': MANAGERS,
+        'view': STAFF,
+        'add': MANAGERS,
+        'change': MANAGERS,
+        'delete': ADMINS,
+    }
+
+
+def annotate_call_counts(queryset, field):
+    """Annotate all-time and last-24h call counts from the hourly category rollup"""
+    totals = CallCategoryRollup.objects.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(total=Sum('total_calls')).values('total')
+    since = hour_bucket(timezone.now() - timedelta(hours=24))
+    return queryset.annotate(
+        _call_count=Coalesce(Subquery(totals), Value(0)),
+        _call_count_24h=Coalesce(Subquery(totals.filter(bucket_start__gte=since)), Value(0)),
+    )
 
 
 @admin.register(Voice)
-class VoiceAdmin(admin.ModelAdmin):
-    list_display = ['name', 'get_call_count']
+class VoiceAdmin(RolePermissionMixin, admin.ModelAdmin):
+    list_display = ['name', 'get_call_count_24h', 'get_call_count']
     search_fields = ['name']
 
+    def get_queryset(self, request):
+        return annotate_call_counts(super().get_queryset(request), 'voice')
+
     def get_call_count(self, obj):
         """Display number of calls using this voice"""
-        return obj.calls.count()
+        return obj._call_count
     get_call_count.short_description = 'Total Calls'
+    get_call_count.admin_order_field = '_call_count'
 
-    def has_module_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin   
-
-    def has_view_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding or request.user.is_qa
+    def get_call_count_24h(self, obj):
+        """Display number of calls using this voice in the last 24 hours"""
+        return obj._call_count_24h
+    get_call_count_24h.short_description = 'Calls (24h)'
+    get_call_count_24h.admin_order_field = '_call_count_24h'
 
-    def has_add_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_change_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_delete_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin
+    permission_matrix = {
+        'module': ADMINS,
+        'view': STAFF,
+        'add': MANAGERS,
+        'change': MANAGERS,
+        'delete': ADMINS,
+    }
 
 
 @admin.register(ResponseCategory)
-class ResponseCategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'color', 'get_call_count']
+class ResponseCategoryAdmin(RolePermissionMixin, admin.ModelAdmin):
+    list_display = ['name', 'color', 'get_call_count_24h', 'get_call_count']
     search_fields = ['name']
     list_filter = ['color']
 
+    def get_queryset(self, request):
+        return annotate_call_counts(super().get_queryset(request), 'response_category')
+
     def get_call_count(self, obj):
         """Display number of calls with this response category"""
-        return obj.calls.count()
+        return obj._call_count
     get_call_count.short_description = 'Total Calls'
+    get_call_count.admin_order_field = '_call_count'
 
-    def has_module_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin 
-
-    def has_view_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding or request.user.is_qa
+    def get_call_count_24h(self, obj):
+        """Display number of calls with this response category in the last 24 hours"""
+        return obj._call_count_24h
+    get_call_count_24h.short_description = 'Calls (24h)'
+    get_call_count_24h.admin_order_field = '_call_count_24h'
 
-    def has_add_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_change_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_delete_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin
+    permission_matrix = {
+        'module': ADMINS,
+        'view': STAFF,
+        'add': MANAGERS,
+        'change': MANAGERS,
+        'delete': ADMINS,
+    }
 
 
 # ============================================================================
 # SECTION 4: DIALER MANAGEMENT
 # ============================================================================
 
+class DialerCheckMixin:
+    """Changelist columns with the latest check of each dialer link, and an action to check now"""
+    actions = ['check_dialers']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('checks')
+
+    def _check_display(self, obj, link):
+        check = next((check for check in obj.checks.all() if check.link == link), None)
+        if check is None:
+            return '-'
+        if check.ok:
+            label = f"{check.status_code} in {check.latency_ms:,.0f} ms"
+        else:
+            label = f"{check.status_code} {check.error}" if check.status_code else check.error
+        return format_html(
+            '<span style="color: {}; font-weight: bold;" title="Checked {}">●</span> {}',
+            '#28a745' if check.ok else '#dc3545',
+            timezone.localtime(check.checked_at).strftime('%Y-%m-%d %H:%M'),
+            label[:80]
+        )
+
+    def get_ip_validation_check(self, obj):
+        return self._check_display(obj, DialerCheck.IP_VALIDATION)
+    get_ip_validation_check.short_description = 'IP Validation'
+
+    def get_admin_check(self, obj):
+        return self._check_display(obj, DialerCheck.ADMIN)
+    get_admin_check.short_description = 'Admin Link'
+
+    @admin.action(description='Check links of selected dialers now', permissions=['change'])
+    def check_dialers(self, request, queryset):
+        # The probes run while the request waits; checking every dialer is the check_dialers worker's job
+        if queryset.count() > settings.DIALER_CHECK_ADMIN_MAX:
+            self.message_user(
+                request,
+                f"Select at most {settings.DIALER_CHECK_ADMIN_MAX} dialers to check now; every dialer is "
+                f"checked in the background every {settings.DIALER_CHECK_INTERVAL} seconds.",
+                messages.ERROR
+            )
+            return
+        checks = run_checks(collect_targets(queryset))
+        failed = sum(1 for check in checks if not check.ok)
+        self.message_user(request, f"Checked {len(checks)} link(s): {len(checks) - failed} ok, {failed} failed.")
+
+
 @admin.register(PrimaryDialer)
-class PrimaryDialerAdmin(admin.ModelAdmin):
-    list_display = ['id', 'admin_link', 'port', 'fronting_campaign', 'verifier_campaign', 'get_dialer_settings']
+class PrimaryDialerAdmin(DialerCheckMixin, RolePermissionMixin, admin.ModelAdmin):
+    list_display = [
+        'id', 'admin_link', 'port', 'fronting_campaign', 'verifier_campaign', 'get_dialer_settings',
+        'get_ip_validation_check', 'get_admin_check',
+    ]
     search_fields = ['admin_link', 'fronting_campaign', 'verifier_campaign']
     list_filter = ['port', 'dialer_settings']
+    list_select_related = ['dialer_settings']
     
     fieldsets = (
         ('Dialer Connection', {
@@ -408,58 +402,28 @@ class PrimaryDialerAdmin(admin.ModelAdmin):
             kwargs["queryset"] = DialerSettings.objects.order_by('-id')
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
-    def has_module_permission(self, request):
-        return False
-
-    def has_view_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_add_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_change_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_delete_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin
+    permission_matrix = {
+        'module': NOBODY,
+        'view': MANAGERS,
+        'add': MANAGERS,
+        'change': MANAGERS,
+        'delete': ADMINS,
+    }
 
 
 @admin.register(CloserDialer)
-class CloserDialerAdmin(admin.ModelAdmin):
-    list_display = ['id', 'admin_link', 'closer_campaign', 'ingroup', 'port']
+class CloserDialerAdmin(DialerCheckMixin, RolePermissionMixin, admin.ModelAdmin):
+    list_display = ['id', 'admin_link', 'closer_campaign', 'ingroup', 'port', 'get_ip_validation_check', 'get_admin_check']
     search_fields = ['admin_link', 'closer_campaign', 'ingroup']
     list_filter = ['port']
 
-    def has_module_permission(self, request):
-        return False
-
-    def has_view_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_add_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_change_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_delete_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin
+    permission_matrix = {
+        'module': NOBODY,
+        'view': MANAGERS,
+        'add': MANAGERS,
+        'change': MANAGERS,
+        'delete': ADMINS,
+    }
 
 
 class DialerSettingsForm(forms.ModelForm):
@@ -482,11 +446,12 @@ class DialerSettingsForm(forms.ModelForm):
 
 
 @admin.register(DialerSettings)
-class DialerSettingsAdmin(admin.ModelAdmin):
+class DialerSettingsAdmin(RolePermissionMixin, admin.ModelAdmin):
     form = DialerSettingsForm
     inlines = [PrimaryDialerInline]
     list_display = ['id', 'get_primary_dialers_count', 'closer_dialer', 'get_client_campaigns_count']
     list_filter = ['closer_dialer']
+    list_select_related = ['closer_dialer']
     search_fields = ['closer_dialer__admin_link', 'id']
     
     fieldsets = (
@@ -496,39 +461,30 @@ class DialerSettingsAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            _primary_dialers_count=Count('primary_dialers', distinct=True),
+            _client_campaigns_count=Count('client_campaigns', distinct=True),
+        )
+
     def get_primary_dialers_count(self, obj):
         """Display count of primary dialers"""
-        count = obj.primary_dialers.count()
-        return f"{count} dialer(s)"
+        return f"{obj._primary_dialers_count} dialer(s)"
     get_primary_dialers_count.short_description = 'Primary Dialers'
+    get_primary_dialers_count.admin_order_field = '_primary_dialers_count'
 
     def get_client_campaigns_count(self, obj):
-        count = obj.client_campaigns.count()
-        return f"{count} campaign(s)"
+        return f"{obj._client_campaigns_count} campaign(s)"
     get_client_campaigns_count.short_description = 'Used By'
+    get_client_campaigns_count.admin_order_field = '_client_campaigns_count'
 
-    def has_module_permission(self, request):
-        return False
-
-    def has_view_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_add_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_change_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_delete_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin
+    permission_matrix = {
+        'module': NOBODY,
+        'view': MANAGERS,
+        'add': MANAGERS,
+        'change': MANAGERS,
+        'delete': ADMINS,
+    }
 
 
 # ============================================================================
@@ -536,44 +492,31 @@ class DialerSettingsAdmin(admin.ModelAdmin):
 # ============================================================================
 
 @admin.register(Status)
-class StatusAdmin(admin.ModelAdmin):
+class StatusAdmin(RolePermissionMixin, admin.ModelAdmin):
     list_display = ['status_name', 'updated_at']
     search_fields = ['status_name']
     readonly_fields = ['updated_at']
 
-    def has_module_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser 
-
-    def has_view_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding 
-
-    def has_add_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_change_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_delete_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin
+    permission_matrix = {
+        'module': SUPERUSERS,
+        'view': MANAGERS,
+        'add': MANAGERS,
+        'change': MANAGERS,
+        'delete': ADMINS,
+    }
 
 
 @admin.register(StatusHistory)
-class StatusHistoryAdmin(admin.ModelAdmin):
+class StatusHistoryAdmin(RolePermissionMixin, admin.ModelAdmin):
     list_display = ['status', 'get_client_campaign', 'start_date', 'end_date', 'duration']
-    list_filter = ['status', 'start_date', 'end_date']
+    list_filter = [('status', ReferenceListFilter), 'start_date', 'end_date']
     search_fields = ['status__status_name', 'client_campaigns__client__name']
     readonly_fields = ['status', 'start_date', 'end_date', 'get_client_campaign', 'duration']
     date_hierarchy = 'start_date'
+    list_select_related = [
+        'status', 'client_campaign__client', 'client_campaign__campaign_model__campaign',
+        'client_campaign__campaign_model__model',
+    ]
     
     fieldsets = (
         ('Status Information', {
@@ -618,26 +561,14 @@ class StatusHistoryAdmin(admin.ModelAdmin):
         return "Currently active"
     duration.short_description = 'Duration'
     
-    def has_module_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return False
-    
-    def has_view_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding or request.user.is_qa
-    
-    def has_add_permission(self, request):
-        return False  # Status history should only be created automatically
-    
-    def has_change_permission(self, request, obj=None):
-        return False  # Status history should not be manually edited
-    
-    def has_delete_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin
+    permission_matrix = {
+        'module': NOBODY,
+        'view': STAFF,
+        'add': NOBODY,
+        'change': NOBODY,
+        'delete': ADMINS,
+    }
+
 
 # ============================================================================
 # SECTION 6: CLIENT CAMPAIGNS (Main Interface)
@@ -645,8 +576,8 @@ class StatusHistoryAdmin(admin.ModelAdmin):
 
 class ClientCampaignModelForm(forms.ModelForm):
 
-    status = forms.ModelChoiceField(
-        queryset=Status.objects.all(),
+    status = ReferenceChoiceField(
+        reference=references.statuses,
         required=True,
         help_text="Select the status for this campaign"
     )
@@ -662,37 +593,50 @@ class ClientCampaignModelForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        if 'client' not in self.fields:
+            # View-only users get every field read-only; nothing to set up
+            return
         self.fields['client'].queryset = Client.objects.select_related('client').order_by('name')
         self.fields['campaign_model'].queryset = CampaignModel.objects.select_related('campaign', 'model').order_by('campaign__name', 'model__name')
         self.fields['campaign_model'].label_from_instance = lambda obj: f"{obj.campaign.name} - {obj.model.name}"
         
+        # Labels list who uses each option; aggregate the names in the
+        # queryset so rendering costs one query per select, not per option
+        dialer_settings = DialerSettings.objects.select_related('closer_dialer').annotate(
+            _client_names=ArrayAgg(
+                'client_campaigns__client__name',
+                filter=Q(client_campaigns__isnull=False),
+                order_by='client_campaigns__client__name',
+            )
+        )
         if self.instance.pk and self.instance.dialer_settings:
             # For existing instances with dialer settings, make it readonly and show only their setting
-            self.fields['dialer_settings'].queryset = DialerSettings.objects.filter(id=self.instance.dialer_settings.id).select_related('closer_dialer').prefetch_related('primary_dialers')
+            self.fields['dialer_settings'].queryset = dialer_settings.filter(id=self.instance.dialer_settings_id)
             self.fields['dialer_settings'].disabled = True
             self.fields['dialer_settings'].help_text = "Dialer settings cannot be changed after creation. Edit the configuration using the inline form below."
         else:
             # For new instances, show all available settings
-            self.fields['dialer_settings'].queryset = DialerSettings.objects.select_related('closer_dialer').prefetch_related('primary_dialers').order_by('-id')
+            self.fields['dialer_settings'].queryset = dialer_settings.order_by('-id')
             self.fields['dialer_settings'].help_text = "Select or create dialer settings (use Dialer Settings menu to manage)"
 
+        self.fields['selected_transfer_setting'].queryset = TransferSettings.objects.annotate(
+            _model_names=ArrayAgg('models__name', filter=Q(models__isnull=False), order_by='models__name')
+        )
+
+        def names_label(names):
+            label = ", ".join(names[:3])
+            if len(names) > 3:
+                label += f" (+{len(names) - 3} more)"
+            return label
+
         def transfer_setting_label(ts):
-            models_using = ts.models.all()
-            if models_using.exists():
-                model_names = ", ".join([m.name for m in models_using[:3]])
-                if models_using.count() > 3:
-                    model_names += f" (+{models_using.count() - 3} more)"
-                return f"{ts.name} (Used by: {model_names})"
+            if ts._model_names:
+                return f"{ts.name} (Used by: {names_label(ts._model_names)})"
             return f"{ts.name} (Not used by any model)"
         
         def dialer_settings_label(ds):
-            # Get all client campaigns using this dialer setting
-            campaigns = ds.client_campaigns.select_related('client').all()
-            if campaigns.exists():
-                client_names = ", ".join([c.client.name for c in campaigns[:3]])
-                if campaigns.count() > 3:
-                    client_names += f" (+{campaigns.count() - 3} more)"
-                return f"{client_names}"
+            if ds._client_names:
+                return names_label(ds._client_names)
             return f"Dialer Settings #{ds.id} (Not assigned)"
         
         self.fields['selected_transfer_setting'].label_from_instance = transfer_setting_label
@@ -704,21 +648,18 @@ class ClientCampaignModelForm(forms.ModelForm):
             self.fields['client'].disabled = True
             self.fields['client'].help_text = "Client cannot be changed after creation"
             
-            # Set current status from status_history
-            current_history = self.instance.status_history.filter(end_date__isnull=True).first()
-            if current_history:
-                self.initial['status'] = current_history.status
-                self.fields['status'].initial = current_history.status
+            # Set current status from the denormalized pointer
+            if self.instance.current_status:
+                self.initial['status'] = self.instance.current_status
+                self.fields['status'].initial = self.instance.current_status
         else:
             # For new instances, set default values
             self.initial['start_date'] = timezone.now()
             # Set default status to "Not Approved"
-            try:
-                not_approved_status = Status.objects.get(status_name='Not Approved')
+            not_approved_status = references.statuses.get_by(status_name='Not Approved')
+            if not_approved_status:
                 self.initial['status'] = not_approved_status
                 self.fields['status'].initial = not_approved_status
-            except Status.DoesNotExist:
-                pass
         
         # Set help text
         self.fields['client'].help_text = "Select the client" if not self.instance.pk else "Client cannot be changed after creation"
@@ -759,23 +700,8 @@ class ClientCampaignModelForm(forms.ModelForm):
             with transaction.atomic():
                 instance.save()
                 
-                # Get current status
-                current_history = instance.status_history.filter(end_date__isnull=True).first()
-                old_status = current_history.status if current_history else None
-                
-                # Update status if changed or new
-                if old_status != new_status:
-                    # Close old status history if it exists
-                    if current_history:
-                        current_history.end_date = timezone.now()
-                        current_history.save()
-                    
-                    # Create new status history
-                    StatusHistory.objects.create(
-                        client_campaign=instance,
-                        status=new_status,
-                        start_date=timezone.now()
-                    )
+                # Close/open status history and move the current_status pointer
+                instance.change_status(new_status)
                 
                 self.save_m2m()
         
@@ -787,20 +713,13 @@ class CurrentStatusFilter(admin.SimpleListFilter):
 
     def lookups(self, request, model_admin):
         """Return list of statuses to filter by"""
-        statuses = Status.objects.all().order_by('status_name')
-        return [(status.id, status.status_name) for status in statuses]
+        return [(status.id, status.status_name) for status in references.statuses.all()]
 
     def queryset(self, request, queryset):
         """Filter queryset based on selected status"""
         if self.value():
-            # Get all ClientCampaignModel IDs that have this status as current
-            status_id = self.value()
-            campaign_ids = StatusHistory.objects.filter(
-                status_id=status_id,
-                end_date__isnull=True  # Only current/active statuses
-            ).values_list('client_campaign_id', flat=True)
-            
-            return queryset.filter(id__in=campaign_ids)
+            # current_status always points at the open status history entry
+            return queryset.filter(current_status_id=self.value())
         return queryset
 
 class ActiveStatusFilter(admin.SimpleListFilter):
@@ -816,33 +735,23 @@ class ActiveStatusFilter(admin.SimpleListFilter):
 
     def queryset(self, request, queryset):
         """Filter queryset based on activity status"""
+        from calls.models import CampaignActivity
         if self.value() == 'active':
-            # Get campaigns with calls in the last minute
-            one_minute_ago = timezone.now() - timedelta(minutes=1)
-            from calls.models import Call
-            active_campaign_ids = Call.objects.filter(
-                timestamp__gte=one_minute_ago
-            ).values_list('client_campaign_model_id', flat=True).distinct()
-            
-            return queryset.filter(id__in=active_campaign_ids)
+            # Campaigns whose latest call falls inside the activity window
+            return queryset.filter(activity__last_call_at__gte=CampaignActivity.active_since())
         
         elif self.value() == 'inactive':
-            # Get campaigns WITHOUT calls in the last minute
-            one_minute_ago = timezone.now() - timedelta(minutes=1)
-            from calls.models import Call
-            active_campaign_ids = Call.objects.filter(
-                timestamp__gte=one_minute_ago
-            ).values_list('client_campaign_model_id', flat=True).distinct()
-            
-            return queryset.exclude(id__in=active_campaign_ids)
+            # Campaigns WITHOUT calls in the last minute
+            return queryset.exclude(activity__last_call_at__gte=CampaignActivity.active_since())
         
         return queryset
 
 @admin.register(ClientCampaignModel)
-class ClientCampaignModelAdmin(admin.ModelAdmin):
+class ClientCampaignModelAdmin(ExportJobMixin, RolePermissionMixin, admin.ModelAdmin):
     form = ClientCampaignModelForm
     inlines = [ServerCampaignBotsInline]
     readonly_fields = ['get_status_history_display']
+    export_kind = 'campaigns'
     
     def get_list_display(self, request):
         """Customize list_display based on user role"""
@@ -859,11 +768,11 @@ class ClientCampaignModelAdmin(admin.ModelAdmin):
         ]
         
         # Superuser and Admin see both dashboards
-        if request.user.is_superuser or request.user.is_admin:
+        if has_role(request.user, ADMINS):
             return base_display + ['get_client_dashboard_link', 'get_admin_dashboard_link']
         
         # QA and Onboarding only see client dashboard
-        if request.user.is_qa or request.user.is_onboarding:
+        if has_role(request.user, STAFF):
             return base_display + ['get_admin_dashboard_link']
         
         # Default (including clients)
@@ -871,10 +780,7 @@ class ClientCampaignModelAdmin(admin.ModelAdmin):
     
     def get_is_active_status(self, obj):
         """Check if campaign had calls in the last minute"""
-        one_minute_ago = timezone.now() - timedelta(minutes=1)
-        has_recent_calls = obj.calls.filter(timestamp__gte=one_minute_ago).exists()
-        
-        if has_recent_calls:
+        if obj.is_active:
             return format_html(
                 '<span style="color: {}; font-weight: bold;">●</span> {}',
                 '#28a745',
@@ -909,7 +815,12 @@ class ClientCampaignModelAdmin(admin.ModelAdmin):
         'custom_comments'
     ]
     date_hierarchy = 'start_date'
-    list_select_related = ['client__client', 'campaign_model__campaign', 'campaign_model__model']
+    autocomplete_fields = ['client', 'campaign_model']
+    list_select_related = [
+        'client__client', 'campaign_model__campaign', 'campaign_model__model', 'activity', 'current_status',
+        'selected_transfer_setting',
+    ]
+    actions = ['preview_bot_allocation', 'apply_bot_allocation']
     
     fieldsets = (
         ('Basic Information', {
@@ -940,23 +851,8 @@ class ClientCampaignModelAdmin(admin.ModelAdmin):
                 # Save the object first
                 super().save_model(request, obj, form, change)
                 
-                # Get current status
-                current_history = obj.status_history.filter(end_date__isnull=True).first()
-                old_status = current_history.status if current_history else None
-                
-                # Update status if changed or new
-                if old_status != new_status:
-                    # Close old status history if it exists
-                    if current_history:
-                        current_history.end_date = timezone.now()
-                        current_history.save()
-                    
-                    # Create new status history
-                    StatusHistory.objects.create(
-                        client_campaign=obj,
-                        status=new_status,
-                        start_date=timezone.now()
-                    )
+                # Close/open status history and move the current_status pointer
+                obj.change_status(new_status)
         else:
             super().save_model(request, obj, form, change)
     def get_dialer_settings_display(self, obj):
@@ -982,9 +878,8 @@ class ClientCampaignModelAdmin(admin.ModelAdmin):
 
     def get_current_status(self, obj):
         """Display current status with color coding"""
-        current_history = obj.status_history.filter(end_date__isnull=True).first()
-        if current_history:
-            status_name = current_history.status.status_name
+        if obj.current_status:
+            status_name = obj.current_status.status_name
             color_map = {
                 'Not Approved': '#999999',
                 'Enabled': '#28a745',
@@ -1000,7 +895,7 @@ class ClientCampaignModelAdmin(admin.ModelAdmin):
         return mark_safe('<span style="color: #999999;">No Status</span>')
 
     get_current_status.short_description = 'Status'
-    get_current_status.admin_order_field = 'status_history__status__status_name'
+    get_current_status.admin_order_field = 'current_status__status_name'
 
     def get_client_dashboard_link(self, obj):
         """Display link to client dashboard"""
@@ -1038,41 +933,55 @@ class ClientCampaignModelAdmin(admin.ModelAdmin):
         return "Save to view history"
     get_status_history_display.short_description = 'Status History'
 
+    def _allocate_bots(self, request, queryset, dry_run):
+        try:
+            allocation = allocate_bots(list(queryset.values_list('pk', flat=True)), dry_run=dry_run)
+        except AllocationError as e:
+            self.message_user(request, str(e), messages.ERROR)
+            return
+        if not allocation.changed and not allocation.unplaced:
+            self.message_user(request, "Bots of the selected campaigns are already balanced.")
+            return
+        lines = allocation.diff()
+        shown = lines[:BOT_ALLOCATION_DIFF_LINES]
+        if len(lines) > len(shown):
+            shown.append(f"... and {len(lines) - len(shown)} more")
+        prefix = 'Dry run' if dry_run else 'Applied'
+        self.message_user(
+            request,
+            format_html('{}: {}<br>{}', prefix, allocation.summary(), mark_safe('<br>'.join(map(escape, shown)))),
+            messages.WARNING if allocation.unplaced else messages.SUCCESS
+        )
+
+    @admin.action(description='Preview bot allocation for selected campaigns', permissions=['change'])
+    def preview_bot_allocation(self, request, queryset):
+        self._allocate_bots(request, queryset, dry_run=True)
+
+    @admin.action(description='Allocate bots of selected campaigns across servers', permissions=['change'])
+    def apply_bot_allocation(self, request, queryset):
+        self._allocate_bots(request, queryset, dry_run=False)
+
     
-    def has_module_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding  or request.user.is_qa
+    permission_matrix = {
+        'module': STAFF,
+        'view': STAFF,
+        'add': MANAGERS,
+        'change': MANAGERS,
+        'delete': ADMINS,
+    }
 
     def has_view_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        if request.user.is_superuser or request.user.is_admin or request.user.is_onboarding or request.user.is_qa:
+        if super().has_view_permission(request, obj):
             return True
-        if request.user.is_client and obj:
-            return obj.client.client == request.user
+        if request.user.is_authenticated and request.user.is_client and obj:
+            return obj.client.client_id == request.user.pk
         return False
 
-    def has_add_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_change_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_delete_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin
-
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         if not request.user.is_authenticated:
             return qs.none()
-        if request.user.is_superuser or request.user.is_admin or request.user.is_onboarding or request.user.is_qa:
+        if has_role(request.user, STAFF):
             return qs
         if request.user.is_client:
             return qs.filter(client__client=request.user)
@@ -1086,41 +995,23 @@ class ClientCampaignModelAdmin(admin.ModelAdmin):
     get_transfer_setting.admin_order_field = 'selected_transfer_setting__name'
 
 @admin.register(ServerCampaignBots)
-class ServerCampaignBotsAdmin(admin.ModelAdmin):
+class ServerCampaignBotsAdmin(RolePermissionMixin, admin.ModelAdmin):
     list_display = ['client_campaign_model', 'server', 'extension', 'bot_count']
-    list_filter = ['server']
+    list_filter = [('server', ReferenceListFilter)]
     search_fields = ['client_campaign_model__client__name', 'server__alias', 'extension__extension_number']
+    autocomplete_fields = ['client_campaign_model', 'server', 'extension']
 
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         if db_field.name == "client_campaign_model":
             kwargs["queryset"] = ClientCampaignModel.objects.select_related(
                 'client', 'campaign_model__campaign', 'campaign_model__model'
             ).order_by('client__name')
-        if db_field.name == "server":
-            kwargs["queryset"] = Server.objects.order_by('alias', 'ip')
-        if db_field.name == "extension":
-            kwargs["queryset"] = Extension.objects.order_by('extension_number')
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
-    def has_module_permission(self, request):
-        return False
-
-    def has_view_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_add_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_change_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_delete_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin
\ No newline at end of file
+    permission_matrix = {
+        'module': NOBODY,
+        'view': MANAGERS,
+        'add': MANAGERS,
+        'change': MANAGERS,
+        'delete': ADMINS,
+    }
\ No newline at end of file
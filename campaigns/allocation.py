@@ -0,0 +1,379 @@
+"""
+Placement of campaign bots on servers.
+
+``plan_placement`` is the pure part: given server capacities, how many bots
+each campaign needs and where its bots are now, it returns bots per
+(campaign, server). It keeps current placements wherever it can and only
+moves bots to:
+
+1. trim campaigns running more bots than their ``bot_count``,
+2. clear servers loaded beyond their capacity,
+3. place bots still needed (onto a server the campaign is already on while
+   that stays within the balance tolerance, else onto the server with the
+   most free capacity, splitting only when no server can take all of them),
+4. even out load: while the utilization of the busiest and the idlest
+   server differ by more than ``tolerance``, move bots from one to the other,
+   preferring campaigns already on the idle server and whole placements.
+
+``plan_allocation`` reads the current state from the database (locking the
+rows it may change), and ``Allocation.apply`` writes the difference with one
+delete, one ``bulk_update`` and one ``bulk_create``, moving the config
+version of each server it touched once (see ``bot_config``) and logging
+the rows it changed with one insert (see ``config_changes``).
+
+Servers with a ``bot_capacity`` of 0 are not managed: rows on them are left
+alone and their bots count towards the campaign's ``bot_count``. A campaign
+runs on every server with the same extension, so it is only placed on
+servers where no other campaign uses that extension; a campaign without one
+is given the lowest extension free on every server (see
+``infrastructure.extensions``).
+"""
+import heapq
+from collections import defaultdict
+
+from django.db import transaction
+
+from infrastructure.extensions import free_extensions
+from infrastructure.models import Server
+from .bot_config import batched_changes, servers_changed
+from .config_changes import batched_records, lock_log, record_server_bots
+from .models import ClientCampaignModel, ServerCampaignBots
+
+
+# Utilization spread (busiest minus idlest server) tolerated before moving bots
+DEFAULT_TOLERANCE = 0.1
+
+
+class AllocationError(Exception):
+    pass
+
+
+def plan_placement(capacity, demand, current, fixed_load=None, extensionless=(), free_extensions=0,
+                   tolerance=DEFAULT_TOLERANCE, extension_of=None, taken=None):
+    """
+    Bots per (campaign id, server id), and bots that could not be placed
+    per campaign id.
+
+    capacity: {server id: bots}, demand: {campaign id: bots}, current:
+    {(campaign id, server id): bots} for the campaigns in demand,
+    fixed_load: {server id: bots} of campaigns left where they are.
+    Campaigns in extensionless need one of the free_extensions to be placed.
+    extension_of: {campaign id: extension id} and taken: {server id:
+    extension ids of campaigns left where they are}; a campaign only goes to
+    servers where no other campaign uses its extension.
+    """
+    if not capacity:
+        return {}, {campaign: bots for campaign, bots in demand.items() if bots}
+
+    extension_of = extension_of or {}
+    taken = taken or {}
+    placement = {}
+    load = {server: (fixed_load or {}).get(server, 0) for server in capacity}
+    on_server = {server: {} for server in capacity}
+    on_campaign = defaultdict(dict)
+    # (server, extension) -> campaign placed there with it
+    holder = {}
+
+    def move(campaign, server, bots):
+        bots += placement.get((campaign, server), 0)
+        load[server] += bots - placement.get((campaign, server), 0)
+        for index, key in ((on_server[server], campaign), (on_campaign[campaign], server)):
+            if bots:
+                index[key] = bots
+            else:
+                index.pop(key, None)
+        if bots:
+            placement[campaign, server] = bots
+        else:
+            placement.pop((campaign, server), None)
+        extension = extension_of.get(campaign)
+        if extension is not None:
+            if bots:
+                holder[server, extension] = campaign
+            elif holder.get((server, extension)) == campaign:
+                del holder[server, extension]
+
+    def allowed(campaign, server):
+        # Extensionless campaigns get an extension free on every server
+        extension = extension_of.get(campaign)
+        if extension is None:
+            return True
+        return extension not in taken.get(server, ()) and holder.get((server, extension), campaign) == campaign
+
+    def utilization(server):
+        return load[server] / capacity[server]
+
+    for (campaign, server), bots in current.items():
+        if campaign in demand and server in capacity and bots > 0:
+            move(campaign, server, bots)
+
+    # 1. Trim campaigns over their bot count, from their busiest servers first
+    for campaign, servers in list(on_campaign.items()):
+        excess = sum(servers.values()) - demand[campaign]
+        for server in sorted(servers, key=utilization, reverse=True):
+            if excess <= 0:
+                break
+            bots = min(excess, servers[server])
+            move(campaign, server, -bots)
+            excess -= bots
+
+    # 2. Clear overloaded servers, evicting campaigns that also run elsewhere first, then the smallest
+    for server in capacity:
+        overflow = load[server] - capacity[server]
+        while overflow > 0 and on_server[server]:
+            campaign = min(
+                on_server[server],
+                key=lambda c: (len(on_campaign[c]) == 1, on_server[server][c], c)
+            )
+            bots = min(overflow, on_server[server][campaign])
+            move(campaign, server, -bots)
+            overflow -= bots
+
+    # 3. Place what is still needed, largest campaigns first
+    total_capacity = sum(capacity.values())
+    target = min((sum((fixed_load or {}).values()) + sum(demand.values())) / total_capacity, 1)
+
+    unplaced = {}
+    extensions_left = free_extensions
+    # Max-heap of free capacity; entries go stale as load changes and are refreshed when popped
+    free_heap = [(load[s] - capacity[s], s) for s in capacity]
+    heapq.heapify(free_heap)
+    for campaign in sorted(demand, key=lambda c: (-demand[c], c)):
+        need = demand[campaign] - sum(on_campaign[campaign].values())
+        if need <= 0:
+            continue
+        if campaign in extensionless and not on_campaign[campaign]:
+            if not extensions_left:
+                unplaced[campaign] = need
+                continue
+            extensions_left -= 1
+
+        # Servers the campaign is on, while within the tolerance of the target
+        for server in sorted(on_campaign[campaign], key=utilization):
+            room = min(capacity[server], int(capacity[server] * (target + tolerance))) - load[server]
+            if room > 0 and need > 0:
+                bots = min(room, need)
+                move(campaign, server, bots)
+                need -= bots
+
+        # Servers where the campaign's extension is taken are set aside for the next campaign
+        skipped = []
+        while need > 0 and free_heap:
+            negative_free, server = heapq.heappop(free_heap)
+            free = capacity[server] - load[server]
+            if -negative_free != free:
+                heapq.heappush(free_heap, (-free, server))
+                continue
+            if free <= 0:
+                heapq.heappush(free_heap, (-free, server))
+                break
+            if not allowed(campaign, server):
+                skipped.append((-free, server))
+                continue
+            bots = min(free, need)
+            move(campaign, server, bots)
+            need -= bots
+            heapq.heappush(free_heap, (load[server] - capacity[server], server))
+        for entry in skipped:
+            heapq.heappush(free_heap, entry)
+        if need > 0:
+            unplaced[campaign] = need
+
+    # 4. Even out load between the busiest and the idlest server
+    target = sum(load.values()) / total_capacity
+    stuck = set()
+    for _ in range(sum(demand.values()) + len(capacity)):
+        candidates = [s for s in capacity if s not in stuck]
+        if len(candidates) < 2:
+            break
+        heavy = max(candidates, key=lambda s: (utilization(s), s))
+        light = min(candidates, key=lambda s: (utilization(s), s))
+        if utilization(heavy) - utilization(light) <= tolerance:
+            break
+        excess = load[heavy] - capacity[heavy] * target
+        room = capacity[light] * target - load[light]
+        if not on_server[heavy] or excess < 1:
+            stuck.add(heavy)
+            continue
+        movable = {c: bots for c, bots in on_server[heavy].items() if allowed(c, light)}
+        if room < 1 or not movable:
+            stuck.add(light)
+            continue
+        amount = int(min(excess, room))
+        # Campaigns already on the idle server first (no new row), then whole placements that fit
+        campaign = min(
+            movable,
+            key=lambda c: (c not in on_server[light], movable[c] > amount, -movable[c], c)
+        )
+        bots = min(amount, movable[campaign])
+        move(campaign, heavy, -bots)
+        move(campaign, light, bots)
+
+    return placement, unplaced
+
+
+class Allocation:
+    """The row changes turning the current placement into a planned one"""
+
+    def __init__(self):
+        self.create = []
+        self.update = []
+        self.delete = []
+        self.unplaced = {}
+        self.load_before = {}
+        self.load_after = {}
+        self.servers = {}
+        self.bots_moved = 0
+
+    @property
+    def changed(self):
+        return bool(self.create or self.update or self.delete)
+
+    def summary(self):
+        spread = _spread(self.load_after, self.servers)
+        parts = [
+            f"{len(self.create)} row(s) to create, {len(self.update)} to update, {len(self.delete)} to delete",
+            f"{self.bots_moved} bot(s) placed on new servers",
+            f"utilization spread {_spread(self.load_before, self.servers):.0%} -> {spread:.0%}",
+        ]
+        if self.unplaced:
+            parts.append(f"{sum(self.unplaced.values())} bot(s) of {len(self.unplaced)} campaign(s) could not be placed")
+        return '; '.join(parts)
+
+    def diff(self):
+        """Human-readable lines, one per changed row and unplaced campaign"""
+        lines = []
+        for row in self.delete:
+            lines.append(f"- {self._label(row)}: {row.bot_count} bot(s)")
+        for row, old in self.update:
+            lines.append(f"~ {self._label(row)}: {old} -> {row.bot_count} bot(s)")
+        for row in self.create:
+            lines.append(f"+ {self._label(row)}: {row.bot_count} bot(s)")
+        for campaign, bots in sorted(self.unplaced.items()):
+            lines.append(f"! campaign {campaign}: {bots} bot(s) not placed")
+        return lines
+
+    def _label(self, row):
+        server = self.servers.get(row.server_id)
+        return f"campaign {row.client_campaign_model_id} on {server or row.server_id} (ext {row.extension_id})"
+
+    def apply(self):
+        """Write the changes; call inside the transaction plan_allocation ran in"""
+        with batched_changes(), batched_records():
+            if self.delete:
+                ServerCampaignBots.objects.filter(pk__in=[row.pk for row in self.delete]).delete()
+            if self.update:
+                ServerCampaignBots.objects.bulk_update([row for row, _ in self.update], ['bot_count'])
+            if self.create:
+                ServerCampaignBots.objects.bulk_create(self.create)
+            # bulk_update and bulk_create send no signals
+            written = self.create + [row for row, _ in self.update]
+            servers_changed(row.server_id for row in written)
+            record_server_bots(written)
+
+
+def _spread(load, servers):
+    utilization = [load.get(pk, 0) / server.bot_capacity for pk, server in servers.items()]
+    return max(utilization) - min(utilization) if utilization else 0
+
+
+def plan_allocation(campaign_ids=None, tolerance=DEFAULT_TOLERANCE):
+    """
+    Plan the bots of the given campaigns (default: all) onto the managed
+    servers; other campaigns stay where they are. Locks every placement row
+    and the free extensions, so run it and ``apply`` in one transaction.
+    """
+    if not transaction.get_connection().in_atomic_block:
+        raise AllocationError('plan_allocation must run inside a transaction')
+
+    servers = {server.pk: server for server in Server.objects.filter(bot_capacity__gt=0).order_by('pk')}
+    if not servers:
+        raise AllocationError('No server has a bot capacity set')
+
+    campaigns = ClientCampaignModel.objects.all()
+    if campaign_ids is not None:
+        campaigns = campaigns.filter(pk__in=campaign_ids)
+    bot_counts = dict(campaigns.values_list('pk', 'bot_count'))
+
+    rows = list(ServerCampaignBots.objects.select_for_update().order_by('pk'))
+    current = defaultdict(int)
+    fixed_load = defaultdict(int)
+    unmanaged = defaultdict(int)
+    extension_of = {}
+    for row in rows:
+        extension_of.setdefault(row.client_campaign_model_id, row.extension_id)
+        if row.server_id not in servers:
+            unmanaged[row.client_campaign_model_id] += row.bot_count
+        elif row.client_campaign_model_id in bot_counts:
+            current[row.client_campaign_model_id, row.server_id] += row.bot_count
+        else:
+            fixed_load[row.server_id] += row.bot_count
+
+    # Extensions in use on each managed server by rows the plan leaves alone
+    taken = defaultdict(set)
+    for row in rows:
+        if row.server_id in servers and row.client_campaign_model_id not in bot_counts:
+            taken[row.server_id].add(row.extension_id)
+
+    demand = {campaign: max(bots - unmanaged[campaign], 0) for campaign, bots in bot_counts.items()}
+    extensionless = {campaign for campaign in demand if campaign not in extension_of and demand[campaign]}
+    free = list(
+        free_extensions().select_for_update(of=('self',)).values_list('pk', flat=True)[:len(extensionless)]
+    )
+
+    placement, unplaced = plan_placement(
+        {pk: server.bot_capacity for pk, server in servers.items()},
+        demand, current, fixed_load, extensionless, len(free), tolerance,
+        {campaign: extension_of[campaign] for campaign in demand if campaign in extension_of}, taken,
+    )
+
+    allocation = Allocation()
+    allocation.servers = servers
+    allocation.unplaced = unplaced
+    for row in rows:
+        if row.server_id in servers:
+            allocation.load_before[row.server_id] = allocation.load_before.get(row.server_id, 0) + row.bot_count
+    allocation.load_after = dict(fixed_load)
+    for (campaign, server), bots in placement.items():
+        allocation.load_after[server] = allocation.load_after.get(server, 0) + bots
+
+    # Keep the oldest row of each (campaign, managed server) pair; merge or drop the rest
+    kept = {}
+    for row in rows:
+        campaign, server = row.client_campaign_model_id, row.server_id
+        if campaign not in bot_counts or server not in servers:
+            continue
+        bots = placement.get((campaign, server), 0)
+        if (campaign, server) in kept or not bots:
+            allocation.delete.append(row)
+            continue
+        kept[campaign, server] = row
+        if row.bot_count != bots:
+            old, row.bot_count = row.bot_count, bots
+            allocation.update.append((row, old))
+
+    free.reverse()
+    for (campaign, server), bots in sorted(placement.items()):
+        if (campaign, server) in kept:
+            continue
+        if campaign not in extension_of:
+            extension_of[campaign] = free.pop()
+        allocation.create.append(ServerCampaignBots(
+            client_campaign_model_id=campaign, server_id=server, extension_id=extension_of[campaign], bot_count=bots
+        ))
+        allocation.bots_moved += bots
+    for row, old in allocation.update:
+        allocation.bots_moved += max(row.bot_count - old, 0)
+    return allocation
+
+
+def allocate_bots(campaign_ids=None, tolerance=DEFAULT_TOLERANCE, dry_run=False):
+    """Plan and (unless dry_run) apply an allocation in one transaction; returns the Allocation"""
+    with transaction.atomic():
+        if not dry_run:
+            # Before plan_allocation locks bot rows: an admin save holds the log lock while it writes them
+            lock_log()
+        allocation = plan_allocation(campaign_ids, tolerance)
+        if not dry_run:
+            allocation.apply()
+    return allocation
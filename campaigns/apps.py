@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class CampaignsConfig(AppConfig):
     name = 'campaigns'
+
+    def ready(self):
+        from . import bot_config, config_changes
+        bot_config.connect_signals()
+        config_changes.connect_signals()
@@ -0,0 +1,330 @@
+"""
+Per-server bot configuration documents.
+
+A server's document lists the campaigns it runs: its ServerCampaignBots
+rows with their extension, client campaign, campaign and model, current
+status, selected transfer setting and dialers. A campaign with several rows
+on the server is listed once, with its total bot count and the extension
+and bot count of each row. ``build_document`` reads it
+with one joined query (and one for the primary dialers).
+
+Every change that reaches a server's document moves its
+``server_config_versions.version`` forward in the same transaction. Signal
+receivers (connected in CampaignsConfig.ready) map a saved or deleted row
+to the servers whose campaigns use it through ``DEPENDENCIES``; code that
+writes these tables with ``update`` or ``bulk_*`` calls ``servers_changed``
+or ``campaigns_changed`` itself.
+
+Documents are cached serialized, per server and version, so nothing is ever
+invalidated. A server's current version is cached for
+BOT_CONFIG_VERSION_TTL seconds and replaced when a change commits, so a bot
+polling with If-None-Match costs one cache read. Asking for the changes
+``since`` an older version diffs the two cached documents; once the older
+one has expired the full document is sent instead.
+"""
+import json
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models.signals import post_save, pre_delete, pre_save
+
+from infrastructure.models import Server
+from .models import ServerCampaignBots, ServerConfigVersion
+
+
+KEY_PREFIX = 'botconfig'
+
+# Part of the document and delta keys; bump when the document's shape changes
+DOCUMENT_FORMAT = 2
+
+# Documents built while the version moved are rebuilt at most this many times
+BUILD_ATTEMPTS = 3
+
+# Rows that end up in documents: model label -> (ServerCampaignBots lookup,
+# attribute of the row that lookup is compared with)
+DEPENDENCIES = {
+    'campaigns.ServerCampaignBots': ('server', 'server_id'),
+    'campaigns.ClientCampaignModel': ('client_campaign_model', 'pk'),
+    'campaigns.Campaign': ('client_campaign_model__campaign_model__campaign', 'pk'),
+    'campaigns.Model': ('client_campaign_model__campaign_model__model', 'pk'),
+    'campaigns.CampaignModel': ('client_campaign_model__campaign_model', 'pk'),
+    'campaigns.Status': ('client_campaign_model__current_status', 'pk'),
+    'campaigns.TransferSettings': ('client_campaign_model__selected_transfer_setting', 'pk'),
+    'campaigns.DialerSettings': ('client_campaign_model__dialer_settings', 'pk'),
+    'campaigns.PrimaryDialer': ('client_campaign_model__dialer_settings', 'dialer_settings_id'),
+    'campaigns.CloserDialer': ('client_campaign_model__dialer_settings__closer_dialer', 'pk'),
+    'clients.Client': ('client_campaign_model__client', 'pk'),
+    'infrastructure.Extension': ('extension', 'pk'),
+    'infrastructure.Server': ('server', 'pk'),
+}
+
+_batch = threading.local()
+
+
+def _cache():
+    return caches['shared'] if 'shared' in settings.CACHES else caches['default']
+
+
+def _version_key(server_id):
+    return f'{KEY_PREFIX}:version:{server_id}'
+
+
+def _document_key(server_id, version):
+    return f'{KEY_PREFIX}:document:{DOCUMENT_FORMAT}:{server_id}:{version}'
+
+
+def _delta_key(server_id, since, version):
+    return f'{KEY_PREFIX}:delta:{DOCUMENT_FORMAT}:{server_id}:{since}:{version}'
+
+
+# ----------------------------------------------------------------------------
+# Versions
+# ----------------------------------------------------------------------------
+
+def bump_versions(server_ids):
+    """Move the config version of each server forward by one; returns {server id: new version}"""
+    server_ids = sorted(set(server_ids))
+    if not server_ids:
+        return {}
+
+    table = connection.ops.quote_name(ServerConfigVersion._meta.db_table)
+    with connection.cursor() as cursor:
+        # Sorted, so concurrent bumps lock the rows in the same order
+        cursor.execute(
+            f"INSERT INTO {table} (server_id, version, updated_at) "
+            f"SELECT id, 1, now() FROM unnest(%s::bigint[]) AS id ORDER BY id "
+            f"ON CONFLICT (server_id) DO UPDATE SET version = {table}.version + 1, updated_at = now() "
+            f"RETURNING server_id, version",
+            [server_ids]
+        )
+        versions = dict(cursor.fetchall())
+
+    def publish():
+        _cache().set_many(
+            {_version_key(server_id): version for server_id, version in versions.items()},
+            settings.BOT_CONFIG_VERSION_TTL
+        )
+    transaction.on_commit(publish)
+    return versions
+
+
+def servers_changed(server_ids):
+    """Record that the configuration of these servers changed"""
+    if getattr(_batch, 'servers', None) is not None:
+        _batch.servers.update(server_ids)
+    else:
+        bump_versions(server_ids)
+
+
+def campaigns_changed(campaign_ids):
+    """Record that these client campaigns changed, on every server they run on"""
+    servers_changed(
+        ServerCampaignBots.objects.filter(client_campaign_model__in=campaign_ids)
+        .values_list('server_id', flat=True).distinct()
+    )
+
+
+@contextmanager
+def batched_changes():
+    """Collect the changes recorded inside the block and bump each server once when it ends"""
+    if getattr(_batch, 'servers', None) is not None:
+        yield
+        return
+    _batch.servers = set()
+    try:
+        yield
+        servers = _batch.servers
+    finally:
+        _batch.servers = None
+    bump_versions(servers)
+
+
+def _stored_version(server_id):
+    return ServerConfigVersion.objects.filter(server_id=server_id).values_list('version', flat=True).first() or 0
+
+
+def current_version(server_id):
+    """The config version of a server, from the cache when possible"""
+    cache = _cache()
+    version = cache.get(_version_key(server_id))
+    if version is None:
+        version = _stored_version(server_id)
+        # add, not set: a change committed since the read has already stored a newer version
+        cache.add(_version_key(server_id), version, settings.BOT_CONFIG_VERSION_TTL)
+    return version
+
+
+# ----------------------------------------------------------------------------
+# Change tracking
+# ----------------------------------------------------------------------------
+
+def _servers_using(lookup, value):
+    if value is None:
+        return []
+    if lookup == 'server':
+        return [value]
+    return ServerCampaignBots.objects.filter(**{lookup: value}).values_list('server_id', flat=True).distinct()
+
+
+def _before_save(sender, instance, raw=False, **kwargs):
+    # Servers that used the row through its old value, when that value is a foreign key that may change
+    lookup, attribute = DEPENDENCIES[sender._meta.label]
+    if raw or attribute == 'pk' or instance.pk is None:
+        return
+    old = sender._default_manager.filter(pk=instance.pk).values_list(attribute, flat=True).first()
+    if old is not None and old != getattr(instance, attribute):
+        servers_changed(_servers_using(lookup, old))
+
+
+def _changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    lookup, attribute = DEPENDENCIES[sender._meta.label]
+    servers_changed(_servers_using(lookup, getattr(instance, attribute)))
+
+
+def connect_signals():
+    # pre_delete rather than post_delete: the rows linking the deleted one to
+    # its servers may be removed or nulled by the same delete
+    for label in DEPENDENCIES:
+        pre_save.connect(_before_save, sender=label, dispatch_uid=f'{KEY_PREFIX}:{label}:pre_save')
+        post_save.connect(_changed, sender=label, dispatch_uid=f'{KEY_PREFIX}:{label}:post_save')
+        pre_delete.connect(_changed, sender=label, dispatch_uid=f'{KEY_PREFIX}:{label}:pre_delete')
+
+
+# ----------------------------------------------------------------------------
+# Documents
+# ----------------------------------------------------------------------------
+
+def build_document(server_id, version):
+    """The configuration of a server, read from the database"""
+    server = Server.objects.filter(pk=server_id).values('id', 'ip', 'alias', 'domain').first()
+    rows = (
+        ServerCampaignBots.objects.filter(server_id=server_id)
+        .select_related(
+            'extension',
+            'client_campaign_model__client',
+            'client_campaign_model__campaign_model__campaign',
+            'client_campaign_model__campaign_model__model',
+            'client_campaign_model__current_status',
+            'client_campaign_model__selected_transfer_setting',
+            'client_campaign_model__dialer_settings__closer_dialer',
+        )
+        .prefetch_related('client_campaign_model__dialer_settings__primary_dialers')
+        .order_by('client_campaign_model_id', 'pk')
+    )
+
+    campaigns = {}
+    for row in rows:
+        entry = campaigns.get(row.client_campaign_model_id)
+        if entry is None:
+            entry = campaigns[row.client_campaign_model_id] = _campaign_entry(row)
+        entry['bot_count'] += row.bot_count
+        entry['extensions'].append({'extension': row.extension.extension_number, 'bot_count': row.bot_count})
+
+    return {'server': server, 'version': version, 'full': True, 'campaigns': list(campaigns.values())}
+
+
+def _campaign_entry(row):
+    campaign = row.client_campaign_model
+    transfer_setting = campaign.selected_transfer_setting
+    dialer_settings = campaign.dialer_settings
+    closer = dialer_settings.closer_dialer if dialer_settings else None
+    primaries = sorted(dialer_settings.primary_dialers.all(), key=lambda dialer: dialer.pk) if dialer_settings else []
+    return {
+        'id': campaign.pk,
+        # Totals and rows are filled in by build_document
+        'bot_count': 0,
+        'extensions': [],
+        'client': campaign.client.name,
+        'campaign': campaign.campaign_model.campaign.name,
+        'model': campaign.campaign_model.model.name,
+        'status': campaign.current_status.status_name if campaign.current_status else None,
+        'status_since': campaign.current_status_since,
+        'start_date': campaign.start_date,
+        'end_date': campaign.end_date,
+        'transfer_setting': {'id': transfer_setting.pk, 'name': transfer_setting.name} if transfer_setting else None,
+        'long_call_scripts_active': campaign.long_call_scripts_active,
+        'disposition_set': campaign.disposition_set,
+        'current_remote_agents': campaign.current_remote_agents,
+        'primary_dialers': [
+            {
+                'id': dialer.pk,
+                'ip_validation_link': dialer.ip_validation_link,
+                'admin_link': dialer.admin_link,
+                'fronting_campaign': dialer.fronting_campaign,
+                'verifier_campaign': dialer.verifier_campaign,
+                'port': dialer.port,
+            }
+            for dialer in primaries
+        ],
+        'closer_dialer': {
+            'id': closer.pk,
+            'ip_validation_link': closer.ip_validation_link,
+            'admin_link': closer.admin_link,
+            'closer_campaign': closer.closer_campaign,
+            'ingroup': closer.ingroup,
+            'port': closer.port,
+        } if closer else None,
+    }
+
+
+def _dumps(document):
+    return json.dumps(document, cls=DjangoJSONEncoder)
+
+
+def config_document(server_id, version):
+    """
+    (version, serialized document) of a server. The version is newer than
+    the one asked for when the cached version was behind or the server
+    changed while the document was being built.
+    """
+    cache = _cache()
+    for _ in range(BUILD_ATTEMPTS):
+        body = cache.get(_document_key(server_id, version))
+        if body is not None:
+            return version, body
+        document = build_document(server_id, version)
+        latest = _stored_version(server_id)
+        if latest == version:
+            body = _dumps(document)
+            cache.set(_document_key(server_id, version), body, settings.BOT_CONFIG_CACHE_TTL)
+            return version, body
+        version = latest
+    # Still changing: serve the latest read without caching it under a version it may not match
+    document['version'] = version
+    return version, _dumps(document)
+
+
+def config_delta(server_id, since, version, body):
+    """
+    Serialized changes between the since and version documents of a server:
+    campaigns added or changed, and the ids of those removed. None when the
+    since document is no longer cached.
+    """
+    cache = _cache()
+    key = _delta_key(server_id, since, version)
+    delta = cache.get(key)
+    if delta is not None:
+        return delta
+
+    old = cache.get(_document_key(server_id, since))
+    if old is None:
+        return None
+    before = {campaign['id']: campaign for campaign in json.loads(old)['campaigns']}
+    document = json.loads(body)
+    current = {campaign['id'] for campaign in document['campaigns']}
+    delta = _dumps({
+        'server': document['server'],
+        'version': version,
+        'since': since,
+        'full': False,
+        'campaigns': [campaign for campaign in document['campaigns'] if before.get(campaign['id']) != campaign],
+        'removed': sorted(set(before) - current),
+    })
+    cache.set(key, delta, settings.BOT_CONFIG_CACHE_TTL)
+    return delta
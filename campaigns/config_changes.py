@@ -0,0 +1,350 @@
+"""
+Log of configuration changes, and long-poll waits for new entries.
+
+Saving or deleting a client campaign, a server bot row, dialer settings, a
+primary or closer dialer or a status history entry adds a
+``config_changes`` row naming the servers and clients it concerns (signal
+receivers connected in CampaignsConfig.ready; code that writes these tables
+with ``bulk_*`` records its changes itself). The same transaction sends a
+NOTIFY on CHANNEL, so waiters hear of a change once it commits and never of
+one rolled back. The payload only names servers and clients, which lets
+PostgreSQL fold identical notifications of one transaction into one.
+
+Readers page through the log by id, so ids must become visible in order.
+The insert takes a transaction-level advisory lock first and holds it until
+commit: a transaction that logs a change waits for the one before it, and
+an id is never committed after a larger one has already been read. Keep the
+work that follows a logged change in the same transaction short, and have
+code that locks logged rows before writing them (``allocate_bots``) call
+``lock_log`` first, so the two locks are always taken in the same order.
+
+Every event loop (one per ASGI worker process) keeps a single connection
+LISTENing on the channel, opened while somebody waits (``ChangeListener``).
+Waiting requests register with it and hold no database connection; a
+notification wakes only the waiters of the servers and clients it names,
+and those waiting on the same server or client from the same change id
+share one read of the new entries. Under WSGI each request runs its own
+event loop and so opens its own listener connection: serve the change feed
+from xdial_core/asgi.py.
+"""
+import asyncio
+import json
+import logging
+import threading
+import weakref
+from collections import defaultdict
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.db import connection, connections, transaction
+from django.db.models.signals import post_save, pre_delete, pre_save
+
+from .models import ClientCampaignModel, ConfigChange, ServerCampaignBots
+
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'config_changes'
+
+# Transaction-level advisory lock serializing inserts into the log
+ADVISORY_LOCK_KEY = 0x63666763
+
+# Most changes returned by one read
+PAGE_SIZE = 500
+
+# NOTIFY payloads are limited to 8000 bytes; larger ones wake every waiter instead
+MAX_PAYLOAD = 7000
+
+# Logged models: label -> (ClientCampaignModel lookup, attribute of the row that lookup is compared with)
+SOURCES = {
+    'campaigns.ClientCampaignModel': ('pk', 'pk'),
+    'campaigns.ServerCampaignBots': ('pk', 'client_campaign_model_id'),
+    'campaigns.StatusHistory': ('pk', 'client_campaign_id'),
+    'campaigns.DialerSettings': ('dialer_settings', 'pk'),
+    'campaigns.PrimaryDialer': ('dialer_settings', 'dialer_settings_id'),
+    'campaigns.CloserDialer': ('dialer_settings__closer_dialer', 'pk'),
+}
+
+_batch = threading.local()
+
+
+# ----------------------------------------------------------------------------
+# Recording
+# ----------------------------------------------------------------------------
+
+def concerned(label, instance):
+    """(server ids, client ids) a row of a logged model reaches"""
+    lookup, attribute = SOURCES[label]
+    value = getattr(instance, attribute)
+    if value is None:
+        return set(), set()
+    campaigns = ClientCampaignModel.objects.filter(**{lookup: value})
+    clients = set(campaigns.values_list('client_id', flat=True))
+    if label == 'campaigns.ServerCampaignBots':
+        # A bot row only changes the configuration of its own server
+        return {instance.server_id}, clients
+    servers = set(
+        ServerCampaignBots.objects.filter(client_campaign_model__in=campaigns)
+        .values_list('server_id', flat=True).distinct()
+    )
+    return servers, clients
+
+
+def record_change(label, object_id, action, servers, clients):
+    """Log a change of a row, unless it concerns no server or client"""
+    if not servers and not clients:
+        return
+    change = ConfigChange(
+        model=label, object_id=object_id, action=action, servers=sorted(servers), clients=sorted(clients)
+    )
+    if getattr(_batch, 'changes', None) is not None:
+        _batch.changes.append(change)
+    else:
+        _write([change])
+
+
+def record_server_bots(rows, action='save'):
+    """Log changes to ServerCampaignBots rows written without signals"""
+    client_of = dict(
+        ClientCampaignModel.objects.filter(pk__in={row.client_campaign_model_id for row in rows})
+        .values_list('pk', 'client_id')
+    )
+    for row in rows:
+        record_change(
+            ServerCampaignBots._meta.label, row.pk, action, {row.server_id}, {client_of[row.client_campaign_model_id]}
+        )
+
+
+@contextmanager
+def batched_records():
+    """Collect the changes logged inside the block and write them with one insert and one NOTIFY when it ends"""
+    if getattr(_batch, 'changes', None) is not None:
+        yield
+        return
+    _batch.changes = []
+    try:
+        yield
+        changes = _batch.changes
+    finally:
+        _batch.changes = None
+    _write(changes)
+
+
+def lock_log():
+    """Take the log's insert lock now, ahead of row locks the transaction takes before logging changes"""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [ADVISORY_LOCK_KEY])
+
+
+def _write(changes):
+    if not changes:
+        return
+    payload = json.dumps({
+        'servers': sorted({server for change in changes for server in change.servers}),
+        'clients': sorted({client for change in changes for client in change.clients}),
+    })
+    if len(payload) > MAX_PAYLOAD:
+        payload = json.dumps({'all': True})
+    with transaction.atomic():
+        # Held until commit, so ids are taken in commit order (see the module docstring)
+        lock_log()
+        ConfigChange.objects.bulk_create(changes)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, payload])
+
+
+def _before_save(sender, instance, raw=False, **kwargs):
+    # What the row reached before the save, when a save can change that
+    lookup, attribute = SOURCES[sender._meta.label]
+    if raw or instance.pk is None or (attribute == 'pk' and lookup != 'pk'):
+        return
+    old = sender._default_manager.filter(pk=instance.pk).first()
+    if old is not None:
+        instance._config_change_before = concerned(sender._meta.label, old)
+
+
+def _saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    servers, clients = concerned(sender._meta.label, instance)
+    before = instance.__dict__.pop('_config_change_before', None)
+    if before:
+        servers |= before[0]
+        clients |= before[1]
+    record_change(sender._meta.label, instance.pk, 'save', servers, clients)
+
+
+def _deleting(sender, instance, **kwargs):
+    record_change(sender._meta.label, instance.pk, 'delete', *concerned(sender._meta.label, instance))
+
+
+def connect_signals():
+    # pre_delete rather than post_delete: the rows linking the deleted one to
+    # its servers and clients may be removed or nulled by the same delete
+    for label in SOURCES:
+        pre_save.connect(_before_save, sender=label, dispatch_uid=f'{CHANNEL}:{label}:pre_save')
+        post_save.connect(_saved, sender=label, dispatch_uid=f'{CHANNEL}:{label}:post_save')
+        pre_delete.connect(_deleting, sender=label, dispatch_uid=f'{CHANNEL}:{label}:pre_delete')
+
+
+# ----------------------------------------------------------------------------
+# Waiting
+# ----------------------------------------------------------------------------
+
+class ChangeListener:
+    """The LISTEN connection of one event loop and the requests waiting on it"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.waiters = defaultdict(set)
+        self.reads = {}
+        # Notifications handled so far; a read is only shared by waiters that subscribed before it started
+        self.heard = 0
+        self.connection = None
+        self.fileno = None
+        self.started = None
+
+    async def subscribe(self, key):
+        """An event set when a change for key ('server' or 'client', id) commits; returns once listening"""
+        event = asyncio.Event()
+        self.waiters[key].add(event)
+        if self.started is None:
+            self.started = self.loop.create_task(self._start())
+        await asyncio.shield(self.started)
+        return event
+
+    async def read(self, key, after):
+        """Changes for key after the change id after; waiters woken together share one query"""
+        read = (key, after, self.heard)
+        task = self.reads.get(read)
+        if task is None:
+            task = self.reads[read] = self.loop.create_task(_read_changes(*key, after))
+            task.add_done_callback(lambda done: self.reads.pop(read, None))
+        return await asyncio.shield(task)
+
+    def unsubscribe(self, key, event):
+        waiting = self.waiters.get(key)
+        if waiting is not None:
+            waiting.discard(event)
+            if not waiting:
+                del self.waiters[key]
+        if not self.waiters:
+            self._stop()
+
+    async def _start(self):
+        try:
+            listening = await self.loop.run_in_executor(None, self._connect)
+        except Exception:
+            # Waiters fall back to reading again when their timeout ends
+            logger.exception('Could not listen for configuration changes')
+            self.started = None
+            return
+        self.connection, self.fileno = listening, listening.fileno()
+        if not self.waiters:
+            self._close()
+            return
+        self.loop.add_reader(self.fileno, self._read)
+
+    @staticmethod
+    def _connect():
+        database = connections['default']
+        listening = database.get_new_connection(database.get_connection_params())
+        listening.autocommit = True
+        with listening.cursor() as cursor:
+            cursor.execute(f'LISTEN {CHANNEL}')
+        return listening
+
+    def _stop(self):
+        # A listener still connecting closes itself if nobody waits by then
+        if self.started is not None and self.started.done():
+            self._close()
+
+    def _close(self):
+        if self.connection is not None:
+            self.loop.remove_reader(self.fileno)
+            self.connection.close()
+        self.connection = self.fileno = self.started = None
+
+    def _read(self):
+        try:
+            self.connection.poll()
+        except Exception:
+            logger.exception('Configuration change listener connection lost')
+            self._close()
+            # Let everyone read again rather than miss what arrives until they reconnect
+            self._wake(list(self.waiters))
+            return
+        while self.connection.notifies:
+            notify = self.connection.notifies.pop(0)
+            try:
+                payload = json.loads(notify.payload)
+            except ValueError:
+                payload = {'all': True}
+            if payload.get('all'):
+                self._wake(list(self.waiters))
+            else:
+                self._wake(
+                    [('server', server) for server in payload.get('servers', [])]
+                    + [('client', client) for client in payload.get('clients', [])]
+                )
+
+    def _wake(self, keys):
+        self.heard += 1
+        for key in keys:
+            for event in self.waiters.get(key, ()):
+                event.set()
+
+
+_listeners = weakref.WeakKeyDictionary()
+
+
+def get_listener():
+    """The ChangeListener of the running event loop"""
+    loop = asyncio.get_running_loop()
+    listener = _listeners.get(loop)
+    if listener is None:
+        listener = _listeners[loop] = ChangeListener(loop)
+    return listener
+
+
+def latest_change_id():
+    return ConfigChange.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+@sync_to_async
+def _read_changes(kind, value, after):
+    try:
+        return list(
+            ConfigChange.objects.filter(pk__gt=after, **{f'{kind}s__contains': [value]})
+            .order_by('pk')
+            .values('id', 'model', 'object_id', 'action', 'servers', 'clients', 'created_at')[:PAGE_SIZE]
+        )
+    finally:
+        # Waiting requests hold no connection
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+async def wait_for_changes(kind, value, after, timeout):
+    """
+    Changes of a server or client (kind 'server' or 'client', value its id)
+    logged after the change id after, oldest first; waits up to timeout
+    seconds for one when there is none yet.
+    """
+    listener = get_listener()
+    key = (kind, value)
+    event = await listener.subscribe(key)
+    try:
+        # Read only once listening, so a change committed meanwhile is either read or heard of
+        changes = await listener.read(key, after)
+        if changes or timeout <= 0:
+            return changes
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            if listener.connection is not None:
+                return []
+            # Not listening (see ChangeListener._start): look once more before answering
+        return await listener.read(key, after)
+    finally:
+        listener.unsubscribe(key, event)
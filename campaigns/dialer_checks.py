@@ -0,0 +1,168 @@
+"""
+Concurrent health checks of the primary and closer dialer links.
+
+Every ``ip_validation_link`` and ``admin_link`` is fetched from a bounded
+thread pool. Links on the same host share one ``requests.Session`` (and so
+its keep-alive connections), and at most DIALER_CHECK_PER_HOST requests run
+against a host at a time, so a dialer box serving many links is never
+flooded while other hosts are probed in parallel. Each request has a
+connect and a read timeout of DIALER_CHECK_TIMEOUT seconds, so a run takes
+roughly (links / workers) round trips, bounded by the slowest host.
+
+Results replace the previous ones in ``dialer_checks``, one row per dialer
+link, and are shown in the dialer admins.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.utils import timezone
+
+from .models import CloserDialer, DialerCheck, PrimaryDialer
+
+
+LINK_FIELDS = {
+    DialerCheck.IP_VALIDATION: 'ip_validation_link',
+    DialerCheck.ADMIN: 'admin_link',
+}
+
+# DialerCheck field pointing at each dialer model
+DIALER_FIELDS = {
+    PrimaryDialer: 'primary_dialer',
+    CloserDialer: 'closer_dialer',
+}
+
+
+class Target:
+    """One dialer link to probe"""
+
+    def __init__(self, dialer, link, url):
+        self.dialer = dialer
+        self.link = link
+        self.url = url if '://' in url else f'http://{url}'
+
+    @property
+    def host(self):
+        try:
+            return urlsplit(self.url).netloc.lower()
+        except ValueError:
+            # Malformed; probing it fails and is stored like any other failure
+            return ''
+
+
+def collect_targets(dialers):
+    """Targets for every non-empty link of dialers"""
+    targets = []
+    for dialer in dialers:
+        for link, field in LINK_FIELDS.items():
+            url = (getattr(dialer, field) or '').strip()
+            if url:
+                targets.append(Target(dialer, link, url))
+    return targets
+
+
+def all_targets():
+    return collect_targets([*PrimaryDialer.objects.order_by('id'), *CloserDialer.objects.order_by('id')])
+
+
+class HostPool:
+    """A keep-alive session and a concurrency limit per host"""
+
+    def __init__(self, per_host):
+        self.per_host = per_host
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def get(self, host):
+        with self._lock:
+            if host not in self._hosts:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.per_host, max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._hosts[host] = (session, threading.BoundedSemaphore(self.per_host))
+            return self._hosts[host]
+
+    def close(self):
+        for session, _ in self._hosts.values():
+            session.close()
+
+
+def probe(target, pool, timeout, verify):
+    """Fetch target.url, returning the fields of its DialerCheck; any error is a failed check"""
+    try:
+        session, slots = pool.get(target.host)
+        with slots:
+            start = time.perf_counter()
+            response = session.get(target.url, timeout=timeout, verify=verify, allow_redirects=True)
+            latency = (time.perf_counter() - start) * 1000
+            response.close()
+    except Exception as e:
+        # Not only RequestException: a malformed link must not cost the results of the whole run
+        return {
+            'ok': False,
+            'status_code': None,
+            'latency_ms': None,
+            'error': f'{e.__class__.__name__}: {e}'[:1000],
+        }
+    return {
+        'ok': response.status_code < 400,
+        'status_code': response.status_code,
+        'latency_ms': round(latency, 1),
+        'error': '' if response.status_code < 400 else response.reason or '',
+    }
+
+
+def run_checks(targets, workers=None, per_host=None, timeout=None, verify=None):
+    """Probe targets concurrently and store the results; returns the saved DialerChecks"""
+    workers = workers or settings.DIALER_CHECK_WORKERS
+    per_host = per_host or settings.DIALER_CHECK_PER_HOST
+    timeout = timeout or settings.DIALER_CHECK_TIMEOUT
+    verify = settings.DIALER_CHECK_VERIFY_TLS if verify is None else verify
+    if not targets:
+        return []
+
+    pool = HostPool(per_host)
+    try:
+        with ThreadPoolExecutor(max_workers=min(workers, len(targets))) as executor:
+            results = list(executor.map(lambda target: probe(target, pool, timeout, verify), targets))
+    finally:
+        pool.close()
+
+    checked_at = timezone.now()
+    checks = []
+    for target, result in zip(targets, results):
+        checks.append(DialerCheck(
+            **{DIALER_FIELDS[type(target.dialer)]: target.dialer},
+            link=target.link,
+            url=target.url[:500],
+            checked_at=checked_at,
+            **result,
+        ))
+    return save_checks(checks)
+
+
+def save_checks(checks):
+    """Upsert checks, one statement per dialer type"""
+    update_fields = ['url', 'ok', 'status_code', 'latency_ms', 'error', 'checked_at']
+    for field in DIALER_FIELDS.values():
+        rows = [check for check in checks if getattr(check, f'{field}_id') is not None]
+        if rows:
+            DialerCheck.objects.bulk_create(
+                rows, update_conflicts=True, unique_fields=[field, 'link'], update_fields=update_fields
+            )
+    return checks
+
+
+def prune_checks():
+    """Delete checks of links that were cleared since they were probed"""
+    deleted = 0
+    for model, field in DIALER_FIELDS.items():
+        for link, link_field in LINK_FIELDS.items():
+            empty = model.objects.filter(**{f'{link_field}__isnull': True}) | model.objects.filter(**{link_field: ''})
+            deleted += DialerCheck.objects.filter(link=link, **{f'{field}__in': empty}).delete()[0]
+    return deleted
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from campaigns.allocation import DEFAULT_TOLERANCE, AllocationError, allocate_bots
+
+
+class Command(BaseCommand):
+    help = (
+        'Balance campaign bots (ClientCampaignModel.bot_count) across servers with a bot capacity, '
+        'moving as few as possible. Prints the changes; pass --apply to write them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--campaign', type=int, action='append', dest='campaigns',
+                            help='Only allocate this client campaign (repeatable); others stay where they are')
+        parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                            help='Utilization spread between servers left alone (default %(default)s)')
+        parser.add_argument('--apply', action='store_true', help='Write the changes')
+
+    def handle(self, *args, **options):
+        try:
+            allocation = allocate_bots(options['campaigns'], options['tolerance'], dry_run=not options['apply'])
+        except AllocationError as e:
+            raise CommandError(e)
+
+        for line in allocation.diff():
+            self.stdout.write(line)
+        if not allocation.changed and not allocation.unplaced:
+            self.stdout.write(self.style.SUCCESS('Bots are already balanced'))
+            return
+        verb = 'Applied' if options['apply'] else 'Dry run'
+        self.stdout.write(self.style.SUCCESS(f'{verb}: {allocation.summary()}'))
@@ -0,0 +1,115 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from campaigns.allocation import DEFAULT_TOLERANCE, allocate_bots, plan_placement
+from campaigns.models import ClientCampaignModel, ServerCampaignBots
+from infrastructure.models import Extension, Server
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the bot allocation engine on synthetic campaigns and servers: a cold start, a re-run '
+        'on the result, and a re-run after churn (changed bot counts, new campaigns, a drained server). '
+        'With --db, also plans and applies against the database in a rolled-back transaction.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--campaigns', type=int, default=500)
+        parser.add_argument('--servers', type=int, default=100)
+        parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per scenario; the fastest is reported')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--db', action='store_true', help='Also run against the database (rolled back)')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        self.repeat = max(options['repeat'], 1)
+        self.tolerance = options['tolerance']
+
+        capacity = {server: random.choice([200, 300, 400]) for server in range(1, options['servers'] + 1)}
+        demand = {campaign: random.randint(1, 50) for campaign in range(1, options['campaigns'] + 1)}
+        total = sum(capacity.values())
+        self.stdout.write(
+            f"{len(demand)} campaigns, {sum(demand.values())} bots, {len(capacity)} servers, "
+            f"capacity {total} ({sum(demand.values()) / total:.0%} used)"
+        )
+
+        cold = self._run('cold start', capacity, demand, {})
+        self._run('re-run on the result', capacity, demand, cold)
+
+        churned = dict(demand)
+        for campaign in random.sample(sorted(churned), len(churned) // 10):
+            churned[campaign] = max(churned[campaign] + random.randint(-10, 10), 0)
+        for campaign in range(len(demand) + 1, len(demand) + len(demand) // 25 + 1):
+            churned[campaign] = random.randint(1, 50)
+        drained = dict(capacity)
+        del drained[next(iter(drained))]
+        self._run('after churn', drained, churned, cold)
+
+        if options['db']:
+            self._database(options)
+
+    def _run(self, label, capacity, demand, current):
+        best = None
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            placement, unplaced = plan_placement(capacity, demand, current, tolerance=self.tolerance)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        moved = sum(max(bots - current.get(key, 0), 0) for key, bots in placement.items())
+        rows = sum(1 for key in placement.keys() | current.keys() if placement.get(key) != current.get(key))
+        load = {server: 0 for server in capacity}
+        for (_, server), bots in placement.items():
+            load[server] += bots
+        utilization = [load[server] / capacity[server] for server in capacity]
+        self.stdout.write(
+            f"  {label:<24} {best * 1000:>8.1f} ms  {moved:>6} bots placed anew, {rows:>5} rows changed, "
+            f"spread {max(utilization) - min(utilization):.1%}, {sum(unplaced.values())} unplaced"
+        )
+        return placement
+
+    def _database(self, options):
+        """Cold start and a re-run of allocate_bots on real tables, inside a transaction that is rolled back"""
+        template = ClientCampaignModel.objects.order_by('pk').first()
+        if template is None:
+            raise CommandError('No client campaigns to copy; run seed_benchmark_data first')
+        try:
+            with transaction.atomic():
+                ServerCampaignBots.objects.all().delete()
+                Server.objects.update(bot_capacity=0)
+                Server.objects.bulk_create([
+                    Server(ip=f'10.250.{i // 250}.{i % 250}', alias=f'alloc-bench-{i}',
+                           bot_capacity=random.choice([200, 300, 400]))
+                    for i in range(options['servers'])
+                ])
+                missing = options['campaigns'] - ClientCampaignModel.objects.count()
+                if missing > 0:
+                    copies = []
+                    for _ in range(missing):
+                        copy = ClientCampaignModel.objects.get(pk=template.pk)
+                        copy.pk = None
+                        copies.append(copy)
+                    ClientCampaignModel.objects.bulk_create(copies)
+                campaign_ids = list(ClientCampaignModel.objects.order_by('pk').values_list('pk', flat=True))
+                campaign_ids = campaign_ids[:options['campaigns']]
+                for campaign_id in campaign_ids:
+                    ClientCampaignModel.objects.filter(pk=campaign_id).update(bot_count=random.randint(1, 50))
+                first = (Extension.objects.order_by('-extension_number')
+                         .values_list('extension_number', flat=True).first() or 0) + 1
+                Extension.objects.bulk_create([Extension(extension_number=first + i) for i in range(len(campaign_ids))])
+
+                for label in ('cold start', 're-run on the result'):
+                    start = time.perf_counter()
+                    allocation = allocate_bots(campaign_ids, self.tolerance)
+                    elapsed = time.perf_counter() - start
+                    self.stdout.write(f"  db {label:<21} {elapsed * 1000:>8.1f} ms  {allocation.summary()}")
+                raise _Rollback
+        except _Rollback:
+            pass
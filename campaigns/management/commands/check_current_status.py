@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from campaigns.bot_config import campaigns_changed
+from campaigns.models import ClientCampaignModel, StatusHistory
+
+
+class Command(BaseCommand):
+    help = 'Check ClientCampaignModel.current_status against the open status history entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='Repair mismatched current_status pointers')
+
+    def handle(self, *args, **options):
+        open_history = StatusHistory.objects.filter(
+            client_campaign=OuterRef('pk'),
+            end_date__isnull=True
+        ).order_by('-start_date')
+
+        campaigns = ClientCampaignModel.objects.annotate(
+            expected_status=Subquery(open_history.values('status')[:1]),
+            expected_since=Subquery(open_history.values('start_date')[:1]),
+        )
+        both_set = Q(current_status__isnull=False, expected_status__isnull=False)
+        mismatched = campaigns.filter(
+            (both_set & ~Q(current_status=F('expected_status')))
+            | (both_set & ~Q(current_status_since=F('expected_since')))
+            | Q(current_status__isnull=True, expected_status__isnull=False)
+            | Q(current_status__isnull=False, expected_status__isnull=True)
+        ).select_related('client').order_by('id')
+
+        count = 0
+        with transaction.atomic():
+            for campaign in mismatched.select_for_update(of=('self',)):
+                count += 1
+                self.stdout.write(self.style.WARNING(
+                    f'#{campaign.id} {campaign.client.name}: '
+                    f'current_status={campaign.current_status_id} expected={campaign.expected_status}'
+                ))
+                if options['fix']:
+                    ClientCampaignModel.objects.filter(pk=campaign.pk).update(
+                        current_status_id=campaign.expected_status,
+                        current_status_since=campaign.expected_since
+                    )
+                    campaigns_changed([campaign.pk])
+
+        # More than one open entry means history itself is inconsistent
+        multiple_open = StatusHistory.objects.filter(
+            end_date__isnull=True,
+            client_campaign__isnull=False
+        ).values('client_campaign').annotate(open_count=Count('id')).filter(open_count__gt=1)
+        for row in multiple_open:
+            self.stdout.write(self.style.WARNING(
+                f"#{row['client_campaign']}: {row['open_count']} open status history entries"
+            ))
+
+        if count == 0:
+            self.stdout.write(self.style.SUCCESS('All current_status pointers are consistent'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {count} client campaign(s)'))
+        else:
+            self.stdout.write(self.style.ERROR(f'{count} inconsistent client campaign(s); run with --fix to repair'))
@@ -0,0 +1,77 @@
+import logging
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from campaigns.dialer_checks import all_targets, prune_checks, run_checks
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Probe the IP validation and admin links of every primary and closer dialer concurrently '
+        'and store status and latency for the dialer admins. With --loop, keeps checking every '
+        'DIALER_CHECK_INTERVAL seconds until stopped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Requests in flight; defaults to DIALER_CHECK_WORKERS')
+        parser.add_argument('--per-host', type=int,
+                            help='Requests in flight per host; defaults to DIALER_CHECK_PER_HOST')
+        parser.add_argument('--timeout', type=float,
+                            help='Connect and read timeout in seconds; defaults to DIALER_CHECK_TIMEOUT')
+        parser.add_argument('--insecure', action='store_true', help="Don't verify TLS certificates")
+        parser.add_argument('--loop', action='store_true', help='Repeat until stopped')
+        parser.add_argument('--interval', type=int,
+                            help='Seconds between runs with --loop; defaults to DIALER_CHECK_INTERVAL')
+
+    def handle(self, *args, **options):
+        stopping = threading.Event()
+        if options['loop']:
+            def stop(signum, frame):
+                stopping.set()
+            signal.signal(signal.SIGTERM, stop)
+            signal.signal(signal.SIGINT, stop)
+
+        while True:
+            try:
+                self.check(options)
+            except Exception:
+                if not options['loop']:
+                    raise
+                # A lost database connection or the like: try again on the next run
+                logger.exception('Dialer check run failed')
+            if not options['loop'] or stopping.wait(options['interval'] or settings.DIALER_CHECK_INTERVAL):
+                break
+            close_old_connections()
+
+    def check(self, options):
+        targets = all_targets()
+        start = time.perf_counter()
+        checks = run_checks(
+            targets,
+            workers=options['workers'],
+            per_host=options['per_host'],
+            timeout=options['timeout'],
+            verify=False if options['insecure'] else None,
+        )
+        elapsed = time.perf_counter() - start
+        pruned = prune_checks()
+
+        failed = [check for check in checks if not check.ok]
+        for check in failed:
+            dialer = check.primary_dialer or check.closer_dialer
+            self.stdout.write(self.style.WARNING(
+                f'{dialer} {check.get_link_display()} {check.url}: {check.status_code or check.error}'
+            ))
+        hosts = len({target.host for target in targets})
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {len(checks)} link(s) on {hosts} host(s) in {elapsed:.1f}s: '
+            f'{len(checks) - len(failed)} ok, {len(failed)} failed'
+            + (f', {pruned} stale result(s) removed' if pruned else '')
+        ))
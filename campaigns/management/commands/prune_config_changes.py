@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from campaigns.models import ConfigChange
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete configuration change log entries older than the retention period. '
+        'Subscribers further behind than that only miss the pruned entries; safe to run from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help='Delete entries older than this; defaults to CONFIG_CHANGE_RETENTION_DAYS')
+
+    def handle(self, *args, **options):
+        days = settings.CONFIG_CHANGE_RETENTION_DAYS if options['days'] is None else options['days']
+        if days < 1:
+            raise CommandError('--days must be at least 1')
+        cutoff = timezone.now() - timedelta(days=days)
+
+        deleted, _ = ConfigChange.objects.filter(created_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} change(s) logged before {cutoff:%Y-%m-%d %H:%M}'))
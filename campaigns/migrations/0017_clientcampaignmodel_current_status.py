@@ -0,0 +1,44 @@
+# Generated by Django 6.0 on 2026-10-17 00:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_current_status(apps, schema_editor):
+    ClientCampaignModel = apps.get_model('campaigns', 'ClientCampaignModel')
+    StatusHistory = apps.get_model('campaigns', 'StatusHistory')
+    open_history = StatusHistory.objects.filter(
+        client_campaign=OuterRef('pk'),
+        end_date__isnull=True
+    ).order_by('-start_date')
+    ClientCampaignModel.objects.update(
+        current_status=Subquery(open_history.values('status')[:1]),
+        current_status_since=Subquery(open_history.values('start_date')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0016_remove_clientcampaignmodel_idx_ccm_active'),
+        ('clients', '0006_remove_client_plain_password'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clientcampaignmodel',
+            name='current_status',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='current_campaigns', to='campaigns.status'),
+        ),
+        migrations.AddField(
+            model_name='clientcampaignmodel',
+            name='current_status_since',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='clientcampaignmodel',
+            index=models.Index(fields=['current_status'], name='idx_ccm_current_status'),
+        ),
+        migrations.RunPython(backfill_current_status, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-17 01:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0017_clientcampaignmodel_current_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DialerCheck',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('link', models.CharField(choices=[('ip_validation', 'IP Validation'), ('admin', 'Admin')], max_length=20)),
+                ('url', models.CharField(max_length=500)),
+                ('ok', models.BooleanField(default=False)),
+                ('status_code', models.IntegerField(blank=True, null=True)),
+                ('latency_ms', models.FloatField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('checked_at', models.DateTimeField()),
+                ('closer_dialer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='checks', to='campaigns.closerdialer')),
+                ('primary_dialer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='checks', to='campaigns.primarydialer')),
+            ],
+            options={
+                'verbose_name': 'Dialer Check',
+                'verbose_name_plural': 'Dialer Checks',
+                'db_table': 'dialer_checks',
+                'indexes': [models.Index(fields=['ok', 'checked_at'], name='idx_dialer_checks_ok')],
+                'constraints': [models.UniqueConstraint(fields=('primary_dialer', 'link'), name='uniq_dialer_check_primary'), models.UniqueConstraint(fields=('closer_dialer', 'link'), name='uniq_dialer_check_closer'), models.CheckConstraint(condition=models.Q(('primary_dialer__isnull', True), ('closer_dialer__isnull', True), _connector='XOR'), name='dialer_check_one_dialer')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-17 01:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0018_dialercheck'),
+        ('infrastructure', '0002_server_bot_capacity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='servercampaignbots',
+            index=models.Index(fields=['server', 'extension'], name='idx_scb_server_extension'),
+        ),
+        migrations.RemoveIndex(
+            model_name='servercampaignbots',
+            name='idx_scb_server',
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-17 01:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0019_scb_server_extension_index'),
+        ('infrastructure', '0002_server_bot_capacity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServerConfigVersion',
+            fields=[
+                ('server', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='config_version', serialize=False, to='infrastructure.server')),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Server Config Version',
+                'verbose_name_plural': 'Server Config Versions',
+                'db_table': 'server_config_versions',
+            },
+        ),
+    ]
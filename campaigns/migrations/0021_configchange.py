@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-17 01:36
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0020_server_config_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConfigChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100)),
+                ('object_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('save', 'Saved'), ('delete', 'Deleted')], max_length=10)),
+                ('servers', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, size=None)),
+                ('clients', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, size=None)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Config Change',
+                'verbose_name_plural': 'Config Changes',
+                'db_table': 'config_changes',
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['servers'], name='idx_config_changes_servers'), django.contrib.postgres.indexes.GinIndex(fields=['clients'], name='idx_config_changes_clients'), models.Index(fields=['created_at'], name='idx_config_changes_created')],
+            },
+        ),
+    ]
@@ -1,3 +1,5 @@
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 
 
@@ -236,6 +238,58 @@ class DialerSettings(models.Model):
         return f"Dialer Settings #{self.id}"
 
 
+class DialerCheck(models.Model):
+    """Latest probe of one dialer link, written by check_dialers (see campaigns/dialer_checks.py)"""
+    IP_VALIDATION = 'ip_validation'
+    ADMIN = 'admin'
+    LINK_CHOICES = [
+        (IP_VALIDATION, 'IP Validation'),
+        (ADMIN, 'Admin'),
+    ]
+
+    # Exactly one of the two dialers is set
+    primary_dialer = models.ForeignKey(
+        PrimaryDialer,
+        on_delete=models.CASCADE,
+        related_name='checks',
+        blank=True,
+        null=True
+    )
+    closer_dialer = models.ForeignKey(
+        CloserDialer,
+        on_delete=models.CASCADE,
+        related_name='checks',
+        blank=True,
+        null=True
+    )
+    link = models.CharField(max_length=20, choices=LINK_CHOICES)
+    url = models.CharField(max_length=500)
+    ok = models.BooleanField(default=False)
+    status_code = models.IntegerField(blank=True, null=True)
+    latency_ms = models.FloatField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    checked_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'dialer_checks'
+        verbose_name = 'Dialer Check'
+        verbose_name_plural = 'Dialer Checks'
+        constraints = [
+            models.UniqueConstraint(fields=['primary_dialer', 'link'], name='uniq_dialer_check_primary'),
+            models.UniqueConstraint(fields=['closer_dialer', 'link'], name='uniq_dialer_check_closer'),
+            models.CheckConstraint(
+                condition=models.Q(primary_dialer__isnull=True) ^ models.Q(closer_dialer__isnull=True),
+                name='dialer_check_one_dialer',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['ok', 'checked_at'], name='idx_dialer_checks_ok'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_link_display()} {self.url} - {'OK' if self.ok else 'FAIL'}"
+
+
 class ClientCampaignModel(models.Model):
     client = models.ForeignKey(
         'clients.Client',
@@ -272,29 +326,76 @@ class ClientCampaignModel(models.Model):
     bot_count = models.IntegerField(default=0, help_text="Number of bots for this campaign")
     long_call_scripts_active = models.BooleanField(default=False, help_text="Are long call scripts active?")
     disposition_set = models.BooleanField(default=False, help_text="Is disposition set configured?")
+    # Denormalized pointer to the open StatusHistory row, maintained by change_status()
+    current_status = models.ForeignKey(
+        Status,
+        on_delete=models.RESTRICT,
+        related_name='current_campaigns',
+        blank=True,
+        null=True,
+        editable=False
+    )
+    current_status_since = models.DateTimeField(blank=True, null=True, editable=False)
     
     
     def current_status_history(self):
         """Get the current (active) status history entry"""
         return self.status_history.filter(end_date__isnull=True).first()
+
+    def change_status(self, new_status, when=None):
+        """
+        Close the open status history entry, open one for new_status and move
+        the current_status pointer. Call inside the caller's transaction.
+        Returns True if the status changed.
+        """
+        from django.utils import timezone
+        if new_status is None:
+            return False
+        when = when or timezone.now()
+
+        current_history = self.current_status_history()
+        if current_history and current_history.status_id == new_status.id:
+            if self.current_status_id != new_status.id:
+                self._set_current_status(new_status, current_history.start_date)
+            return False
+
+        # Close old status history if it exists
+        if current_history:
+            current_history.end_date = when
+            current_history.save(update_fields=['end_date'])
+
+        # Create new status history
+        StatusHistory.objects.create(
+            client_campaign=self,
+            status=new_status,
+            start_date=when
+        )
+        self._set_current_status(new_status, when)
+        return True
+
+    def _set_current_status(self, status, since):
+        self.current_status = status
+        self.current_status_since = since
+        type(self).objects.filter(pk=self.pk).update(
+            current_status=status,
+            current_status_since=since
+        )
+        # update() sends no signals
+        from .bot_config import campaigns_changed
+        campaigns_changed([self.pk])
     
     @property
     def is_active(self):
         """
-        Calculate if campaign is active based on recent calls.
         A campaign is considered active if it has had calls in the last minute.
+        Reads the campaign_activity row maintained by call ingestion.
         """
-        from django.utils import timezone
-        from datetime import timedelta
-        one_minute_ago = timezone.now() - timedelta(minutes=1)
-        return self.calls.filter(timestamp__gte=one_minute_ago).exists()
+        from django.core.exceptions import ObjectDoesNotExist
+        try:
+            return self.activity.is_active
+        except ObjectDoesNotExist:
+            return False
 
-    @property
-    def current_status(self):
-        """Get the current status"""
-        current = self.current_status_history
-        return current.status if current else None
-    
     class Meta:
         db_table = 'client_campaign_model'
         verbose_name = 'Client Campaign'
@@ -305,6 +406,7 @@ class ClientCampaignModel(models.Model):
             models.Index(fields=['start_date'], name='idx_ccm_start'),
             models.Index(fields=['end_date'], name='idx_ccm_end'),
             models.Index(fields=['bot_count'], name='idx_ccm_bot_count'),
+            models.Index(fields=['current_status'], name='idx_ccm_current_status'),
         ]
     
     def __str__(self):
@@ -335,7 +437,8 @@ class ServerCampaignBots(models.Model):
         verbose_name_plural = 'Server Campaign Bots'
         indexes = [
             models.Index(fields=['client_campaign_model'], name='idx_scb_ccm'),
-            models.Index(fields=['server'], name='idx_scb_server'),
+            # Free-extension probes per server (infrastructure/extensions.py); also covers server lookups
+            models.Index(fields=['server', 'extension'], name='idx_scb_server_extension'),
             models.Index(fields=['extension'], name='idx_scb_extension'),
         ]
     
@@ -343,3 +446,51 @@ class ServerCampaignBots(models.Model):
         return f"{self.server} - {self.client_campaign_model}"
 
 
+
+
+class ServerConfigVersion(models.Model):
+    """Version of a server's bot configuration, moved forward on every change to it (see campaigns/bot_config.py)"""
+    server = models.OneToOneField(
+        'infrastructure.Server',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='config_version'
+    )
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'server_config_versions'
+        verbose_name = 'Server Config Version'
+        verbose_name_plural = 'Server Config Versions'
+
+    def __str__(self):
+        return f"{self.server} - v{self.version}"
+
+
+class ConfigChange(models.Model):
+    """One saved or deleted configuration row and the servers and clients it concerns (see campaigns/config_changes.py)"""
+    ACTION_CHOICES = [
+        ('save', 'Saved'),
+        ('delete', 'Deleted'),
+    ]
+
+    model = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    servers = ArrayField(models.BigIntegerField(), default=list, blank=True)
+    clients = ArrayField(models.BigIntegerField(), default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'config_changes'
+        verbose_name = 'Config Change'
+        verbose_name_plural = 'Config Changes'
+        indexes = [
+            GinIndex(fields=['servers'], name='idx_config_changes_servers'),
+            GinIndex(fields=['clients'], name='idx_config_changes_clients'),
+            models.Index(fields=['created_at'], name='idx_config_changes_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} #{self.object_id} {self.get_action_display().lower()}"
@@ -1,3 +1,101 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from .allocation import plan_placement
+
+
+def server_loads(placement):
+    loads = {}
+    for (campaign, server), bots in placement.items():
+        loads[server] = loads.get(server, 0) + bots
+    return loads
+
+
+def campaign_bots(placement, campaign):
+    return sum(bots for (c, server), bots in placement.items() if c == campaign)
+
+
+class PlanPlacementTests(SimpleTestCase):
+    def test_no_capacity_leaves_everything_unplaced(self):
+        self.assertEqual(plan_placement({}, {10: 5, 11: 0}, {}), ({}, {10: 5}))
+
+    def test_balanced_placement_is_kept(self):
+        current = {(10, 1): 40, (11, 2): 40}
+        placement, unplaced = plan_placement({1: 100, 2: 100}, {10: 40, 11: 40}, current)
+        self.assertEqual(placement, current)
+        self.assertEqual(unplaced, {})
+
+    def test_trims_campaigns_over_their_bot_count(self):
+        placement, unplaced = plan_placement({1: 100, 2: 100}, {10: 30}, {(10, 1): 20, (10, 2): 20})
+        self.assertEqual(campaign_bots(placement, 10), 30)
+        # Trimmed in place, nothing moved
+        self.assertLessEqual(set(placement), {(10, 1), (10, 2)})
+        self.assertEqual(unplaced, {})
+
+    def test_clears_overloaded_servers(self):
+        capacity = {1: 50, 2: 100}
+        placement, unplaced = plan_placement(capacity, {10: 40, 11: 30}, {(10, 1): 40, (11, 1): 30})
+        for server, load in server_loads(placement).items():
+            self.assertLessEqual(load, capacity[server])
+        self.assertEqual(campaign_bots(placement, 10), 40)
+        self.assertEqual(campaign_bots(placement, 11), 30)
+        self.assertEqual(unplaced, {})
+
+    def test_places_new_bots_on_the_freest_server(self):
+        placement, unplaced = plan_placement({1: 100, 2: 100}, {10: 30}, {}, fixed_load={1: 50})
+        self.assertEqual(placement, {(10, 2): 30})
+        self.assertEqual(unplaced, {})
+
+    def test_reports_bots_that_do_not_fit(self):
+        placement, unplaced = plan_placement({1: 50}, {10: 80}, {})
+        self.assertEqual(placement, {(10, 1): 50})
+        self.assertEqual(unplaced, {10: 30})
+
+    def test_extensionless_campaigns_need_a_free_extension(self):
+        placement, unplaced = plan_placement({1: 100}, {10: 10, 11: 10}, {}, extensionless={10, 11}, free_extensions=1)
+        self.assertEqual(placement, {(10, 1): 10})
+        self.assertEqual(unplaced, {11: 10})
+
+    def test_avoids_servers_where_the_extension_is_taken(self):
+        placement, unplaced = plan_placement(
+            {1: 100, 2: 100}, {10: 30}, {}, fixed_load={2: 50}, extension_of={10: 7}, taken={1: {7}}
+        )
+        self.assertEqual(placement, {(10, 2): 30})
+        self.assertEqual(unplaced, {})
+
+    def test_campaigns_sharing_an_extension_never_share_a_server(self):
+        placement, unplaced = plan_placement({1: 100, 2: 100}, {10: 60, 11: 60}, {}, extension_of={10: 7, 11: 7})
+        servers_of = {
+            campaign: {server for (c, server) in placement if c == campaign} for campaign in (10, 11)
+        }
+        self.assertFalse(servers_of[10] & servers_of[11])
+        self.assertEqual(unplaced, {})
+
+    def test_extension_with_no_free_server_is_unplaced(self):
+        placement, unplaced = plan_placement({1: 100}, {10: 20}, {}, extension_of={10: 7}, taken={1: {7}})
+        self.assertEqual(placement, {})
+        self.assertEqual(unplaced, {10: 20})
+
+    def test_evens_out_load_with_whole_placements(self):
+        placement, unplaced = plan_placement({1: 100, 2: 100}, {10: 40, 11: 40}, {(10, 1): 40, (11, 1): 40})
+        self.assertEqual(server_loads(placement), {1: 40, 2: 40})
+        # One campaign moved whole rather than both being split
+        self.assertEqual(len(placement), 2)
+        self.assertEqual(unplaced, {})
+
+    def test_balancing_respects_extensions(self):
+        current = {(10, 1): 40, (11, 1): 40}
+        placement, unplaced = plan_placement(
+            {1: 100, 2: 100}, {10: 40, 11: 40}, current, extension_of={10: 7, 11: 8}, taken={2: {7}}
+        )
+        self.assertEqual(placement, {(10, 1): 40, (11, 2): 40})
+        self.assertEqual(unplaced, {})
+
+    def test_balances_within_tolerance(self):
+        capacity = {1: 100, 2: 100, 3: 200}
+        current = {(10, 1): 90, (11, 1): 10, (12, 2): 5}
+        placement, unplaced = plan_placement(capacity, {10: 90, 11: 10, 12: 5, 13: 60}, current, tolerance=0.1)
+        loads = server_loads(placement)
+        utilization = [loads.get(server, 0) / capacity[server] for server in capacity]
+        self.assertLessEqual(max(utilization) - min(utilization), 0.1 + 1 / 100)
+        self.assertEqual(sum(loads.values()), 165)
+        self.assertEqual(unplaced, {})
@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+app_name = 'campaigns'
+
+urlpatterns = [
+    path('servers/<int:server_id>/config/', views.server_config_view, name='server_config'),
+    path('changes/', views.config_changes_view, name='config_changes'),
+]
@@ -1,3 +1,102 @@
-from django.shortcuts import render
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_GET
 
-# Create your views here.
+from clients.models import ClientEmployee
+from core import cache as references
+from core.decorators import bot_token_required, has_bot_token
+from core.permissions import STAFF, has_role
+from .bot_config import config_delta, config_document, current_version
+from .config_changes import latest_change_id, wait_for_changes
+
+
+def _etag(server_id, version):
+    return f'"{server_id}-{version}"'
+
+
+@require_GET
+@bot_token_required
+def server_config_view(request, server_id):
+    """
+    The bot configuration of one server: the campaigns it runs with their
+    bot count, extensions (with the bots on each), status, transfer setting
+    and dialers.
+
+    Sends the config version as ETag and answers If-None-Match with 304
+    while it is unchanged. With ?since=<version>, lists only the campaigns
+    added or changed since that version and the ids of those removed
+    ("full": false); when that version is no longer known, the full
+    document is sent instead.
+    """
+    if references.servers.get(server_id) is None:
+        return JsonResponse({'error': 'Server not found'}, status=404)
+
+    since = request.GET.get('since')
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            return JsonResponse({'error': 'since must be a version number'}, status=400)
+
+    version = current_version(server_id)
+    response = get_conditional_response(request, etag=_etag(server_id, version))
+    if response is None:
+        version, body = config_document(server_id, version)
+        if since is not None and 0 <= since <= version:
+            body = config_delta(server_id, since, version, body) or body
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = _etag(server_id, version)
+    # Checked against the ETag on every use
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _may_follow_client(user, client_id):
+    if has_role(user, STAFF):
+        return True
+    if user.is_client:
+        return user.pk == client_id
+    if user.is_client_member:
+        return ClientEmployee.objects.filter(user=user, client_id=client_id).exists()
+    return False
+
+
+@require_GET
+async def config_changes_view(request):
+    """
+    Long-poll feed of configuration changes of one server (?server=<id>) or
+    client (?client=<id>).
+
+    Returns the changes logged after the change id in ?after=, oldest first,
+    with the id to pass as ?after= next time ("cursor"). When there are none
+    yet, waits for one up to ?timeout= seconds (default and at most
+    CONFIG_CHANGE_WAIT_SECONDS). Without ?after=, answers at once with the
+    cursor to start from. Bots send the bot token; client accounts and their
+    employees may follow their own client.
+    """
+    kinds = [kind for kind in ('server', 'client') if kind in request.GET]
+    if len(kinds) != 1:
+        return JsonResponse({'error': 'Give exactly one of server or client'}, status=400)
+    kind = kinds[0]
+    try:
+        value = int(request.GET[kind])
+        after = int(request.GET['after']) if 'after' in request.GET else None
+        timeout = int(request.GET.get('timeout', settings.CONFIG_CHANGE_WAIT_SECONDS))
+    except ValueError:
+        return JsonResponse({'error': f'{kind}, after and timeout must be numbers'}, status=400)
+    timeout = min(max(timeout, 0), settings.CONFIG_CHANGE_WAIT_SECONDS)
+
+    if not has_bot_token(request):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required'}, status=401)
+        if kind != 'client' or not await sync_to_async(_may_follow_client)(user, value):
+            return JsonResponse({'error': 'Access denied'}, status=403)
+
+    if after is None:
+        return JsonResponse({'changes': [], 'cursor': await sync_to_async(latest_change_id)()})
+
+    changes = await wait_for_changes(kind, value, after, timeout)
+    return JsonResponse({'changes': changes, 'cursor': changes[-1]['id'] if changes else after})
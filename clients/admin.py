@@ -4,6 +4,8 @@ from django.db import transaction
 from django.contrib.auth.hashers import make_password
 from .models import Client
 from accounts.models import User, Role
+from core.permissions import ADMINS, MANAGERS, RolePermissionMixin, has_role
+from core.sites import is_autocomplete
 
 
 class ClientCreationForm(forms.ModelForm):
@@ -116,9 +118,10 @@ class ClientEditForm(forms.ModelForm):
 
 
 @admin.register(Client)
-class ClientAdmin(admin.ModelAdmin):
+class ClientAdmin(RolePermissionMixin, admin.ModelAdmin):
     list_display = ['name', 'get_username', 'assembly_api_key']
     search_fields = ['name', 'client__username', 'assembly_api_key']
+    list_select_related = ['client']
     
     def get_form(self, request, obj=None, **kwargs):
         """Use different forms for add vs change"""
@@ -166,40 +169,31 @@ class ClientAdmin(admin.ModelAdmin):
         """Save with transaction to ensure user and client are created together"""
         super().save_model(request, obj, form, change)
     
-    def has_module_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return (request.user.is_superuser or 
-                request.user.is_admin)
-    
-    def has_view_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        if request.user.is_superuser or request.user.is_admin:
-            return True
-        return False
-    
-    def has_add_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin 
-    
-    def has_change_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin 
-    
-    def has_delete_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin 
-    
+    permission_matrix = {
+        'module': ADMINS,
+        'view': ADMINS,
+        'add': ADMINS,
+        'change': ADMINS,
+        'delete': ADMINS,
+        # Onboarding picks clients on client campaigns without browsing them
+        'autocomplete': MANAGERS,
+    }
+
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         if not request.user.is_authenticated:
             return qs.none()
-        if request.user.is_superuser or request.user.is_admin:
+        if has_role(request.user, ADMINS):
+            return qs
+        if is_autocomplete(request) and has_role(request.user, MANAGERS):
             return qs
         if request.user.is_client:
             return qs.filter(client=request.user)
-        return qs.none()
\ No newline at end of file
+        return qs.none()
+
+    def get_search_fields(self, request):
+        # API keys are only searchable by admins browsing clients, never through autocomplete
+        search_fields = super().get_search_fields(request)
+        if is_autocomplete(request) or not has_role(request.user, ADMINS):
+            search_fields = [field for field in search_fields if field != 'assembly_api_key']
+        return search_fields
@@ -0,0 +1,204 @@
+"""
+Campaign dashboard metrics, read from the campaign call rollups.
+
+Hourly windows come from ``campaign_call_rollup_hourly`` and daily ones from
+``campaign_call_rollup_daily``, so a request costs three aggregates over at
+most a few thousand rollup rows instead of a scan of calls.
+
+Results are cached per campaign and window. The cache key (and the ETag the
+views send) includes the campaign's ``campaign_activity.updated_at``, which
+call ingestion sets in the same transaction that updates the rollups: new
+calls change the key, late ones with old timestamps included, so nothing
+has to be invalidated.
+Rollup rebuilds (``rebuild_rollups``) don't move it; their effect shows once
+cached entries expire after CLIENT_DASHBOARD_CACHE_TTL seconds.
+"""
+import hashlib
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from calls.models import CampaignActivity, CampaignCallDailyRollup, CampaignCallHourlyRollup
+from calls.rollups import truncate
+from campaigns.models import ClientCampaignModel
+from core import cache as references
+from core.permissions import STAFF, has_role
+
+
+KEY_PREFIX = 'dashboard'
+
+BUCKETS = {
+    'hour': (CampaignCallHourlyRollup, timedelta(hours=1)),
+    'day': (CampaignCallDailyRollup, timedelta(days=1)),
+}
+
+# Windows longer than this default to daily buckets
+HOURLY_DEFAULT_LIMIT = timedelta(days=2)
+
+# Longest window served in hourly buckets
+HOURLY_MAX_WINDOW = timedelta(days=31)
+
+# Longest window served in daily buckets
+DAILY_MAX_WINDOW = timedelta(days=731)
+
+
+class MetricsError(Exception):
+    pass
+
+
+def visible_campaigns(user):
+    """Client campaigns user may see: all for staff, their client's for client accounts and employees"""
+    queryset = ClientCampaignModel.objects.all()
+    if has_role(user, STAFF):
+        return queryset
+    if user.is_client:
+        return queryset.filter(client__client=user)
+    if user.is_client_member:
+        return queryset.filter(client__employees__user=user)
+    return queryset.none()
+
+
+class Window:
+    """[start, end) rounded out to whole buckets of the chosen rollup"""
+
+    def __init__(self, start, end, bucket):
+        self.bucket = bucket
+        self.model, self.step = BUCKETS[bucket]
+        self.start = truncate(start, bucket)
+        rounded = truncate(end, bucket)
+        self.end = rounded if rounded == end else rounded + self.step
+
+    @classmethod
+    def from_params(cls, params):
+        """Window from ?start=&end=&bucket= (ISO dates or datetimes; naive ones are UTC)"""
+        now = timezone.now()
+        end = _parse_bound(params.get('end'), 'end') or now
+        start = _parse_bound(params.get('start'), 'start')
+        if start is None:
+            try:
+                start = end - timedelta(days=settings.CLIENT_DASHBOARD_DEFAULT_DAYS)
+            except OverflowError:
+                raise MetricsError('end is out of range') from None
+        if start >= end:
+            raise MetricsError('start must be before end')
+
+        bucket = params.get('bucket') or ('hour' if end - start <= HOURLY_DEFAULT_LIMIT else 'day')
+        if bucket not in BUCKETS:
+            raise MetricsError(f"bucket must be one of: {', '.join(BUCKETS)}")
+        if bucket == 'hour' and end - start > HOURLY_MAX_WINDOW:
+            raise MetricsError(f'Hourly windows are limited to {HOURLY_MAX_WINDOW.days} days')
+        if bucket == 'day' and end - start > DAILY_MAX_WINDOW:
+            raise MetricsError(f'Daily windows are limited to {DAILY_MAX_WINDOW.days} days')
+        try:
+            return cls(start, end, bucket)
+        except OverflowError:
+            # Rounding out to whole buckets went past the first or last representable date
+            raise MetricsError('start and end must leave room for a whole bucket') from None
+
+    def __str__(self):
+        return f'{self.bucket}:{self.start.isoformat()}:{self.end.isoformat()}'
+
+
+def _parse_bound(value, name):
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise MetricsError(f'{name} must be an ISO date or datetime')
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = parsed.replace(tzinfo=dt_timezone.utc)
+    return parsed
+
+
+def metrics_version(campaign, window):
+    """Opaque version of campaign's metrics over window; changes whenever a call is ingested for it"""
+    updated_at = (
+        CampaignActivity.objects.filter(client_campaign_model=campaign)
+        .values_list('updated_at', flat=True).first()
+    )
+    source = f'{campaign.pk}:{window}:{updated_at.isoformat() if updated_at else "-"}'
+    return hashlib.sha1(source.encode()).hexdigest()
+
+
+def _cache():
+    return caches['shared'] if 'shared' in settings.CACHES else caches['default']
+
+
+def campaign_metrics(campaign, window, version):
+    """The dashboard metrics of campaign over window, from the cache when version is unchanged"""
+    key = f'{KEY_PREFIX}:{campaign.pk}:{version}'
+    metrics = _cache().get(key)
+    if metrics is None:
+        metrics = compute_metrics(campaign, window)
+        _cache().set(key, metrics, settings.CLIENT_DASHBOARD_CACHE_TTL)
+    return metrics
+
+
+def compute_metrics(campaign, window):
+    rows = window.model.objects.filter(
+        client_campaign_model=campaign, bucket_start__gte=window.start, bucket_start__lt=window.end
+    )
+    counts = {'calls': Sum('total_calls'), 'transferred': Sum('transferred_calls')}
+
+    volume = {
+        row['bucket_start']: row
+        for row in rows.values('bucket_start').annotate(**counts).order_by()
+    }
+    series = []
+    bucket_start = window.start
+    while bucket_start < window.end:
+        row = volume.get(bucket_start, {})
+        series.append(_counts(row, bucket_start=bucket_start.isoformat()))
+        bucket_start += window.step
+
+    calls = sum(point['calls'] for point in series)
+    transferred = sum(point['transferred'] for point in series)
+
+    categories = []
+    for row in rows.values('response_category').annotate(**counts).order_by('-calls'):
+        category = references.response_categories.get(row['response_category']) if row['response_category'] else None
+        categories.append({
+            'id': row['response_category'],
+            'name': category.name if category else None,
+            **_counts(row),
+            'share': _rate(row['calls'], calls),
+        })
+
+    # Calls by the stage they ended at; a stage's funnel count includes every later stage
+    stages = sorted(
+        rows.filter(~Q(stage=None)).values('stage').annotate(**counts).order_by(),
+        key=lambda row: row['stage'],
+        reverse=True,
+    )
+    funnel = []
+    reached = 0
+    for row in stages:
+        reached += row['calls']
+        funnel.append({'stage': row['stage'], **_counts(row), 'reached': reached, 'reached_rate': _rate(reached, calls)})
+    funnel.reverse()
+
+    return {
+        'campaign': campaign.pk,
+        'window': {'start': window.start.isoformat(), 'end': window.end.isoformat(), 'bucket': window.bucket},
+        'totals': {'calls': calls, 'transferred': transferred, 'transfer_rate': _rate(transferred, calls)},
+        'volume': series,
+        'response_categories': categories,
+        'stages': funnel,
+    }
+
+
+def _counts(row, **extra):
+    calls = row.get('calls') or 0
+    transferred = row.get('transferred') or 0
+    return {**extra, 'calls': calls, 'transferred': transferred, 'transfer_rate': _rate(transferred, calls)}
+
+
+def _rate(part, whole):
+    return round(part / whole, 4) if whole else None
@@ -1,5 +1,10 @@
 # clients/urls.py
 from django.urls import path
+from . import views
 
 app_name = 'clients'
 
+urlpatterns = [
+    path('campaigns/', views.campaign_list_view, name='campaign_list'),
+    path('campaigns/<int:campaign_id>/metrics/', views.campaign_metrics_view, name='campaign_metrics'),
+]
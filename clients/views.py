@@ -1 +1,75 @@
-# removed the views to clean up the code base
\ No newline at end of file
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_GET
+
+from .metrics import MetricsError, Window, campaign_metrics, metrics_version, visible_campaigns
+
+
+def _unauthenticated():
+    return JsonResponse({'error': 'Authentication required'}, status=401)
+
+
+def _revalidate(response):
+    # Private to the user, and checked against the ETag on every use
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@require_GET
+def campaign_list_view(request):
+    """The client campaigns the user may see, with the time of their latest call"""
+    if not request.user.is_authenticated:
+        return _unauthenticated()
+
+    campaigns = visible_campaigns(request.user).order_by('id').values(
+        'id',
+        'client__name',
+        'campaign_model__campaign__name',
+        'campaign_model__model__name',
+        'current_status__status_name',
+        'activity__last_call_at',
+    )
+    return _revalidate(JsonResponse({
+        'campaigns': [
+            {
+                'id': campaign['id'],
+                'client': campaign['client__name'],
+                'campaign': campaign['campaign_model__campaign__name'],
+                'model': campaign['campaign_model__model__name'],
+                'status': campaign['current_status__status_name'],
+                'last_call_at': campaign['activity__last_call_at'],
+            }
+            for campaign in campaigns
+        ]
+    }))
+
+
+@require_GET
+def campaign_metrics_view(request, campaign_id):
+    """
+    Call volume, transfer rate, response category breakdown and stage funnel
+    of one campaign.
+
+    Query: start, end (ISO dates or datetimes, UTC unless they carry an
+    offset; default the last CLIENT_DASHBOARD_DEFAULT_DAYS days) and bucket
+    ('hour' or 'day'; default hour for windows up to two days). Sends an
+    ETag and answers If-None-Match with 304 until the campaign gets new calls.
+    """
+    if not request.user.is_authenticated:
+        return _unauthenticated()
+
+    campaign = visible_campaigns(request.user).filter(pk=campaign_id).first()
+    if campaign is None:
+        return JsonResponse({'error': 'Campaign not found'}, status=404)
+
+    try:
+        window = Window.from_params(request.GET)
+    except MetricsError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    etag = f'"{metrics_version(campaign, window)}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(campaign_metrics(campaign, window, etag.strip('"')))
+    response['ETag'] = etag
+    return _revalidate(response)
@@ -1,5 +1,10 @@
 from django.contrib import admin
 
-admin.site.site_header = "Xlite Administration Panel"
-admin.site.site_header = "Xlite Administration Panel"
-admin.site.index_title = "Xlite Administration Panel"
\ No newline at end of file
+from .cache import get_reference
+
+
+class ReferenceListFilter(admin.RelatedFieldListFilter):
+    """RelatedFieldListFilter whose options come from the reference table cache"""
+
+    def field_choices(self, field, request, model_admin):
+        return [(obj.pk, str(obj)) for obj in get_reference(field.related_model).all()]
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""
+Cache-aside access to small, constantly read reference tables.
+
+Each table is cached whole, as a list of model instances, in two tiers: the
+per-process 'default' cache (local memory) and, when CACHES has one, the
+'shared' cache seen by every process. A miss in both reads the table from
+the database and fills both tiers.
+
+Saving or deleting a row clears both tiers (signals connected in
+CoreConfig.ready). Other processes then see the change through the shared
+tier, or within REFERENCE_CACHE_LOCAL_TTL seconds once their local copy
+expires. ``bulk_create``/``update`` send no signals, so code that uses them
+on these tables should call ``invalidate_references``.
+"""
+import logging
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'reference'
+
+
+def _shared_cache():
+    return caches['shared'] if 'shared' in settings.CACHES else None
+
+
+class ReferenceCache:
+    def __init__(self, label, ordering):
+        self.label = label
+        self.ordering = ordering
+
+    @property
+    def model(self):
+        return apps.get_model(self.label)
+
+    @property
+    def key(self):
+        return f'{KEY_PREFIX}:{self.label.lower()}'
+
+    def queryset(self):
+        return self.model._default_manager.order_by(*self.ordering)
+
+    def all(self):
+        """Every row of the table, in ``ordering`` order"""
+        local = caches['default']
+        rows = local.get(self.key)
+        if rows is not None:
+            return rows
+
+        shared = _shared_cache()
+        if shared is not None:
+            try:
+                rows = shared.get(self.key)
+            except Exception:
+                logger.exception('Shared cache read failed for %s', self.key)
+        if rows is None:
+            return self.refresh()
+        local.set(self.key, rows, settings.REFERENCE_CACHE_LOCAL_TTL)
+        return rows
+
+    def refresh(self):
+        """Reload the table from the database into both tiers"""
+        rows = list(self.queryset())
+        caches['default'].set(self.key, rows, settings.REFERENCE_CACHE_LOCAL_TTL)
+        shared = _shared_cache()
+        if shared is not None:
+            try:
+                shared.set(self.key, rows, settings.REFERENCE_CACHE_TTL)
+            except Exception:
+                logger.exception('Shared cache write failed for %s', self.key)
+        return rows
+
+    def invalidate(self):
+        caches['default'].delete(self.key)
+        shared = _shared_cache()
+        if shared is not None:
+            try:
+                shared.delete(self.key)
+            except Exception:
+                logger.exception('Shared cache delete failed for %s', self.key)
+
+    def get(self, pk):
+        """Row with primary key pk, or None"""
+        pk = self.model._meta.pk.to_python(pk)
+        return next((obj for obj in self.all() if obj.pk == pk), None)
+
+    def get_by(self, **lookups):
+        """First row whose attributes equal lookups, or None"""
+        return next(
+            (obj for obj in self.all() if all(getattr(obj, name) == value for name, value in lookups.items())),
+            None
+        )
+
+    def ids_by(self, field):
+        """{field value: id} for the whole table"""
+        return {getattr(obj, field): obj.pk for obj in self.all()}
+
+
+roles = ReferenceCache('accounts.Role', ['name'])
+voices = ReferenceCache('campaigns.Voice', ['name'])
+response_categories = ReferenceCache('campaigns.ResponseCategory', ['name'])
+statuses = ReferenceCache('campaigns.Status', ['status_name'])
+transfer_settings = ReferenceCache('campaigns.TransferSettings', ['display_order', 'name'])
+servers = ReferenceCache('infrastructure.Server', ['alias', 'ip'])
+
+REFERENCE_CACHES = [roles, voices, response_categories, statuses, transfer_settings, servers]
+
+
+def get_reference(model):
+    """The ReferenceCache for model, or None if it is not cached"""
+    return next((cache for cache in REFERENCE_CACHES if cache.label == model._meta.label), None)
+
+
+def invalidate_references():
+    for cache in REFERENCE_CACHES:
+        cache.invalidate()
+
+
+def connect_signals():
+    for cache in REFERENCE_CACHES:
+        def invalidate(sender, cache=cache, **kwargs):
+            # Again after commit, in case another request refilled it from
+            # the pre-commit data in the meantime
+            cache.invalidate()
+            transaction.on_commit(cache.invalidate)
+        for signal in (post_save, post_delete):
+            signal.connect(invalidate, sender=cache.label, weak=False, dispatch_uid=f'{cache.key}:invalidate')
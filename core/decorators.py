@@ -1,3 +1,5 @@
+import hmac
+from django.conf import settings
 from django.core.exceptions import PermissionDenied
 from functools import wraps
 
@@ -8,10 +10,30 @@ def role_required(allowed_roles):
             if not request.user.is_authenticated:
                 raise PermissionDenied("User not authenticated")
 
-            if request.user.role.name not in allowed_roles:
+            if request.user.role_name not in allowed_roles:
                 raise PermissionDenied("Access denied")
 
             return view_func(request, *args, **kwargs)
 
         return _wrapped_view
     return decorator
+
+
+def has_bot_token(request):
+    """True if request carries the shared bot API token"""
+    expected = settings.BOT_API_TOKEN
+    header = request.headers.get('Authorization', '')
+    token = header[len('Bearer '):] if header.startswith('Bearer ') else ''
+    return bool(expected) and hmac.compare_digest(token.encode(), expected.encode())
+
+
+def bot_token_required(view_func):
+    """Allow requests carrying the shared bot API token (Authorization: Bearer <token>)"""
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        if not has_bot_token(request):
+            raise PermissionDenied("Invalid bot token")
+
+        return view_func(request, *args, **kwargs)
+
+    return _wrapped_view
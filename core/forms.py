@@ -0,0 +1,39 @@
+from django import forms
+from django.forms.models import ModelChoiceIterator
+
+
+class ReferenceChoiceIterator(ModelChoiceIterator):
+    """Builds the choices from a ReferenceCache instead of querying"""
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for obj in self.field.reference.all():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.field.reference.all()) + (1 if self.field.empty_label is not None else 0)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.reference.all())
+
+
+class ReferenceChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField that renders its options from a core.cache reference
+    table. Submitted values are still validated against ``queryset``.
+    """
+    iterator = ReferenceChoiceIterator
+
+    def __init__(self, queryset=None, *, reference, **kwargs):
+        self.reference = reference
+        super().__init__(reference.queryset() if queryset is None else queryset, **kwargs)
+
+
+class ReferenceMultipleChoiceField(forms.ModelMultipleChoiceField):
+    """ModelMultipleChoiceField counterpart of ReferenceChoiceField"""
+    iterator = ReferenceChoiceIterator
+
+    def __init__(self, queryset=None, *, reference, **kwargs):
+        self.reference = reference
+        super().__init__(reference.queryset() if queryset is None else queryset, **kwargs)
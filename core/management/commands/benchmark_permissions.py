@@ -0,0 +1,127 @@
+import logging
+import time
+from collections import Counter
+from unittest import mock
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from accounts.models import Role, User
+from core import permissions
+
+
+LEGACY_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Render admin pages and report permission checks, role lookups and queries per page, '
+        'before (plain ModelBackend, uncached role name) and after (RoleModelBackend, cached role name). '
+        'Nothing is written: the whole run is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--role', default=Role.ADMIN,
+                            choices=[permissions.SUPERUSER, Role.ADMIN, Role.ONBOARDING, Role.QA, Role.CLIENT],
+                            help='Role of the user the pages are rendered for')
+        parser.add_argument('--model', action='append', default=[],
+                            help='Only render app_label.model_name (repeatable)')
+        parser.add_argument('--repeat', type=int, default=3, help='Renders per page; the fastest is reported')
+
+    def handle(self, *args, **options):
+        self.repeat = max(options['repeat'], 1)
+        # Pages the role may not see answer 403; don't log each one
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        totals = {'before': Counter(), 'after': Counter()}
+
+        try:
+            with transaction.atomic(), override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                AUTHENTICATION_BACKENDS=[*settings.AUTHENTICATION_BACKENDS, LEGACY_BACKEND],
+            ):
+                user = self._make_user(options['role'])
+                self.stdout.write(f"{'page':<55} {'mode':<7} {'checks':>6} {'role q':>6} {'queries':>7} {'ms':>8}")
+                for url in self._urls(options['model']):
+                    for mode in ('before', 'after'):
+                        result = self._render(user, url, mode)
+                        if result is None:
+                            continue
+                        totals[mode].update(result)
+                        self.stdout.write(
+                            f"{url:<55} {mode:<7} {result['checks']:>6} {result['role_queries']:>6} "
+                            f"{result['queries']:>7} {result['ms']:>8.1f}"
+                        )
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        for mode in ('before', 'after'):
+            total = totals[mode]
+            self.stdout.write(self.style.SUCCESS(
+                f"{mode:<7} total: {total['checks']} permission checks, {total['role_queries']} role queries, "
+                f"{total['queries']} queries, {total['ms']:.0f} ms"
+            ))
+
+    def _make_user(self, role_name):
+        if role_name == permissions.SUPERUSER:
+            return User.objects.create_superuser(username='__permission_bench__', password=None)
+        role, _ = Role.objects.get_or_create(name=role_name)
+        return User.objects.create_user(username='__permission_bench__', password=None, role=role, is_staff=True)
+
+    def _urls(self, only):
+        for model in sorted(admin.site._registry, key=lambda model: model._meta.label):
+            opts = model._meta
+            if only and opts.label_lower not in only:
+                continue
+            info = (opts.app_label, opts.model_name)
+            yield reverse('admin:%s_%s_changelist' % info)
+            obj = model._default_manager.order_by('pk').first()
+            if obj is not None:
+                yield reverse('admin:%s_%s_change' % info, args=[obj.pk])
+
+    def _render(self, user, url, mode):
+        client = Client(raise_request_exception=False)
+        if mode == 'before':
+            client.force_login(user, backend=LEGACY_BACKEND)
+            # The pre-cache behaviour: every role check dereferences user.role
+            role_name = property(lambda self: self.role.name if self.role_id else None)
+        else:
+            client.force_login(user, backend=settings.AUTHENTICATION_BACKENDS[0])
+            role_name = User.role_name
+
+        checks = Counter()
+        has_role = permissions.has_role
+
+        def counting_has_role(user, roles):
+            checks['checks'] += 1
+            return has_role(user, roles)
+
+        best = None
+        with mock.patch.object(User, 'role_name', role_name), \
+                mock.patch.object(permissions, 'has_role', counting_has_role):
+            for _ in range(self.repeat):
+                checks.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    elapsed = (time.perf_counter() - started) * 1000
+                if response.status_code != 200:
+                    return None
+                result = {
+                    'checks': checks['checks'],
+                    'role_queries': sum('FROM "roles"' in query['sql'] for query in queries.captured_queries),
+                    'queries': len(queries.captured_queries),
+                    'ms': elapsed,
+                }
+                if best is None or result['ms'] < best['ms']:
+                    best = result
+        return best
@@ -0,0 +1,161 @@
+import os
+import time
+import traceback
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from accounts.models import Role, User
+
+
+# Default budgets per page type; override per model below
+DEFAULT_BUDGETS = {
+    'changelist': {'queries': 15, 'seconds': 1.5},
+    'change': {'queries': 25, 'seconds': 1.0},
+    'add': {'queries': 25, 'seconds': 1.0},
+}
+
+# (app_label, model_name, page) -> budget overrides
+BUDGET_OVERRIDES = {
+    # The stage filter and date hierarchy skip along their indexes with one
+    # LIMIT 1 probe per distinct stage and year or month (CallQuerySet),
+    # instead of a DISTINCT over every row: a few cheap queries rather than
+    # one slow one
+    ('calls', 'call', 'changelist'): {'queries': 25},
+    ('calls', 'campaigncallhourlyrollup', 'changelist'): {'queries': 25},
+    ('calls', 'campaigncalldailyrollup', 'changelist'): {'queries': 25},
+}
+
+PROJECT_DIR = str(settings.BASE_DIR)
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Render every registered ModelAdmin changelist and change form and check them '
+        'against a fixed query budget and wall-clock ceiling. Run seed_benchmark_data first '
+        'for realistic volumes. Nothing is written: the whole run is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--role', default='superuser',
+                            choices=['superuser', Role.ADMIN, Role.ONBOARDING, Role.QA, Role.CLIENT],
+                            help='Role of the user the pages are rendered for')
+        parser.add_argument('--model', action='append', default=[],
+                            help='Only check app_label.model_name (repeatable)')
+        parser.add_argument('--time-factor', type=float, default=1.0,
+                            help='Multiply every wall-clock ceiling (slow machines)')
+
+    def handle(self, *args, **options):
+        self.time_factor = options['time_factor']
+        self.failures = []
+        self.checked = 0
+
+        try:
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                client = Client(raise_request_exception=False)
+                client.force_login(self._make_user(options['role']))
+                for model, model_admin in sorted(
+                    admin.site._registry.items(), key=lambda item: item[0]._meta.label
+                ):
+                    label = model._meta.label_lower
+                    if options['model'] and label not in options['model']:
+                        continue
+                    self._check_model(client, model)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        if self.failures:
+            raise CommandError(f'{len(self.failures)} of {self.checked} admin page(s) over budget')
+        self.stdout.write(self.style.SUCCESS(f'All {self.checked} admin page(s) within budget'))
+
+    def _make_user(self, role_name):
+        if role_name == 'superuser':
+            return User.objects.create_superuser(username='__query_budget__', password=None)
+        role, _ = Role.objects.get_or_create(name=role_name)
+        return User.objects.create_user(username='__query_budget__', password=None, role=role, is_staff=True)
+
+    def _check_model(self, client, model):
+        opts = model._meta
+        info = (opts.app_label, opts.model_name)
+        pages = [('changelist', reverse('admin:%s_%s_changelist' % info))]
+
+        obj = model._default_manager.order_by('pk').first()
+        if obj is not None:
+            pages.append(('change', reverse('admin:%s_%s_change' % info, args=[obj.pk])))
+        pages.append(('add', reverse('admin:%s_%s_add' % info)))
+
+        for page, url in pages:
+            self._check_page(client, info, page, url)
+
+    def _check_page(self, client, info, page, url):
+        budget = {**DEFAULT_BUDGETS[page], **BUDGET_OVERRIDES.get((*info, page), {})}
+        budget['seconds'] *= self.time_factor
+        call_sites = defaultdict(list)
+
+        def record_call_site(execute, sql, params, many, context):
+            call_sites[_call_site()].append(sql)
+            return execute(sql, params, many, context)
+
+        with CaptureQueriesContext(connection) as queries, connection.execute_wrapper(record_call_site):
+            started = time.perf_counter()
+            response = client.get(url)
+            elapsed = time.perf_counter() - started
+
+        if response.status_code == 403:
+            self.stdout.write(f'  skip {url} (403 for this role)')
+            return
+        if page == 'add' and response.status_code in (302, 404):
+            return
+
+        self.checked += 1
+        query_count = len(queries.captured_queries)
+        problems = []
+        if response.status_code != 200:
+            problems.append(f'HTTP {response.status_code}')
+        if query_count > budget['queries']:
+            problems.append(f"{query_count} queries > budget {budget['queries']}")
+        if elapsed > budget['seconds']:
+            problems.append(f"{elapsed:.2f}s > ceiling {budget['seconds']:.2f}s")
+
+        if not problems:
+            self.stdout.write(f'  ok   {url} ({query_count} queries, {elapsed:.2f}s)')
+            return
+
+        self.failures.append(url)
+        self.stdout.write(self.style.ERROR(f'  FAIL {url}: ' + '; '.join(problems)))
+        for site, statements in sorted(call_sites.items(), key=lambda item: -len(item[1])):
+            self.stdout.write(f'       {len(statements):4d}x {site}')
+            for sql in sorted(set(statements))[:3]:
+                self.stdout.write(f'              {sql[:300]}')
+
+
+# Frames in these packages are plumbing, not the code that asked for the query
+_PLUMBING = tuple(
+    os.sep + os.path.join('django', package) + os.sep
+    for package in ('db', 'test', 'utils', 'core', 'dispatch')
+)
+
+
+def _call_site():
+    """Innermost frame outside Django's ORM/test plumbing that led to this query"""
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        filename = frame.filename
+        if filename == __file__ or any(package in filename for package in _PLUMBING):
+            continue
+        if filename.startswith(PROJECT_DIR):
+            filename = os.path.relpath(filename, PROJECT_DIR)
+        elif os.sep + 'django' + os.sep in filename:
+            filename = filename[filename.rindex(os.sep + 'django' + os.sep) + 1:]
+        return f'{filename}:{frame.lineno} in {frame.name}'
+    return '<unknown>'
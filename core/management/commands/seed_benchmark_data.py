@@ -0,0 +1,178 @@
+import io
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from accounts.models import Role, User
+from calls.models import Call
+from campaigns.models import (
+    Campaign,
+    CampaignModel,
+    ClientCampaignModel,
+    CloserDialer,
+    DialerSettings,
+    Model,
+    PrimaryDialer,
+    ResponseCategory,
+    ServerCampaignBots,
+    Status,
+    StatusHistory,
+    TransferSettings,
+    Voice,
+)
+from clients.models import Client
+from core.cache import invalidate_references
+from infrastructure.models import Extension, Server
+
+
+class Command(BaseCommand):
+    help = 'Seed realistic data volumes (campaigns, servers, millions of calls) for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=50)
+        parser.add_argument('--campaigns', type=int, default=300, help='Client campaigns to create')
+        parser.add_argument('--servers', type=int, default=20)
+        parser.add_argument('--calls', type=int, default=1000000)
+        parser.add_argument('--days', type=int, default=30, help='Spread calls over this many days')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        prefix = f"bench-{timezone.now():%Y%m%d%H%M%S}"
+
+        with transaction.atomic():
+            call_command('create_roles', stdout=io.StringIO())
+            call_command('create_statuses', stdout=io.StringIO())
+            ccm_ids = self._seed_reference_data(prefix, options)
+        # bulk_create sends no signals, so drop cached reference tables by hand
+        invalidate_references()
+        self.stdout.write(f"Created {len(ccm_ids)} client campaigns")
+
+        seeded_from = timezone.now() - timedelta(days=options['days'])
+        self._seed_calls(ccm_ids, options['calls'], options['days'])
+        self.stdout.write(f"Created {options['calls']} calls")
+
+        call_command('rebuild_campaign_activity', stdout=self.stdout)
+        # Only the seeded period, so rollups of archived calls are left alone
+        call_command('rebuild_call_rollups', start=seeded_from.isoformat(), stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Seeded benchmark data with prefix {prefix}'))
+
+    def _seed_reference_data(self, prefix, options):
+        client_role = Role.objects.get(name=Role.CLIENT)
+        password = make_password(None)
+        users = User.objects.bulk_create([
+            User(username=f"{prefix}-client-{i}", password=password, role=client_role)
+            for i in range(options['clients'])
+        ])
+        clients = Client.objects.bulk_create([
+            Client(client=user, name=f"{prefix} Client {i}", assembly_api_key='x' * 32)
+            for i, user in enumerate(users)
+        ])
+
+        transfer_settings = TransferSettings.objects.bulk_create([
+            TransferSettings(name=f"{prefix} Transfer {i}", display_order=i) for i in range(8)
+        ])
+        models = Model.objects.bulk_create([Model(name=f"{prefix} Model {i}") for i in range(6)])
+        for model in models:
+            model.transfer_settings.set(random.sample(transfer_settings, 4))
+        campaigns = Campaign.objects.bulk_create([Campaign(name=f"{prefix} Campaign {i}") for i in range(10)])
+        campaign_models = CampaignModel.objects.bulk_create([
+            CampaignModel(campaign=campaign, model=model)
+            for campaign in campaigns for model in random.sample(models, 3)
+        ])
+
+        Voice.objects.bulk_create([Voice(name=f"{prefix} Voice {i}") for i in range(10)])
+        ResponseCategory.objects.bulk_create([
+            ResponseCategory(name=f"{prefix} Category {i}", color='#417690') for i in range(15)
+        ])
+
+        closers = CloserDialer.objects.bulk_create([
+            CloserDialer(closer_campaign=f"{prefix}-closer-{i}", ingroup=f"ingroup-{i}",
+                         admin_link=f"https://dialer-{i}.example.com/admin")
+            for i in range(options['campaigns'] // 3 or 1)
+        ])
+        dialer_settings = DialerSettings.objects.bulk_create([
+            DialerSettings(closer_dialer=closer) for closer in closers
+        ])
+        PrimaryDialer.objects.bulk_create([
+            PrimaryDialer(dialer_settings=ds, admin_link=f"https://primary-{ds.id}-{n}.example.com/admin")
+            for ds in dialer_settings for n in range(2)
+        ])
+
+        statuses = list(Status.objects.all())
+        now = timezone.now()
+        ccms = ClientCampaignModel.objects.bulk_create([
+            ClientCampaignModel(
+                client=random.choice(clients),
+                campaign_model=campaign_model,
+                selected_transfer_setting=random.choice(transfer_settings),
+                dialer_settings=random.choice(dialer_settings),
+                start_date=now - timedelta(days=random.randint(1, 365)),
+                bot_count=random.randint(1, 50),
+                current_status=random.choice(statuses),
+                current_status_since=now,
+            )
+            for campaign_model in random.choices(campaign_models, k=options['campaigns'])
+        ])
+        StatusHistory.objects.bulk_create([
+            StatusHistory(client_campaign=ccm, status_id=ccm.current_status_id, start_date=now)
+            for ccm in ccms
+        ])
+
+        servers = Server.objects.bulk_create([
+            Server(ip=f"10.{i // 250}.{i % 250}.1", alias=f"{prefix}-server-{i}")
+            for i in range(options['servers'])
+        ])
+        first_extension = (Extension.objects.order_by('-extension_number')
+                           .values_list('extension_number', flat=True).first() or 7999) + 1
+        extensions = Extension.objects.bulk_create([
+            Extension(extension_number=first_extension + i) for i in range(len(ccms))
+        ])
+        ServerCampaignBots.objects.bulk_create([
+            ServerCampaignBots(client_campaign_model=ccm, server=random.choice(servers),
+                               extension=extension, bot_count=ccm.bot_count)
+            for ccm, extension in zip(ccms, extensions)
+        ])
+        return [ccm.id for ccm in ccms]
+
+    def _seed_calls(self, ccm_ids, count, days):
+        """Generate calls server-side with generate_series; far faster than client-side inserts"""
+        voice_ids = list(Voice.objects.values_list('id', flat=True))
+        category_ids = list(ResponseCategory.objects.values_list('id', flat=True))
+        chunk = 500000
+
+        with connection.cursor() as cursor:
+            for start in range(0, count, chunk):
+                size = min(chunk, count - start)
+                cursor.execute(
+                    f"""
+                    INSERT INTO {Call._meta.db_table} (
+                        client_campaign_model_id, number, stage, voice_id, response_category_id,
+                        list_id, transferred, timestamp, transcription
+                    )
+                    SELECT
+                        (%(ccm)s::bigint[])[1 + floor(random() * %(ccm_n)s)::int],
+                        (2000000000 + floor(random() * 7999999999))::bigint::text,
+                        1 + floor(random() * 5)::int,
+                        (%(voices)s::bigint[])[1 + floor(random() * %(voices_n)s)::int],
+                        (%(categories)s::bigint[])[1 + floor(random() * %(categories_n)s)::int],
+                        (1000 + floor(random() * 100)::int)::text,
+                        random() < 0.1,
+                        now() - random() * %(days)s * interval '1 day',
+                        'Seeded call transcription ' || g
+                    FROM generate_series(1, %(size)s) AS g
+                    """,
+                    {
+                        'ccm': ccm_ids, 'ccm_n': len(ccm_ids),
+                        'voices': voice_ids, 'voices_n': len(voice_ids),
+                        'categories': category_ids, 'categories_n': len(category_ids),
+                        'days': days, 'size': size,
+                    }
+                )
+                self.stdout.write(f"  {start + size} calls")
+            cursor.execute(f"ANALYZE {Call._meta.db_table}")
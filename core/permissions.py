@@ -0,0 +1,76 @@
+"""
+Role-based permission resolution shared by the admin and views.
+
+Roles are the ``accounts.Role`` names plus ``SUPERUSER``, which matches any
+user with ``is_superuser`` regardless of role. A user's role name is cached
+on the user object (see ``User.role_name``), so each check is a set lookup.
+"""
+from accounts.models import Role
+
+
+SUPERUSER = 'superuser'
+
+# Common role groups used by the admin permission matrices
+SUPERUSERS = frozenset({SUPERUSER})
+ADMINS = frozenset({SUPERUSER, Role.ADMIN})
+MANAGERS = frozenset({SUPERUSER, Role.ADMIN, Role.ONBOARDING})
+STAFF = frozenset({SUPERUSER, Role.ADMIN, Role.ONBOARDING, Role.QA})
+NOBODY = frozenset()
+
+
+def has_role(user, roles):
+    """True if user is authenticated and holds one of roles"""
+    if not user.is_authenticated:
+        return False
+    if SUPERUSER in roles and user.is_superuser:
+        return True
+    return user.role_name in roles
+
+
+class RolePermissionMixin:
+    """
+    Admin mixin that answers has_*_permission from ``permission_matrix``.
+
+    The matrix maps 'module', 'view', 'add', 'change' and 'delete' to the
+    roles allowed; actions left out fall back to Django's model permissions.
+    'autocomplete' (the admin's autocomplete endpoint for this model) falls
+    back to 'view'.
+    Object-level rules (e.g. clients seeing their own rows) stay as method
+    overrides that call super() for the role part.
+    """
+    permission_matrix = {}
+
+    def has_matrix_permission(self, request, action, default):
+        roles = self.permission_matrix.get(action)
+        if roles is None:
+            return default()
+        return has_role(request.user, roles)
+
+    def has_module_permission(self, request):
+        return self.has_matrix_permission(
+            request, 'module', lambda: super(RolePermissionMixin, self).has_module_permission(request)
+        )
+
+    def has_view_permission(self, request, obj=None):
+        return self.has_matrix_permission(
+            request, 'view', lambda: super(RolePermissionMixin, self).has_view_permission(request, obj)
+        )
+
+    def has_add_permission(self, request, *args):
+        # ModelAdmin is called with (request), InlineModelAdmin with (request, obj)
+        return self.has_matrix_permission(
+            request, 'add', lambda: super(RolePermissionMixin, self).has_add_permission(request, *args)
+        )
+
+    def has_change_permission(self, request, obj=None):
+        return self.has_matrix_permission(
+            request, 'change', lambda: super(RolePermissionMixin, self).has_change_permission(request, obj)
+        )
+
+    def has_delete_permission(self, request, obj=None):
+        return self.has_matrix_permission(
+            request, 'delete', lambda: super(RolePermissionMixin, self).has_delete_permission(request, obj)
+        )
+
+    def has_autocomplete_permission(self, request):
+        return self.has_matrix_permission(request, 'autocomplete', lambda: self.has_view_permission(request))
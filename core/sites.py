@@ -0,0 +1,52 @@
+from django.contrib import admin
+from django.contrib.admin.views.autocomplete import AutocompleteJsonView
+
+
+def is_autocomplete(request):
+    """Whether the request is an autocomplete lookup rather than browsing the admin"""
+    return getattr(request, 'is_admin_autocomplete', False)
+
+
+class RoleAutocompleteJsonView(AutocompleteJsonView):
+    """
+    Autocomplete endpoint that asks the target admin's
+    ``has_autocomplete_permission`` (see RolePermissionMixin), so a role can
+    pick rows in a form without being allowed to browse that model. Results
+    stay scoped by the target admin's get_queryset and get_search_results.
+    """
+
+    def get(self, request, *args, **kwargs):
+        request.is_admin_autocomplete = True
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        # Labels come from __str__, which often follows foreign keys
+        list_select_related = self.model_admin.get_list_select_related(self.request)
+        if list_select_related is True:
+            qs = qs.select_related()
+        elif list_select_related:
+            qs = qs.select_related(*list_select_related)
+        # Stable pages need an ordering
+        if not qs.ordered:
+            qs = qs.order_by('pk')
+        return qs
+
+    def has_perm(self, request, obj=None):
+        if hasattr(self.model_admin, 'has_autocomplete_permission'):
+            return self.model_admin.has_autocomplete_permission(request)
+        return super().has_perm(request, obj)
+
+    def serialize_result(self, obj, to_field_name):
+        result = super().serialize_result(obj, to_field_name)
+        if hasattr(self.model_admin, 'autocomplete_label'):
+            result['text'] = self.model_admin.autocomplete_label(obj)
+        return result
+
+
+class XliteAdminSite(admin.AdminSite):
+    site_header = "Xlite Administration Panel"
+    index_title = "Xlite Administration Panel"
+
+    def autocomplete_view(self, request):
+        return RoleAutocompleteJsonView.as_view(admin_site=self)(request)
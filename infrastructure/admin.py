@@ -1,10 +1,18 @@
-from django.contrib import admin
-from django.db.models import Sum
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.db.models import Q, Sum
+from django.http import HttpResponseRedirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from .extensions import EXTENSION_MAX_DIGITS, ExtensionError, is_free, provision_range
 from .models import Server, Extension
+from core import cache as references
+from core.permissions import ADMINS, MANAGERS, RolePermissionMixin
 
 @admin.register(Server)
-class ServerAdmin(admin.ModelAdmin):
-    list_display = ['ip', 'alias', 'domain', 'total_bot_count']
+class ServerAdmin(RolePermissionMixin, admin.ModelAdmin):
+    list_display = ['ip', 'alias', 'domain', 'total_bot_count', 'bot_capacity', 'utilization']
     search_fields = ['ip', 'alias', 'domain']
     list_filter = ['alias']
 
@@ -20,67 +28,120 @@ class ServerAdmin(admin.ModelAdmin):
     total_bot_count.short_description = 'Total Bots'
     total_bot_count.admin_order_field = '_total_bot_count'
 
-    def has_module_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return (request.user.is_superuser or 
-                request.user.is_admin or 
-                request.user.is_onboarding)
+    def utilization(self, obj):
+        """Bots as a share of the server's capacity"""
+        if not obj.bot_capacity:
+            return '-'
+        return f"{(obj._total_bot_count or 0) / obj.bot_capacity:.0%}"
+    utilization.short_description = 'Utilization'
 
-    def has_view_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
+    def autocomplete_label(self, obj):
+        """Show IP with alias in brackets in autocomplete results"""
+        if obj.alias:
+            return f"{obj.ip} ({obj.alias})"
+        return obj.ip
 
-    def has_add_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
+    permission_matrix = {
+        'module': MANAGERS,
+        'view': MANAGERS,
+        'add': MANAGERS,
+        'change': MANAGERS,
+        'delete': ADMINS,
+    }
 
-    def has_change_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
 
-    def has_delete_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin
+class FreeOnFilter(admin.SimpleListFilter):
+    """Extensions free everywhere, or on one server"""
+    title = 'free on'
+    parameter_name = 'free_on'
+
+    def lookups(self, request, model_admin):
+        return [('any', 'Every server'), *((str(server.pk), str(server)) for server in references.servers.all())]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'any':
+            return queryset.filter(is_free())
+        if self.value():
+            return queryset.filter(is_free(server=self.value()))
+        return queryset
+
+
+class ProvisionExtensionsForm(forms.Form):
+    first = forms.IntegerField(min_value=0, max_value=10 ** EXTENSION_MAX_DIGITS - 1, label='First extension')
+    last = forms.IntegerField(min_value=0, max_value=10 ** EXTENSION_MAX_DIGITS - 1, label='Last extension')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        first, last = cleaned_data.get('first'), cleaned_data.get('last')
+        if first is not None and last is not None and last < first:
+            raise forms.ValidationError({'last': "Last extension cannot be below the first"})
+        return cleaned_data
 
 
 @admin.register(Extension)
-class ExtensionAdmin(admin.ModelAdmin):
+class ExtensionAdmin(RolePermissionMixin, admin.ModelAdmin):
     list_display = ['extension_number']
     search_fields = ['extension_number']
+    list_filter = [FreeOnFilter]
+
+    def get_urls(self):
+        return [
+            path('provision/', self.admin_site.admin_view(self.provision_view), name='infrastructure_extension_provision'),
+            *super().get_urls(),
+        ]
+
+    def provision_view(self, request):
+        """Create a range of extensions in one statement"""
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = ProvisionExtensionsForm(request.POST or None)
+        if request.method == 'POST' and form.is_valid():
+            first, last = form.cleaned_data['first'], form.cleaned_data['last']
+            try:
+                created = provision_range(first, last)
+            except ExtensionError as e:
+                form.add_error(None, str(e))
+            else:
+                self.message_user(
+                    request,
+                    f"Created {created} extension(s) in {first}-{last}; {last - first + 1 - created} already existed.",
+                    messages.SUCCESS
+                )
+                return HttpResponseRedirect(reverse('admin:infrastructure_extension_changelist'))
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Provision extensions',
+            'opts': self.opts,
+            'form': form,
+        }
+        return TemplateResponse(request, 'admin/infrastructure/extension/provision.html', context)
 
     def get_queryset(self, request):
         """Order extensions by prefix (first two digits) to group them together"""
         qs = super().get_queryset(request)
         return qs.order_by('extension_number')
 
-    def has_module_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return (request.user.is_superuser or 
-                request.user.is_admin or 
-                request.user.is_onboarding)
-
-    def has_view_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_add_permission(self, request):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_change_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin or request.user.is_onboarding
-
-    def has_delete_permission(self, request, obj=None):
-        if not request.user.is_authenticated:
-            return False
-        return request.user.is_superuser or request.user.is_admin
\ No newline at end of file
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Match extension numbers starting with the typed digits, as ranges on
+        the extension_number index (e.g. 80 -> 80, 800-809, 8000-8099, ...)
+        """
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if not term.isdigit() or len(term) > EXTENSION_MAX_DIGITS:
+            return queryset.none(), False
+        prefix = int(term)
+        condition = Q()
+        for extra_digits in range(EXTENSION_MAX_DIGITS - len(term) + 1):
+            scale = 10 ** extra_digits
+            condition |= Q(extension_number__gte=prefix * scale, extension_number__lt=(prefix + 1) * scale)
+        return queryset.filter(condition), False
+
+    permission_matrix = {
+        'module': MANAGERS,
+        'view': MANAGERS,
+        'add': MANAGERS,
+        'change': MANAGERS,
+        'delete': ADMINS,
+    }
\ No newline at end of file
@@ -0,0 +1,62 @@
+"""
+Extension provisioning and lookup of free extensions.
+
+Ranges are created with a single ``INSERT ... SELECT generate_series``
+(numbers that already exist are skipped), so provisioning thousands of
+extensions is one statement instead of a row per save.
+
+An extension is free on a server when no ServerCampaignBots row on that
+server uses it, and free when no row uses it at all. ``free_extensions``
+answers both with a NOT EXISTS anti-join that PostgreSQL runs as index
+probes (on idx_scb_server_extension, or idx_scb_extension without a
+server) while walking extensions in number order, so asking for the next
+N free extensions stops after N hits instead of reading every extension.
+"""
+from django.db import connection
+from django.db.models import Exists, OuterRef
+
+from campaigns.models import ServerCampaignBots
+from .models import Extension
+
+
+# Digits in the largest extension number (fits an integer column)
+EXTENSION_MAX_DIGITS = 9
+
+# Most extensions created by one provision_range call
+MAX_PROVISION = 100000
+
+
+class ExtensionError(Exception):
+    pass
+
+
+def provision_range(first, last):
+    """Create extensions first..last (inclusive), skipping existing ones; returns how many were created"""
+    if first < 0 or last < first:
+        raise ExtensionError('The range must run from a non-negative number up to a larger or equal one')
+    if last >= 10 ** EXTENSION_MAX_DIGITS:
+        raise ExtensionError(f'Extensions have at most {EXTENSION_MAX_DIGITS} digits')
+    if last - first + 1 > MAX_PROVISION:
+        raise ExtensionError(f'At most {MAX_PROVISION} extensions can be provisioned at once')
+
+    table = connection.ops.quote_name(Extension._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (extension_number) SELECT generate_series(%s, %s) "
+            f"ON CONFLICT (extension_number) DO NOTHING",
+            [first, last]
+        )
+        return cursor.rowcount
+
+
+def is_free(server=None):
+    """Filter expression matching extensions no ServerCampaignBots row uses (on server, when given)"""
+    used = ServerCampaignBots.objects.filter(extension=OuterRef('pk'))
+    if server is not None:
+        used = used.filter(server=server)
+    return ~Exists(used)
+
+
+def free_extensions(server=None):
+    """Free extensions (on server, when given), lowest number first"""
+    return Extension.objects.filter(is_free(server)).order_by('extension_number')
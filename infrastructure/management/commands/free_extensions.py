@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from infrastructure.extensions import free_extensions
+from infrastructure.models import Server
+
+
+class Command(BaseCommand):
+    help = 'List the lowest free extensions: unused on --server, or unused everywhere'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-n', '--count', type=int, default=10, help='Extensions to list (default %(default)s)')
+        parser.add_argument('--server', help='Server id, IP or alias')
+
+    def handle(self, *args, **options):
+        server = None
+        if options['server']:
+            lookup = Q(ip=options['server']) | Q(alias=options['server'])
+            if options['server'].isdigit():
+                lookup |= Q(pk=int(options['server']))
+            server = Server.objects.filter(lookup).order_by('pk').first()
+            if server is None:
+                raise CommandError(f"No server {options['server']}")
+
+        numbers = list(free_extensions(server).values_list('extension_number', flat=True)[:options['count']])
+        for number in numbers:
+            self.stdout.write(str(number))
+        where = f'on {server}' if server else 'everywhere'
+        if len(numbers) < options['count']:
+            self.stderr.write(f'Only {len(numbers)} extension(s) free {where}')
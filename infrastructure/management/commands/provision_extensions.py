@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from infrastructure.extensions import ExtensionError, provision_range
+
+
+class Command(BaseCommand):
+    help = 'Create the extensions FIRST..LAST (inclusive) in one statement; numbers that already exist are skipped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('first', type=int)
+        parser.add_argument('last', type=int)
+
+    def handle(self, *args, **options):
+        first, last = options['first'], options['last']
+        try:
+            created = provision_range(first, last)
+        except ExtensionError as e:
+            raise CommandError(e)
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created} extension(s) in {first}-{last}; {last - first + 1 - created} already existed'
+        ))
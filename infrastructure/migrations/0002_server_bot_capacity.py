@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 01:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('infrastructure', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='server',
+            name='bot_capacity',
+            field=models.PositiveIntegerField(default=0, help_text='Most bots this server runs; 0 leaves it out of automatic bot allocation'),
+        ),
+    ]
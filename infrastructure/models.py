@@ -5,6 +5,10 @@ class Server(models.Model):
     ip = models.CharField(max_length=45)
     alias = models.CharField(max_length=100, blank=True, null=True)
     domain = models.CharField(max_length=255, blank=True, null=True)
+    bot_capacity = models.PositiveIntegerField(
+        default=0,
+        help_text="Most bots this server runs; 0 leaves it out of automatic bot allocation"
+    )
     
     class Meta:
         db_table = 'servers'
@@ -0,0 +1,5 @@
+from django.contrib.admin.apps import AdminConfig
+
+
+class XliteAdminConfig(AdminConfig):
+    default_site = 'core.sites.XliteAdminSite'
@@ -31,14 +31,16 @@ ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='localhost', cast=Csv())
 # Application definition
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    'xdial_core.apps.XliteAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # xdialcore apps
+    'core',
     'accounts',
     'infrastructure',
     'clients',
@@ -51,7 +53,7 @@ MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -90,8 +92,47 @@ DATABASES = {
     }
 }
 
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# 'default' is local memory in each process. Set CACHE_SHARED_BACKEND to
+# 'file' or 'redis' to add a 'shared' tier seen by every process; the
+# reference table cache (core/cache.py) uses both
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'xdial',
+    }
+}
+
+CACHE_SHARED_BACKEND = config('CACHE_SHARED_BACKEND', default='')
+
+if CACHE_SHARED_BACKEND == 'file':
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('CACHE_SHARED_LOCATION', default=str(BASE_DIR / 'cache')),
+    }
+elif CACHE_SHARED_BACKEND == 'redis':
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('CACHE_SHARED_LOCATION', default='redis://127.0.0.1:6379/1'),
+    }
+
+# Reference tables stay REFERENCE_CACHE_LOCAL_TTL seconds in the local tier
+# and REFERENCE_CACHE_TTL seconds in the shared tier
+REFERENCE_CACHE_LOCAL_TTL = config('REFERENCE_CACHE_LOCAL_TTL', default=60, cast=int)
+REFERENCE_CACHE_TTL = config('REFERENCE_CACHE_TTL', default=3600, cast=int)
+
+
 AUTH_USER_MODEL = 'accounts.User'
 
+# Loads the user's role together with the user and caches it per process
+# for AUTH_USER_CACHE_TTL seconds (0 disables; see accounts/backends.py)
+AUTHENTICATION_BACKENDS = ['accounts.backends.RoleModelBackend']
+
+AUTH_USER_CACHE_TTL = config('AUTH_USER_CACHE_TTL', default=30, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -129,4 +170,85 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
-STATIC_ROOT = BASE_DIR / 'staticfiles'
\ No newline at end of file
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+
+# Bot API
+# Shared token the bots send as "Authorization: Bearer <token>"
+
+BOT_API_TOKEN = config('BOT_API_TOKEN', default='')
+
+# Largest batch accepted by the call ingestion endpoint
+CALL_INGEST_MAX_BATCH = config('CALL_INGEST_MAX_BATCH', default=10000, cast=int)
+
+# Write-behind buffer used by the single-call endpoint: flush after
+# CALL_BUFFER_MAX_ROWS rows or CALL_BUFFER_FLUSH_INTERVAL_MS, whichever comes first;
+# a batch that fails to write is retried on up to CALL_BUFFER_MAX_RETRIES later flushes
+
+CALL_BUFFER_MAX_ROWS = config('CALL_BUFFER_MAX_ROWS', default=500, cast=int)
+CALL_BUFFER_FLUSH_INTERVAL_MS = config('CALL_BUFFER_FLUSH_INTERVAL_MS', default=250, cast=int)
+CALL_BUFFER_CAPACITY = config('CALL_BUFFER_CAPACITY', default=10000, cast=int)
+CALL_BUFFER_PUT_TIMEOUT_MS = config('CALL_BUFFER_PUT_TIMEOUT_MS', default=1000, cast=int)
+CALL_BUFFER_MAX_RETRIES = config('CALL_BUFFER_MAX_RETRIES', default=3, cast=int)
+
+# Range partitioning of the calls table (see calls/partitioning.py):
+# partition size ('daily' or 'monthly'), how many future partitions to keep
+# ready, and how many past periods to keep (0 = never drop)
+
+CALLS_PARTITION_INTERVAL = config('CALLS_PARTITION_INTERVAL', default='monthly')
+CALLS_PARTITION_PREMAKE = config('CALLS_PARTITION_PREMAKE', default=3, cast=int)
+CALLS_PARTITION_RETENTION = config('CALLS_PARTITION_RETENTION', default=0, cast=int)
+
+# Call archival (see calls/archive.py): calls older than CALL_RETENTION_DAYS
+# are written to gzip'd JSON-lines chunks in CALL_ARCHIVE_DIR and deleted
+
+CALL_ARCHIVE_DIR = config('CALL_ARCHIVE_DIR', default=str(BASE_DIR / 'call_archive'))
+CALL_RETENTION_DAYS = config('CALL_RETENTION_DAYS', default=90, cast=int)
+CALL_ARCHIVE_CHUNK_ROWS = config('CALL_ARCHIVE_CHUNK_ROWS', default=100000, cast=int)
+CALL_ARCHIVE_DELETE_BATCH = config('CALL_ARCHIVE_DELETE_BATCH', default=5000, cast=int)
+
+# Call admin search ranks at most this many of the most recent matches
+CALL_SEARCH_MAX_RESULTS = config('CALL_SEARCH_MAX_RESULTS', default=10000, cast=int)
+
+# Call exports read this many rows per server-side cursor fetch (see calls/export.py)
+CALL_EXPORT_CHUNK_SIZE = config('CALL_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Background export jobs (see calls/export_jobs.py): files are written to
+# EXPORT_DIR, each user (a client account included) runs at most
+# EXPORT_MAX_RUNNING_PER_USER jobs at a time, and a running job whose worker
+# has not reported for EXPORT_JOB_STALE_SECONDS is picked up again
+EXPORT_DIR = config('EXPORT_DIR', default=str(BASE_DIR / 'exports'))
+EXPORT_MAX_RUNNING_PER_USER = config('EXPORT_MAX_RUNNING_PER_USER', default=1, cast=int)
+EXPORT_JOB_STALE_SECONDS = config('EXPORT_JOB_STALE_SECONDS', default=300, cast=int)
+EXPORT_WORKER_POLL_SECONDS = config('EXPORT_WORKER_POLL_SECONDS', default=5, cast=int)
+
+# Client campaign dashboard API (see clients/metrics.py): metrics cover the
+# last CLIENT_DASHBOARD_DEFAULT_DAYS days unless asked otherwise and stay
+# cached for CLIENT_DASHBOARD_CACHE_TTL seconds
+CLIENT_DASHBOARD_DEFAULT_DAYS = config('CLIENT_DASHBOARD_DEFAULT_DAYS', default=7, cast=int)
+CLIENT_DASHBOARD_CACHE_TTL = config('CLIENT_DASHBOARD_CACHE_TTL', default=300, cast=int)
+
+# Dialer link health checks (see campaigns/dialer_checks.py): DIALER_CHECK_WORKERS
+# requests in flight, at most DIALER_CHECK_PER_HOST of them per host, each with
+# connect and read timeouts of DIALER_CHECK_TIMEOUT seconds. check_dialers
+# --loop repeats every DIALER_CHECK_INTERVAL seconds; the admin action, which
+# probes while the request waits, takes at most DIALER_CHECK_ADMIN_MAX dialers
+DIALER_CHECK_WORKERS = config('DIALER_CHECK_WORKERS', default=32, cast=int)
+DIALER_CHECK_PER_HOST = config('DIALER_CHECK_PER_HOST', default=4, cast=int)
+DIALER_CHECK_TIMEOUT = config('DIALER_CHECK_TIMEOUT', default=5, cast=float)
+DIALER_CHECK_VERIFY_TLS = config('DIALER_CHECK_VERIFY_TLS', default=True, cast=bool)
+DIALER_CHECK_INTERVAL = config('DIALER_CHECK_INTERVAL', default=300, cast=int)
+DIALER_CHECK_ADMIN_MAX = config('DIALER_CHECK_ADMIN_MAX', default=10, cast=int)
+
+# Bot configuration API (see campaigns/bot_config.py): a server's current
+# config version is cached for BOT_CONFIG_VERSION_TTL seconds, which bounds
+# how long other processes serve the old version when there is no shared
+# cache; compiled documents and deltas stay cached BOT_CONFIG_CACHE_TTL seconds
+BOT_CONFIG_VERSION_TTL = config('BOT_CONFIG_VERSION_TTL', default=5, cast=int)
+BOT_CONFIG_CACHE_TTL = config('BOT_CONFIG_CACHE_TTL', default=3600, cast=int)
+
+# Configuration change feed (see campaigns/config_changes.py): a long-poll
+# request waits at most CONFIG_CHANGE_WAIT_SECONDS for a change, and
+# prune_config_changes keeps CONFIG_CHANGE_RETENTION_DAYS days of the log
+CONFIG_CHANGE_WAIT_SECONDS = config('CONFIG_CHANGE_WAIT_SECONDS', default=30, cast=int)
+CONFIG_CHANGE_RETENTION_DAYS = config('CONFIG_CHANGE_RETENTION_DAYS', default=30, cast=int)
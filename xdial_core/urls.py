@@ -1,8 +1,11 @@
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
 from django.shortcuts import redirect
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/calls/', include('calls.urls')),
+    path('api/campaigns/', include('campaigns.urls')),
+    path('api/clients/', include('clients.urls')),
     path("", lambda r: redirect("/admin/login/")),
-    ]
\ No newline at end of file
+    ]